@@ -1,27 +1,94 @@
+import argparse
+import contextvars
+import json
 import os
-from typing import Dict, List, Optional
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from langchain_community.utilities import SQLDatabase
-from langchain_openai import ChatOpenAI
+from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.tools import Tool
+from langchain.chains import create_sql_query_chain
 from langchain_community.agent_toolkits.sql.base import create_sql_agent
 from langchain.agents.agent_types import AgentType
-from langchain_community.agent_toolkits import SQLDatabaseToolkit
+from src.answer_cache import AnswerCache, CacheLookup, normalize_question
+from src.budget import BudgetExceededError, RequestBudget, current_budget, partial_response
+from src.callbacks import BudgetHandler, LLMCallCounter, QueryEventHandler, StageMetricsHandler, emit_query_event
+from src.conversation import ConversationContext, ConversationStore, is_follow_up
+from src.config import get_database_url, get_float_env, get_int_env, get_llm
+from src.cost_guard import GuardedSQLDatabaseToolkit
+from src.database import get_engine
+from src.data_versions import get_data_version_tracker
+from src.examples_store import SEED_EXAMPLES, few_shot_prompt, get_example_store
+from src.metrics import track_stage
+from src.result_cache import CachedSQLDatabase, canonicalize_sql
+from src.results import decode_cursor, execute_page
+from src.schema_cache import SchemaSnapshot, get_schema_cache
+from src.schema_index import SchemaIndex
+from src.shared_store import get_shared_store, store_namespace
+from src.summary_tables import describe_summary_tables
+from src.sql_validation import clean_sql, validate_sql
 
 load_dotenv()
 
+# Schema snapshot pinned for every question of a batch (see process_batch)
+_batch_snapshot: contextvars.ContextVar[Optional[SchemaSnapshot]] = contextvars.ContextVar(
+    "batch_snapshot", default=None
+)
+
 class EcommerceDBChat:
-    def __init__(self):
-        self.db = self._setup_database()
-        self.llm = ChatOpenAI(
-            model="gpt-4-turbo-preview",
-            temperature=0,
-            max_tokens=1000
+    def __init__(
+        self,
+        db: Optional[SQLDatabase] = None,
+        llm: Optional[BaseChatModel] = None,
+        verbose: bool = True
+    ):
+        # db/llm can be injected, e.g. a local SQLite database and a stub LLM for load tests
+        self.db = db or self._setup_database()
+        # Points generated SQL at the precomputed summary tables, if created
+        describe_summary_tables(self.db)
+        self.schema_cache = get_schema_cache(self.db)
+        self.schema_index: Optional[SchemaIndex] = None
+        # Number of best-matching tables sent to the LLM; 0 sends the whole schema
+        self.schema_top_k = get_int_env("SCHEMA_TOP_K", 3)
+        self.data_versions = get_data_version_tracker(self.db._engine)
+        # Verified question/SQL pairs shown to the LLM, grown from successful answers
+        self.examples = get_example_store(self.db._engine)
+        # Rows returned per page of a query result
+        self.page_size = get_int_env("RESULT_PAGE_SIZE", 100)
+        self.answer_cache = AnswerCache(
+            max_entries=get_int_env("ANSWER_CACHE_SIZE", 256),
+            ttl=get_int_env("ANSWER_CACHE_TTL", 600),
+            similarity_threshold=get_float_env("ANSWER_CACHE_SIMILARITY", 0.0),
+            store=get_shared_store(),
+            store_prefix=f"answer:{store_namespace(self.db._engine.url.render_as_string(hide_password=False))}:"
+        )
+        # Previous turns of each API session, for follow-up questions
+        self.conversations = ConversationStore(
+            max_sessions=get_int_env("SESSION_MAX", 1000),
+            idle_ttl=get_int_env("SESSION_IDLE_TTL", 1800),
+            max_turns=get_int_env("SESSION_MAX_TURNS", 3),
+            summary_chars=get_int_env("SESSION_SUMMARY_CHARS", 1000),
+            store=get_shared_store(),
+            store_prefix=f"session:{store_namespace(self.db._engine.url.render_as_string(hide_password=False))}:"
         )
-        self.toolkit = SQLDatabaseToolkit(
+        self.llm = llm or get_llm(
+            max_tokens=1000,
+            # Emit tokens through callbacks so /query/stream can forward them,
+            # and still report token usage for the trace
+            streaming=True,
+            stream_usage=True
+        )
+        # The single-shot SQL prompt of the fast path can be batched across
+        # concurrent questions (LLM_BATCH_WINDOW_MS); the agent's cannot
+        self.sql_llm = llm or get_llm(sql_generation=True, max_tokens=1000)
+        # Its sql_db_query tool rejects queries over the cost budget
+        self.toolkit = GuardedSQLDatabaseToolkit(
             db=self.db,
             llm=self.llm
         )
@@ -41,42 +108,70 @@ class EcommerceDBChat:
         self.agent_executor = create_sql_agent(
             llm=self.llm,
             toolkit=self.toolkit,
-            verbose=True,
+            verbose=verbose,
             agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION
         )
 
+        # "tiered" tries a single SQL-generation call before falling back to
+        # the agent; "agent" always uses the agent
+        self.query_mode = os.getenv("QUERY_MODE", "tiered")
+        self.sql_chain = create_sql_query_chain(
+            self.sql_llm, self.db, prompt=few_shot_prompt(self.db.dialect), k=10
+        )
+
     def _setup_database(self) -> SQLDatabase:
         """Setup database connection"""
-        url = f"mysql+mysqlconnector://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
-        engine = create_engine(url)
-        return SQLDatabase(engine)
+        return CachedSQLDatabase(get_engine(get_database_url()))
+
+    def _get_schema_snapshot(self) -> SchemaSnapshot:
+        """Get the cached schema snapshot"""
+        snapshot = _batch_snapshot.get()
+        if snapshot is not None:
+            return snapshot
+        with track_stage("schema"):
+            return self.schema_cache.get()
 
     def _get_schema_info(self) -> str:
         """Get detailed schema information"""
-        return self.db.get_table_info()
+        return self._get_schema_snapshot().table_info()
+
+    def _get_schema_index(self) -> SchemaIndex:
+        """The schema index for the cached schema, rebuilt when it changes"""
+        snapshot = self._get_schema_snapshot()
+        index = self.schema_index
+        if index is None or index.snapshot is not snapshot:
+            index = self.schema_index = SchemaIndex(snapshot)
+        return index
+
+    def _get_relevant_tables(self, query: str) -> List[str]:
+        """Pick the tables a question needs from the cached schema"""
+        return self._get_schema_index().select_tables(query, top_k=self.schema_top_k)
 
     def _get_sample_queries(self) -> List[str]:
-        """Return a list of sample queries users can ask"""
-        return [
-            "What are the top 5 selling products by quantity?",
-            "Show me the total revenue for each product category",
-            "What's the average order value per customer?",
-            "List products with stock quantity less than 10",
-            "Show me product categories and their subcategories",
-            "What are the top-rated products with at least 3 reviews?",
-            "Show me monthly sales trends",
-            "List customers who made purchases above $500",
-            "What's the distribution of order statuses?",
-            "Show me the most popular products in each category"
-        ]
-
-    def _enhance_query_with_context(self, query: str) -> str:
-        """Enhance the query with database context"""
-        schema_info = self._get_schema_info()
+        """Return a list of sample queries users can ask (the seed examples)"""
+        return list(SEED_EXAMPLES)
+
+    def _get_follow_up_tables(self, query: str, context: Optional[ConversationContext]) -> List[str]:
+        """Tables for a question plus, for a follow-up, those the conversation read"""
+        tables = self._get_relevant_tables(query)
+        if context is not None:
+            snapshot = self._get_schema_snapshot()
+            tables += [table for table in context.tables if table in snapshot.tables and table not in tables]
+        return tables
+
+    def _enhance_query_with_context(self, query: str, context: Optional[ConversationContext] = None) -> str:
+        """Enhance the query with database context (and the conversation, for a follow-up)"""
+        tables = self._get_follow_up_tables(query, context)
+        snapshot = self._get_schema_snapshot()
+        schema_info = snapshot.table_info(tables)
+        if context is not None:
+            examples = context.to_prompt()
+        else:
+            examples = self.examples.prompt_examples(query, snapshot)
         return f"""Using this database schema:
         {schema_info}
         
-        Question: {query}
+        {examples}Question: {query}
         
         Steps to follow:
         1. Identify the relevant tables: Look at the schema and determine which tables are needed
@@ -89,49 +184,325 @@ class EcommerceDBChat:
         
         Please provide a clear and detailed answer."""
 
-    def process_query(self, query: str) -> Dict:
-        """Process a natural language query"""
+    def _cache_metadata(self, lookup: Optional[CacheLookup]) -> Dict:
+        """Describe an answer cache lookup for the response metadata"""
+        metadata = {"status": "miss" if lookup is None else "hit", **self.answer_cache.stats()}
+        if lookup is not None:
+            metadata.update(
+                match=lookup.match,
+                similarity=lookup.similarity,
+                cached_question=lookup.cached_question
+            )
+        return metadata
+
+    def process_query(
+        self,
+        query: str,
+        callbacks: Optional[List] = None,
+        session_id: Optional[str] = None,
+        budget: Optional[RequestBudget] = None
+    ) -> Dict:
+        """Process a natural language query, answering from the cache when possible
+
+        callbacks receive langchain events plus the pipeline events emitted
+        through emit_query_event (tier, cache, sql, rows). With a
+        session_id the answer is remembered, and a follow-up question
+        ("now only for Electronics") is answered from the previous turns
+        instead of the cache. The work is limited by budget (the BUDGET_*
+        settings by default); a request that runs out returns the rows of
+        its last successful query, if any, with status "partial".
+        """
+        budget = budget or RequestBudget.for_endpoint()
+        with budget.activate():
+            try:
+                response = self._process_query(query, callbacks or [], session_id, budget)
+            finally:
+                budget.record()
+        response["metadata"]["budget"] = budget.to_dict()
+        return response
+
+    def _process_query(self, query: str, callbacks: List, session_id: Optional[str], budget: RequestBudget) -> Dict:
+        context = None
+        if session_id and is_follow_up(query, self._get_schema_index().table_terms):
+            context = self.conversations.context(session_id)
+        if context is not None:
+            emit_query_event(callbacks, "conversation", {"follow_up": True, "previous_sql": context.previous_sql})
+            response = self._answer(query, callbacks, budget, context)
+            response["metadata"]["conversation"] = {"follow_up": True, "turns": len(context.turns)}
+            self._remember(session_id, query, response, follow_up=True)
+            return response
+
+        # Answers are only reused while schema and table data are unchanged
+        schema_fingerprint = self._get_schema_snapshot().fingerprint
+        with track_stage("answer_cache"):
+            data_version = self.data_versions.version()
+            lookup = self.answer_cache.get(query, schema_fingerprint, data_version)
+        if lookup is not None:
+            cache_metadata = self._cache_metadata(lookup)
+            emit_query_event(callbacks, "cache", cache_metadata)
+            response = {**lookup.answer, "metadata": {"answer_cache": cache_metadata}}
+            if session_id:
+                self._remember(session_id, query, response)
+            return response
+
+        response = self._answer(query, callbacks, budget)
+        metadata = response.pop("metadata")
+        if response["status"] == "success":
+            self.answer_cache.put(query, response, schema_fingerprint, data_version)
+        metadata["answer_cache"] = self._cache_metadata(None)
+        response = {**response, "metadata": metadata}
+        if session_id:
+            self._remember(session_id, query, response)
+        return response
+
+    def _remember(self, session_id: str, query: str, response: Dict, follow_up: bool = False) -> None:
+        """Record an answered question as the session's latest turn"""
+        if response["status"] != "success":
+            return
+        sql = response.get("sql_query")
+        canonical = canonicalize_sql(sql, self.db.dialect) if sql else None
+        self.conversations.record(
+            session_id,
+            query,
+            sql,
+            response["result"],
+            list(canonical[1]) if canonical else [],
+            follow_up=follow_up
+        )
+
+    def process_batch(
+        self, questions: List[str], concurrency: int = 4, endpoint: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """Answer many questions, yielding one result per question as each completes
+
+        Questions that normalize to the same text are answered once. Up to
+        ``concurrency`` questions run at the same time on pooled connections,
+        all against one schema snapshot taken when the batch starts. Each
+        result carries the question's ``index`` in the input list. Every
+        question gets its own budget, from endpoint's settings.
+        """
+        groups, answer = self.prepare_batch(questions, endpoint)
+        pool = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(groups))))
+        try:
+            futures = {pool.submit(answer, questions[indexes[0]]): indexes for indexes in groups}
+            for future in as_completed(futures):
+                yield from batch_results(questions, futures[future], future.result())
+        finally:
+            # Stop queued questions if the consumer goes away early
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def prepare_batch(
+        self, questions: List[str], endpoint: Optional[str] = None
+    ) -> Tuple[List[List[int]], Callable[[str], Dict]]:
+        """The work of a batch: indexes of the questions to answer once each, and how to answer one
+
+        The callable answers a question against the schema snapshot taken
+        now, within its own budget, and never raises; callers run it on the
+        executor of their choice (process_batch on its own threads, the
+        server on its shared query executor).
+        """
+        groups: Dict[str, List[int]] = {}
+        for index, question in enumerate(questions):
+            groups.setdefault(normalize_question(question), []).append(index)
+
+        token = _batch_snapshot.set(self._get_schema_snapshot())
+        try:
+            context = contextvars.copy_context()
+        finally:
+            _batch_snapshot.reset(token)
+
+        def answer(question: str) -> Dict:
+            start = time.perf_counter()
+            try:
+                result = self.process_query(question, budget=RequestBudget.for_endpoint(endpoint))
+            except Exception as e:
+                result = {"status": "error", "result": str(e)}
+            return {**result, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+        # Each thread needs its own copy of the context to enter it
+        return list(groups.values()), lambda question: context.copy().run(answer, question)
+
+    def _answer(
+        self,
+        query: str,
+        callbacks: List,
+        budget: RequestBudget,
+        context: Optional[ConversationContext] = None
+    ) -> Dict:
+        """Answer with the cheapest tier that succeeds, recording each tier's cost"""
+        tiers = []
+        if self.query_mode == "tiered":
+            # Records the fast path's SQL and rows, already paid for
+            trace = QueryEventHandler()
+            response, tier = self._run_tier(
+                "fast", self._run_fast_path, query, [*callbacks, trace], budget, context
+            )
+            tiers.append(tier)
+            if response is not None:
+                return {**response, "metadata": {"tiers": tiers}}
+            if budget.exceeded() is not None:
+                # Nothing left for the agent to work with
+                return {**partial_response(trace.steps, budget), "metadata": {"tiers": tiers}}
+
+        response, tier = self._run_tier("agent", self._run_agent, query, callbacks, budget, context)
+        tiers.append(tier)
+        return {**response, "metadata": {"tiers": tiers}}
+
+    def _run_tier(
+        self,
+        name: str,
+        runner: Callable,
+        query: str,
+        callbacks: List,
+        budget: RequestBudget,
+        context: Optional[ConversationContext] = None
+    ) -> Tuple[Optional[Dict], Dict]:
+        """Run one tier, returning its response (None on failure) and its stats"""
+        counter = LLMCallCounter()
+        tier = {"tier": name}
+        emit_query_event(callbacks, "tier", {"tier": name})
+        start = time.perf_counter()
+        try:
+            response = runner(
+                query, callbacks=[BudgetHandler(budget), counter, StageMetricsHandler(), *callbacks], context=context
+            )
+            tier["status"] = response["status"]
+        except Exception as e:
+            response = None
+            tier.update(status="failed", error=str(e))
+        tier.update(
+            latency_ms=round((time.perf_counter() - start) * 1000, 1),
+            llm_calls=counter.llm_calls
+        )
+        return response, tier
+
+    def _run_fast_path(
+        self, query: str, callbacks: Optional[List] = None, context: Optional[ConversationContext] = None
+    ) -> Dict:
+        """Generate SQL with one LLM call, validate it locally and execute it
+
+        A stored example matching the question supplies the SQL without the
+        LLM call; otherwise the nearest examples go into the prompt. A
+        follow-up gets the conversation instead, with the previous SQL as
+        the query to modify.
+        """
+        snapshot = self._get_schema_snapshot()
+        if context is None:
+            sql, reused = self.examples.generate_sql(
+                self.sql_chain,
+                query,
+                snapshot,
+                config={"callbacks": callbacks},
+                table_names_to_use=self._get_relevant_tables(query)
+            )
+        else:
+            generated = self.sql_chain.invoke(
+                {
+                    "question": query,
+                    "examples": context.to_prompt(),
+                    "table_names_to_use": self._get_follow_up_tables(query, context)
+                },
+                config={"callbacks": callbacks}
+            )
+            # Meaningless without the conversation, so not worth learning
+            sql, reused = clean_sql(generated), True
+        # Raises SQLValidationError for unknown tables/columns or writes, and
+        # execute_page raises QueryCostError for an over-budget plan; either
+        # way the agent tier takes over and can rewrite the query
+        with track_stage("validation"):
+            validate_sql(sql, snapshot, self.db.dialect)
+        emit_query_event(callbacks, "sql", {"sql": sql})
+        page = execute_page(self.db._engine, sql, self.db.dialect, self.page_size)
+        emit_query_event(callbacks, "rows", {"rows": page.to_text(), "row_count": page.row_count})
+        if not reused:
+            self.examples.add(query, sql)
+        
+        return {
+            "status": "success",
+            "result": page.to_text(),
+            "table": page.to_dict(),
+            "sql_query": sql,
+            "schema_used": True
+        }
+
+    def fetch_page(self, cursor: str) -> Dict:
+        """Fetch the next page of a result from the cursor a previous page returned"""
+        # Raises InvalidCursorError for cursors this server did not sign
+        state = decode_cursor(cursor)
+        sql = state["sql"]
+        # The schema may have changed since the first page was served
+        validate_sql(sql, self._get_schema_snapshot(), self.db.dialect)
+        page = execute_page(self.db._engine, sql, self.db.dialect, state["page_size"], offset=state["offset"])
+        return {
+            "status": "success",
+            "result": page.to_text(),
+            "table": page.to_dict(),
+            "sql_query": sql
+        }
+
+    def _run_agent(
+        self, query: str, callbacks: Optional[List] = None, context: Optional[ConversationContext] = None
+    ) -> Dict:
+        """Answer a natural language query with the SQL agent
+
+        If the request's budget runs out, the rows of the agent's last
+        successful query are returned as a partial answer.
+        """
+        budget = current_budget() or RequestBudget()
+        # Records the agent's queries, so the one that answered can be learned
+        trace = QueryEventHandler()
         try:
             # First, try with the enhanced query
-            enhanced_query = self._enhance_query_with_context(query)
+            enhanced_query = self._enhance_query_with_context(query, context)
             result = self.agent_executor.invoke(
                 {
                     "input": enhanced_query,
                     "top_k": 10
-                }
+                },
+                config={"callbacks": [*(callbacks or []), trace]}
             )
             
+            # AgentExecutor returns this instead of raising at max_iterations
+            if result.get("output", "").startswith("Agent stopped due to"):
+                budget.cancel("iterations")
+                raise BudgetExceededError("iterations")
+
             # Check if result is empty or unclear
             if not result.get("output") or "I don't know" in result.get("output", ""):
                 raise ValueError("Unclear or empty response")
+
+            queries = [step for step in trace.steps if step["action"] == "sql_db_query"]
+            sql = None
+            if queries and not queries[-1].get("observation", "Error").startswith("Error"):
+                sql = clean_sql(queries[-1]["input"])
+                if context is None:
+                    self.examples.add(query, sql)
             
             return {
                 "status": "success",
                 "result": result["output"],
+                "sql_query": sql,
                 "schema_used": True
             }
             
         except Exception as e:
-            # Provide specific error handling
-            if "iteration limit" in str(e).lower():
-                return {
-                    "status": "error",
-                    "result": (
-                        "The query is too complex. Please try breaking it down into simpler questions. "
-                        "For example, instead of asking for everything at once, you could ask:\n"
-                        + "\n".join(f"- {q}" for q in self._get_sample_queries()[:3])
-                    ),
-                    "schema_used": True
-                }
-            else:
-                return {
-                    "status": "error",
-                    "result": (
-                        "I'm having trouble understanding that query. Could you rephrase it? For example:\n"
+            # A deadline may also surface as an interrupted statement
+            if isinstance(e, BudgetExceededError) or budget.exceeded() is not None:
+                response = partial_response(trace.steps, budget)
+                if response["status"] == "error":
+                    response["result"] += (
+                        " Please try breaking the question down into simpler ones, for example:\n"
                         + "\n".join(f"- {q}" for q in self._get_sample_queries()[:3])
-                    ),
-                    "schema_used": True
-                }
+                    )
+                return response
+            return {
+                "status": "error",
+                "result": (
+                    "I'm having trouble understanding that query. Could you rephrase it? For example:\n"
+                    + "\n".join(f"- {q}" for q in self._get_sample_queries()[:3])
+                ),
+                "schema_used": True
+            }
 
     def run(self):
         """Run the interactive chat session"""
@@ -171,6 +542,45 @@ class EcommerceDBChat:
             except Exception as e:
                 print(f"\nError: Something went wrong. Try rephrasing your question or type 'help' for examples.")
 
+def batch_summary(questions: List[str], succeeded: int, elapsed: float) -> Dict:
+    """Counts and throughput of a finished batch"""
+    return {
+        "questions": len(questions),
+        "unique": len({normalize_question(q) for q in questions}),
+        "succeeded": succeeded,
+        "failed": len(questions) - succeeded,
+        "elapsed_s": round(elapsed, 3),
+        "questions_per_s": round(len(questions) / elapsed, 2) if elapsed else 0.0,
+    }
+
+def batch_results(questions: List[str], indexes: List[int], result: Dict) -> Iterator[Dict]:
+    """One result line per input question answered by result, duplicates pointing at the first"""
+    for index in indexes:
+        duplicate_of = {"duplicate_of": indexes[0]} if index != indexes[0] else {}
+        yield {"index": index, "question": questions[index], **result, **duplicate_of}
+
+def run_batch(chat: EcommerceDBChat, questions: List[str], concurrency: int, out=sys.stdout) -> Dict:
+    """Write batch results as JSON Lines and return the batch summary"""
+    start = time.perf_counter()
+    succeeded = 0
+    for result in chat.process_batch(questions, concurrency=concurrency):
+        succeeded += result.get("status") == "success"
+        out.write(json.dumps(result, default=str) + "\n")
+        out.flush()
+    return batch_summary(questions, succeeded, time.perf_counter() - start)
+
 if __name__ == "__main__":
-    chat = EcommerceDBChat()
-    chat.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Chat with the e-commerce database")
+    parser.add_argument("--batch", metavar="FILE", help="answer the questions in FILE (one per line, - for stdin) as JSON Lines")
+    parser.add_argument("--concurrency", type=int, default=get_int_env("BATCH_CONCURRENCY", 4),
+                        help="questions answered at the same time in batch mode")
+    args = parser.parse_args()
+
+    if args.batch:
+        with (sys.stdin if args.batch == "-" else open(args.batch)) as f:
+            batch_questions = [line.strip() for line in f if line.strip()]
+        summary = run_batch(EcommerceDBChat(verbose=False), batch_questions, args.concurrency)
+        print(json.dumps({"summary": summary}), file=sys.stderr)
+    else:
+        chat = EcommerceDBChat()
+        chat.run()
\ No newline at end of file
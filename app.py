@@ -1,10 +1,32 @@
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
-from typing import Dict, Optional, Union, List, Any
-from advanced_chat import EcommerceDBChat
+from starlette.concurrency import run_in_threadpool
+from typing import TYPE_CHECKING, Dict, Optional, Tuple, Union, List, Any
+from src.budget import RequestBudget, partial_response
+from src.config import get_bool_env, get_float_env, get_int_env
+from src.executor import BoundedExecutor, QueueFullError
+from src.metrics import REGISTRY, REQUEST_SECONDS, REQUESTS, RequestTimings, track_stage
+from src.shared_store import get_shared_store
+from src.warmup import Warmup, WarmupError
+
+# advanced_chat and the src modules around it pull in langchain, the OpenAI
+# SDK and SQLAlchemy, which take seconds to import. They are imported by the
+# warm-up below or inside the handlers that run after it, so the server
+# accepts connections (and answers /ready) straight away
+if TYPE_CHECKING:
+    from advanced_chat import EcommerceDBChat
+    from src.callbacks import QueryEventHandler
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -14,11 +36,83 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Setup templates
 templates = Jinja2Templates(directory="templates")
 
-# Initialize chat instance
-chat_instance = EcommerceDBChat()
+# Agent runs are blocking (LLM round-trips plus SQL), so they go through a
+# bounded thread pool; requests beyond workers + queue get a 429
+query_executor = BoundedExecutor(
+    max_workers=get_int_env("QUERY_CONCURRENCY", 8),
+    max_queue=get_int_env("QUERY_QUEUE_DEPTH", 32)
+)
+
+# Upper bound on questions of one /query/batch request answered at the same time
+BATCH_CONCURRENCY = get_int_env("BATCH_CONCURRENCY", 4)
+
+# Stops the thread folding new orders/reviews into the summary tables
+summary_refresh = None
+# Stops the thread copying new rows into the analytics mirror
+analytics_refresh = None
+
+def build_chat(warmup: Warmup) -> "EcommerceDBChat":
+    """Import the pipeline, connect, and load the schema snapshot"""
+    global summary_refresh, analytics_refresh
+    with warmup.step("imports"):
+        from advanced_chat import EcommerceDBChat
+        from src.analytics_backend import start_analytics_refresh
+        from src.summary_tables import start_background_refresh
+    with warmup.step("chat"):
+        # Agent steps are captured by QueryEventHandler, so the agent's
+        # verbose console output is off unless AGENT_VERBOSE is set
+        chat = EcommerceDBChat(verbose=get_bool_env("AGENT_VERBOSE", False))
+    with warmup.step("schema"):
+        chat._get_schema_snapshot()
+    summary_refresh = start_background_refresh(
+        chat.db._engine, get_int_env("SUMMARY_REFRESH_INTERVAL", 300)
+    )
+    analytics_refresh = start_analytics_refresh(
+        chat.db._engine, get_int_env("ANALYTICS_REFRESH_INTERVAL", 60)
+    )
+    return chat
+
+chat_warmup = Warmup(build_chat, name="chat")
+
+# Seconds a request waits for a warm-up in progress before getting a 503
+WARMUP_TIMEOUT = get_float_env("WARMUP_TIMEOUT", 60.0)
+
+if not get_bool_env("LAZY_START", True):
+    # Eager start: fail at import, before the server binds, if set-up fails
+    chat_warmup.get()
+
+@app.on_event("startup")
+def start_warmup():
+    chat_warmup.start()
+
+async def get_chat() -> "EcommerceDBChat":
+    """The chat instance, waiting for the warm-up off the event loop if needed"""
+    if chat_warmup.ready:
+        return chat_warmup.get()
+    try:
+        return await run_in_threadpool(chat_warmup.get, WARMUP_TIMEOUT)
+    except WarmupError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    query_executor.shutdown()
+    if summary_refresh is not None:
+        summary_refresh.set()
+    if analytics_refresh is not None:
+        analytics_refresh.set()
 
 class QueryRequest(BaseModel):
     query: str
+    # Questions with the same session_id form a conversation; follow-ups build on earlier answers
+    session_id: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    questions: List[str]
+    concurrency: Optional[int] = None
+
+class PageRequest(BaseModel):
+    cursor: str
 
 class QueryResponse(BaseModel):
     type: str  # 'text', 'table', 'error', 'sql', 'schema', 'sample_queries'
@@ -39,15 +133,22 @@ async def root(request: Request):
         {"request": request}
     )
 
+@app.get("/ready")
+async def ready():
+    """Warm-up status; 503 until the chat pipeline can answer queries"""
+    status = chat_warmup.status()
+    return JSONResponse(status, status_code=200 if status["status"] == "ready" else 503)
+
 @app.get("/schema")
 async def get_schema():
     """Get database schema information"""
+    chat_instance = await get_chat()
     try:
-        schema_info = chat_instance._get_schema_info()
+        snapshot = await run_in_threadpool(chat_instance._get_schema_snapshot)
         return QueryResponse(
             type="schema",
-            content=schema_info,
-            metadata={"tables": len(schema_info.split("CREATE TABLE"))-1}
+            content=snapshot.table_info(),
+            metadata={"tables": len(snapshot.tables)}
         )
     except Exception as e:
         return QueryResponse(
@@ -58,6 +159,7 @@ async def get_schema():
 @app.get("/sample-queries")
 async def get_sample_queries():
     """Get sample queries"""
+    chat_instance = await get_chat()
     try:
         queries = chat_instance._get_sample_queries()
         return QueryResponse(
@@ -71,86 +173,267 @@ async def get_sample_queries():
             content=str(e)
         )
 
+@app.get("/pool-stats")
+async def pool_stats():
+    """Get database connection pool usage"""
+    from src.database import get_pool_stats
+
+    chat_instance = await get_chat()
+    return get_pool_stats(chat_instance.db._engine)
+
+@app.get("/cache-stats")
+async def cache_stats():
+    """Get answer cache, SQL result cache, analytics mirror and example store usage"""
+    from src.analytics_backend import get_analytics_mirror
+    from src.result_cache import get_result_cache
+
+    chat_instance = await get_chat()
+    store = get_shared_store()
+    mirror = get_analytics_mirror(chat_instance.db._engine)
+    return {
+        "answer_cache": chat_instance.answer_cache.stats(),
+        "result_cache": get_result_cache(chat_instance.db._engine).stats(),
+        "shared_store": type(store).__name__ if store is not None else None,
+        "analytics_mirror": mirror.stats() if mirror is not None else None,
+        "examples": chat_instance.examples.stats(),
+        "conversations": chat_instance.conversations.stats()
+    }
+
+def build_query_response(result: Dict, events: "QueryEventHandler") -> QueryResponse:
+    """Turn a process_query result and its recorded agent steps into a QueryResponse"""
+    if not (isinstance(result, dict) and "result" in result):
+        return QueryResponse(
+            type="error",
+            content="Invalid response format from chat instance"
+        )
+
+    content = result["result"]
+    thought_process = events.thought_process()
+    sql_query = result.get("sql_query") or events.last_sql()
+
+    # Results run by the pipeline itself come back as typed columns
+    if result.get("table"):
+        return QueryResponse(
+            type="table",
+            content=result["table"],
+            sql_query=sql_query,
+            thought_process=thought_process,
+            metadata=result.get("metadata")
+        )
+
+    return QueryResponse(
+        type="text",
+        content=events.final_answer or content,
+        sql_query=sql_query,
+        thought_process=thought_process,
+        metadata=result.get("metadata")
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Stage latency histograms and counters in the Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+async def answer_query(
+    chat_instance: "EcommerceDBChat",
+    endpoint: str,
+    query: str,
+    events: "QueryEventHandler",
+    session_id: Optional[str] = None
+) -> QueryResponse:
+    """Run a query on the executor and build its response, timing every stage
+
+    The per-request timings are added to the response metadata and the
+    request is counted in the /metrics histograms. The query runs within
+    the endpoint's budget; at its deadline the best partial answer so far
+    is returned while the worker stops at its next checkpoint.
+    """
+    timings = RequestTimings()
+    budget = RequestBudget.for_endpoint(endpoint)
+    status = "error"
+    try:
+        with timings.activate():
+            run = asyncio.ensure_future(query_executor.run(
+                chat_instance.process_query, query, callbacks=[events], session_id=session_id, budget=budget
+            ))
+            try:
+                # Shielded, so the executor slot stays taken until the worker is done
+                result = await asyncio.wait_for(asyncio.shield(run), timeout=budget.remaining())
+            except asyncio.TimeoutError:
+                budget.cancel("deadline")
+                run.add_done_callback(lambda task: task.cancelled() or task.exception())
+                result = {**partial_response(list(events.steps), budget), "metadata": {"budget": budget.to_dict()}}
+            with track_stage("format"):
+                response = build_query_response(result, events)
+        status = result.get("status", "error") if isinstance(result, dict) else "error"
+    except QueueFullError:
+        status = "rejected"
+        raise
+    finally:
+        REQUESTS.inc(endpoint=endpoint, status=status)
+        REQUEST_SECONDS.observe(timings.to_dict()["total_ms"] / 1000, endpoint=endpoint)
+    response.metadata = {**(response.metadata or {}), "timings": timings.to_dict()}
+    return response
+
 @app.post("/query")
 async def process_query(query_request: QueryRequest) -> QueryResponse:
     """Process a chat query"""
+    from src.callbacks import QueryEventHandler
+
+    chat_instance = await get_chat()
     try:
-        result = chat_instance.process_query(query_request.query)
-        
-        if isinstance(result, dict) and "result" in result:
-            content = result["result"]
-            thought_process = None
-            sql_query = None
-            agent_steps = []
-
-            # Extract the complete agent steps
-            if "Entering new SQL Agent Executor chain..." in content:
-                # Get everything between "Entering new..." and "Final Answer:"
-                full_process = content.split("Entering new SQL Agent Executor chain...")[1]
-                steps_text = full_process.split("Final Answer:")[0]
-                final_answer = full_process.split("Final Answer:")[1].strip() if "Final Answer:" in full_process else None
-                
-                # Process each step
-                current_step = {}
-                for line in steps_text.strip().split('\n'):
-                    line = line.strip()
-                    if not line:  # Skip empty lines
-                        continue
-                    if line.startswith('Action:'):
-                        if current_step:
-                            agent_steps.append(current_step)
-                        current_step = {'action': line.replace('Action:', '').strip()}
-                    elif line.startswith('Action Input:'):
-                        current_step['input'] = line.replace('Action Input:', '').strip()
-                    elif current_step and 'action' in current_step:
-                        if 'observation' not in current_step:
-                            current_step['observation'] = line
-                        else:
-                            current_step['observation'] += '\n' + line
-
-                if current_step:
-                    agent_steps.append(current_step)
-
-                thought_process = {
-                    'steps': agent_steps,
-                    'final_answer': final_answer
-                }
-
-                print("Thought process:", thought_process)  # Debug print
-
-            # Extract SQL query if present
-            if "SQL Query:" in content:
-                sql_parts = content.split("SQL Query:", 1)
-                sql_query = sql_parts[1].split("\n")[0].strip()
-                
-            # Determine response type and format
-            if "| " in content and "\n|" in content:
-                return QueryResponse(
-                    type="table",
-                    content=content,
-                    sql_query=sql_query,
-                    thought_process=thought_process
-                )
-            
-            return QueryResponse(
-                type="text",
-                content=thought_process['final_answer'] if thought_process else content,
-                sql_query=sql_query,
-                thought_process=thought_process
-            )
+        events = QueryEventHandler()
+        return await answer_query(
+            chat_instance, "/query", query_request.query, events, session_id=query_request.session_id
+        )
         
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        logger.exception("Error processing query")
         return QueryResponse(
             type="error",
-            content="Invalid response format from chat instance"
+            content=str(e)
         )
-        
+
+@app.post("/query/page")
+async def fetch_page(page_request: PageRequest) -> QueryResponse:
+    """Fetch the next page of a table result using the cursor of the previous page"""
+    from src.results import InvalidCursorError
+
+    chat_instance = await get_chat()
+    try:
+        result = await query_executor.run(chat_instance.fetch_page, page_request.cursor)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Error processing query: {str(e)}")  # Debug print
         return QueryResponse(
             type="error",
             content=str(e)
         )
+    return QueryResponse(
+        type="table",
+        content=result["table"],
+        sql_query=result["sql_query"]
+    )
+
+@app.post("/query/batch")
+async def process_batch(batch_request: BatchRequest) -> StreamingResponse:
+    """Answer a list of questions, streaming one JSON line per question as it completes
+
+    Duplicate questions are answered once; the last line is a summary with
+    the batch throughput. Each question takes a slot of the shared query
+    executor like a /query request, so batches get the same backpressure;
+    a question the executor has no room for is reported with status
+    "rejected".
+    """
+    from advanced_chat import batch_results, batch_summary
+
+    if query_executor.is_full:
+        raise HTTPException(status_code=429, detail="Server is busy, please retry shortly")
+    chat_instance = await get_chat()
+    concurrency = min(
+        batch_request.concurrency or BATCH_CONCURRENCY,
+        BATCH_CONCURRENCY
+    )
+    questions = batch_request.questions
+    # Pinning the schema snapshot may introspect the database
+    groups, answer = await run_in_threadpool(chat_instance.prepare_batch, questions, endpoint="/query/batch")
+    # Questions of this batch holding executor slots at once
+    slots = asyncio.Semaphore(concurrency)
+    stopped = False
+
+    async def run(indexes: List[int]) -> Tuple[List[int], Dict]:
+        async with slots:
+            if stopped:
+                return indexes, {"status": "error", "result": "Batch cancelled"}
+            try:
+                return indexes, await query_executor.run(answer, questions[indexes[0]])
+            except QueueFullError as e:
+                return indexes, {"status": "rejected", "result": str(e)}
+
+    async def json_lines():
+        nonlocal stopped
+        start = time.perf_counter()
+        succeeded = 0
+        # Not cancelled if the client goes away: a running question keeps its
+        # executor slot until the worker is done, queued ones skip their turn
+        tasks = [asyncio.ensure_future(run(indexes)) for indexes in groups]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indexes, result = await next_done
+                for line in batch_results(questions, indexes, result):
+                    succeeded += line.get("status") == "success"
+                    yield json.dumps(line, default=str) + "\n"
+        finally:
+            stopped = True
+        summary = batch_summary(questions, succeeded, time.perf_counter() - start)
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(json_lines(), media_type="application/x-ndjson")
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/query/stream")
+async def stream_query(query_request: QueryRequest) -> StreamingResponse:
+    """Process a chat query, streaming agent steps, SQL, rows and answer tokens as SSE
+
+    The last event is either ``result`` (a QueryResponse) or ``error``.
+    """
+    from src.callbacks import QueryEventHandler
+
+    if query_executor.is_full:
+        raise HTTPException(status_code=429, detail="Server is busy, please retry shortly")
+    chat_instance = await get_chat()
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    # Callbacks fire on the worker thread, so hand events back to the loop
+    events = QueryEventHandler(
+        emit=lambda event, data: loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+    )
+
+    async def run_query():
+        try:
+            response = await answer_query(
+                chat_instance, "/query/stream", query_request.query, events, session_id=query_request.session_id
+            )
+            queue.put_nowait(("result", response.model_dump()))
+        except Exception as e:
+            logger.exception("Error processing query")
+            queue.put_nowait(("error", QueryResponse(type="error", content=str(e)).model_dump()))
+        finally:
+            queue.put_nowait(None)
+
+    async def event_stream():
+        task = asyncio.create_task(run_query())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield format_sse(*item)
+        finally:
+            await task
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    workers = get_int_env("WEB_CONCURRENCY", 1)
+    if workers > 1:
+        # Worker processes inherit the environment: one cursor key and one
+        # cache store make them behave as a single service
+        os.environ.setdefault("RESULT_CURSOR_SECRET", secrets.token_hex(32))
+        os.environ.setdefault("SHARED_STORE_URL", "sqlite:///.cache/shared_store.db")
+        uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""Query time on the source SQLite database vs. the DuckDB analytics mirror.
+
+Builds (or reuses) a deterministic SQLite database, copies it into the
+mirror from src/analytics_backend.py, then times each sample question on
+SQLite and through the mirror (translation included), checking that both
+return the same rows. Questions the mirror declines run on the source
+and are marked as such; a lookup on an indexed column is included to show
+it stays there. Finally a few rows are appended to time an incremental
+refresh, and some orders are updated in place to check that the next
+refresh copies them again (both are undone afterwards).
+
+    python -m benchmarks.analytics_backend --order-items 1000000
+    python -m benchmarks.analytics_backend --order-items 100000 --repeat 5
+"""
+import argparse
+import decimal
+import os
+import sqlite3
+import tempfile
+import time
+from typing import List, Tuple
+
+from sqlalchemy import create_engine
+
+from src.analytics_backend import AnalyticsMirror
+from src.data_versions import get_data_version_tracker
+from .dataset import build_sqlite_db
+from .fakes import SAMPLE_SQL
+from .summary_tables import same_rows, timed
+
+STATUS_SQL = "SELECT status, COUNT(*) FROM orders GROUP BY status ORDER BY status"
+POINT_LOOKUP = ("Look up one order", "SELECT COUNT(*) FROM order_items WHERE order_id = 42")
+
+def as_floats(rows: List[Tuple]) -> List[Tuple]:
+    # DuckDB returns DECIMAL columns as Decimal, SQLite as float
+    return [tuple(float(v) if isinstance(v, decimal.Decimal) else v for v in row) for row in rows]
+
+def compare(source_rows: List[Tuple], mirror_rows: List[Tuple]) -> str:
+    source_rows, mirror_rows = as_floats(source_rows), as_floats(mirror_rows)
+    if same_rows(source_rows, mirror_rows):
+        return "yes"
+    # A LIMIT cutting through tied values may keep different rows of the tie
+    def values(rows: List[Tuple]) -> List[Tuple]:
+        return [tuple(v for v in row if not isinstance(v, str)) for row in rows]
+    return "ties" if same_rows(values(source_rows), values(mirror_rows)) else "NO"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--order-items", type=int, default=1_000_000, help="dataset size (order_items rows)")
+    parser.add_argument("--db", help="SQLite file to use/create (default: temp dir, one per size)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per query; the fastest is reported")
+    args = parser.parse_args()
+
+    # A separate file from run_benchmark's: the refresh test appends rows
+    db_path = args.db or os.path.join(tempfile.gettempdir(), f"chatwithdb_analytics_{args.order_items}.db")
+    start = time.perf_counter()
+    db_url = build_sqlite_db(db_path, order_items=args.order_items)
+    print(f"dataset: {db_path} ({args.order_items} order_items, ready in {time.perf_counter() - start:.1f}s)")
+
+    engine = create_engine(db_url)
+    with tempfile.TemporaryDirectory() as directory:
+        mirror = AnalyticsMirror(engine, os.path.join(directory, "analytics.duckdb"))
+        start = time.perf_counter()
+        copied = mirror.refresh(rebuild=True)
+        print(f"mirror build: {sum(copied.values()):,} rows in {time.perf_counter() - start:.1f}s\n")
+
+        conn = sqlite3.connect(db_path)
+        try:
+            print(f"{'question':<58} {'sqlite ms':>10} {'duckdb ms':>10} {'speedup':>8} {'same':>5}")
+            for question, sql in [*SAMPLE_SQL.items(), POINT_LOOKUP]:
+                source_seconds, source_rows = timed(conn, sql, args.repeat)
+                if mirror.to_duckdb(sql, "sqlite") is None:
+                    print(f"{question[:58]:<58} {source_seconds * 1000:>10.1f} {'(source)':>10}")
+                    continue
+                best = float("inf")
+                mirror_rows: List[Tuple] = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    _, mirror_rows = mirror.run(sql, "sqlite")
+                    best = min(best, time.perf_counter() - start)
+                print(
+                    f"{question[:58]:<58} {source_seconds * 1000:>10.1f} {best * 1000:>10.1f} "
+                    f"{source_seconds / max(best, 1e-9):>7.1f}x {compare(source_rows, mirror_rows):>5}"
+                )
+
+            last_id = conn.execute("SELECT MAX(order_item_id) FROM order_items").fetchone()[0]
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(order_items)")][1:]
+            column_list = ", ".join(columns)
+            conn.execute(
+                f"INSERT INTO order_items ({column_list}) SELECT {column_list} FROM order_items "
+                "ORDER BY order_item_id LIMIT 1000"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        # Skip the tracker's poll interval so the new rows are seen at once
+        get_data_version_tracker(engine).bump("order_items")
+        start = time.perf_counter()
+        copied = mirror.refresh()
+        print(f"\nincremental refresh: {sum(copied.values()):,} new rows in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        conn = sqlite3.connect(db_path)
+        try:
+            statuses = conn.execute("SELECT order_id, status FROM orders WHERE order_id <= 1000").fetchall()
+            conn.execute("UPDATE orders SET status = 'cancelled' WHERE order_id <= 1000")
+            conn.commit()
+            get_data_version_tracker(engine).bump("orders")
+            start = time.perf_counter()
+            copied = mirror.refresh()
+            elapsed = time.perf_counter() - start
+            source_rows = conn.execute(STATUS_SQL).fetchall()
+            result = mirror.run(STATUS_SQL, "sqlite")
+            same = "NO" if result is None else compare(source_rows, result[1])
+            print(f"refresh after an update: orders copied {copied['orders']:,} rows in {elapsed * 1000:.0f} ms, same: {same}")
+        finally:
+            conn.executemany("UPDATE orders SET status = ? WHERE order_id = ?", [(s, i) for i, s in statuses])
+            conn.commit()
+            conn.close()
+
+    # Leave the dataset as built for the next run
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM order_items WHERE order_item_id > ?", (last_id,))
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    main()
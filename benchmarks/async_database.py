@@ -0,0 +1,121 @@
+"""Concurrent requests through the src/ pipeline: thread pool vs native async.
+
+Runs the sample questions through the src/query_processor pipeline with
+N requests in flight at once, against a SQLite database and a stub LLM
+that waits ``--latency`` seconds per call, two ways:
+
+  threads  process_query, one executor thread per request in flight, as
+           an async web layer does with synchronous code
+  async    process_query_async on an AsyncDatabase (aiosqlite): the LLM
+           call and the SQL are awaited on the event loop
+
+Both share the same pool size (DB_POOL_SIZE + DB_MAX_OVERFLOW), and the
+result cache is off so every request runs its SQL. Reports throughput,
+p50/p95 latency and the peak number of threads. Needs
+``pip install -r requirements-async.txt``.
+
+    python -m benchmarks.async_database
+    python -m benchmarks.async_database --concurrency 10 100 500 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List
+
+from src import query_processor
+from src.async_database import AsyncDatabase
+from src.database import create_db_connection, setup_query_chain
+from src.result_cache import get_result_cache
+from src.schema_cache import get_schema_cache
+from .dataset import build_sqlite_db
+from .fakes import SAMPLE_SQL, ScriptedChatModel
+from .run_benchmark import percentile
+
+async def peak_threads(stop: asyncio.Event) -> int:
+    peak = threading.active_count()
+    while not stop.is_set():
+        peak = max(peak, threading.active_count())
+        await asyncio.sleep(0.005)
+    return peak
+
+async def run_level(mode: str, request: Callable[[str], Awaitable[None]], concurrency: int, requests: int) -> Dict:
+    questions = list(SAMPLE_SQL)
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await request(questions[i % len(questions)])
+            latencies.append(time.perf_counter() - start)
+
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(peak_threads(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests_per_s": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "peak_threads": await sampler,
+    }
+
+async def run(args) -> List[Dict]:
+    db_path = args.db or os.path.join(tempfile.gettempdir(), f"chatwithdb_bench_{args.order_items}.db")
+    db = create_db_connection(build_sqlite_db(db_path, order_items=args.order_items))
+    # The chain's prompt then renders the schema from the snapshot instead
+    # of running the sample-row SELECTs, which would block the event loop
+    get_schema_cache(db).get()
+    engine = db._engine
+    get_result_cache(engine).max_bytes = 0
+    chain = setup_query_chain(db, ScriptedChatModel(replay_sql=SAMPLE_SQL, latency=args.latency))
+    async_db = AsyncDatabase(engine)
+
+    async def async_request(question: str) -> None:
+        await query_processor.process_query_async(chain, async_db, question)
+
+    # Warm both pools and the schema before timing
+    await async_request(next(iter(SAMPLE_SQL)))
+    query_processor.process_query(chain, db, next(iter(SAMPLE_SQL)))
+
+    loop = asyncio.get_running_loop()
+    results = []
+    for concurrency in args.concurrency:
+        requests = max(args.requests, concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            async def thread_request(question: str) -> None:
+                await loop.run_in_executor(executor, query_processor.process_query, chain, db, question)
+            results.append(await run_level("threads", thread_request, concurrency, requests))
+        results.append(await run_level("async", async_request, concurrency, requests))
+    await async_db.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--order-items", type=int, default=10000, help="dataset size (order_items rows)")
+    parser.add_argument("--db", help="SQLite file to use/create (default: temp dir, one per size)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500],
+                        help="requests in flight at once")
+    parser.add_argument("--requests", type=int, default=500, help="requests per level (at least the concurrency)")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per stub LLM call")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{args.latency:.2f}s per LLM call, result cache off\n")
+    print(f"{'mode':<8} {'in flight':>10} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'peak threads':>13}")
+    for result in results:
+        print(
+            f"{result['mode']:<8} {result['concurrency']:>10} {result['requests_per_s']:>8.1f} "
+            f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['peak_threads']:>13}"
+        )
+
+if __name__ == "__main__":
+    main()
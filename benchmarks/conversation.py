@@ -0,0 +1,104 @@
+"""Prompt size and LLM calls of a multi-turn conversation, with and without sessions.
+
+Plays one conversation - a sample question followed by follow-ups like
+"now only for Electronics" - through EcommerceDBChat three ways:
+
+  stateless  each follow-up is sent on its own, as before sessions
+  pasted     the user pastes the conversation so far above each follow-up
+  session    follow-ups carry a session_id, so the previous SQL and a
+             compacted summary of older turns are added by the server
+
+The stub LLM copies the SQL of the first known question in its prompt, so
+it cannot judge whether a follow-up was applied; what is compared is what
+each approach costs: LLM calls, agent fallbacks and prompt tokens, both in
+total and for the last turn (pasting grows with every turn, the session
+context is bounded by SESSION_MAX_TURNS and SESSION_SUMMARY_CHARS).
+
+    python -m benchmarks.conversation
+    python -m benchmarks.conversation --turns 3
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from advanced_chat import EcommerceDBChat
+from src.callbacks import QueryEventHandler
+from src.conversation import ConversationStore
+from src.database import get_engine
+from src.examples_store import SEED_EXAMPLES, ExampleStore
+from src.result_cache import CachedSQLDatabase
+from .dataset import build_sqlite_db
+from .fakes import SAMPLE_SQL, ScriptedChatModel
+from .few_shot import WRONG_SQL
+
+CONVERSATION = [
+    "Show me the total revenue for each product category",
+    "Now only for Electronics",
+    "And only for 2024",
+    "Sort them by revenue, highest first",
+    "What about the number of orders instead?",
+    "Only the top 3",
+    "Break it down by month",
+    "Now the same for Clothing",
+]
+
+def run_conversation(chat: EcommerceDBChat, mode: str, session_id: Optional[str] = None) -> Dict:
+    llm_calls = prompt_tokens = last_prompt_tokens = fallbacks = 0
+    transcript: List[str] = []
+    start = time.perf_counter()
+    for question in CONVERSATION:
+        asked = question
+        if mode == "pasted" and transcript:
+            asked = "\n\n".join(transcript) + f"\n\n{question}"
+        events = QueryEventHandler()
+        result = chat.process_query(asked, callbacks=[events], session_id=session_id)
+        llm_calls += events.llm_calls
+        prompt_tokens += events.prompt_tokens
+        last_prompt_tokens = events.prompt_tokens
+        fallbacks += len(result["metadata"].get("tiers", [])) > 1
+        transcript.append(f"{question}\n{result['result']}")
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "turns": len(CONVERSATION),
+        "llm_calls": llm_calls,
+        "agent_fallbacks": fallbacks,
+        "prompt_tokens": prompt_tokens,
+        "last_prompt_tokens": last_prompt_tokens,
+        "ms_per_turn": round(elapsed / len(CONVERSATION) * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--order-items", type=int, default=10000, help="dataset size (order_items rows)")
+    parser.add_argument("--db", help="SQLite file to use/create (default: temp dir, one per size)")
+    parser.add_argument("--turns", type=int, default=3, help="turns kept in full per session (SESSION_MAX_TURNS)")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per stub LLM call")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.gettempdir(), f"chatwithdb_bench_{args.order_items}.db")
+    db = CachedSQLDatabase(get_engine(build_sqlite_db(db_path, order_items=args.order_items)))
+    llm = ScriptedChatModel(replay_sql=SAMPLE_SQL, default_sql=WRONG_SQL, latency=args.latency)
+    chat = EcommerceDBChat(db=db, llm=llm, verbose=False)
+    chat.answer_cache.max_entries = 0
+
+    results = []
+    for mode in ("stateless", "pasted", "session"):
+        # Fresh stores, so no mode answers from what an earlier one learned
+        chat.examples = ExampleStore(db.dialect)
+        chat.examples.seed(SEED_EXAMPLES)
+        chat.conversations = ConversationStore(max_turns=args.turns)
+        results.append(run_conversation(chat, mode, session_id="bench" if mode == "session" else None))
+
+    print(f"dataset: {db_path}; {len(CONVERSATION)} turns, {args.turns} kept in full per session\n")
+    print(f"{'mode':<10} {'llm calls':>10} {'agent fallbacks':>16} {'prompt tokens':>14} {'last turn':>10} {'ms/turn':>8}")
+    for result in results:
+        print(
+            f"{result['mode']:<10} {result['llm_calls']:>10} {result['agent_fallbacks']:>16} "
+            f"{result['prompt_tokens']:>14,} {result['last_prompt_tokens']:>10,} {result['ms_per_turn']:>8.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
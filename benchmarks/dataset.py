@@ -0,0 +1,124 @@
+import os
+import sqlite3
+from pathlib import Path
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / "setup" / "ecommerce_init_sqlite.sql"
+
+# Multiplicative hash so the generated data is deterministic without a seeded RNG
+HASH = "((({x}) * 2654435761) % 4294967296)"
+
+def _hash(expr: str, salt: int = 0) -> str:
+    return HASH.format(x=f"{expr} + {salt}")
+
+def _sequence(count: int) -> str:
+    return (
+        "WITH RECURSIVE seq(x) AS "
+        f"(SELECT 1 UNION ALL SELECT x + 1 FROM seq WHERE x < {count}) "
+    )
+
+def get_table_sizes(order_items: int) -> dict:
+    """Derive row counts for every table from the number of order_items."""
+    return {
+        "products": max(50, order_items // 200),
+        "customers": max(50, order_items // 20),
+        "orders": max(100, order_items // 3),
+        "order_items": order_items,
+        "reviews": max(200, order_items // 10),
+    }
+
+def build_sqlite_db(path: str, order_items: int = 1000, overwrite: bool = False) -> str:
+    """Create a deterministic SQLite e-commerce database and return its SQLAlchemy URL."""
+    if os.path.exists(path):
+        if not overwrite:
+            return f"sqlite:///{path}"
+        os.remove(path)
+
+    sizes = get_table_sizes(order_items)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SCHEMA_PATH.read_text())
+
+        main_categories = ["Electronics", "Clothing", "Books", "Home & Garden", "Sports"]
+        for name in main_categories:
+            parent_id = conn.execute(
+                "INSERT INTO categories (name, description, parent_category_id) VALUES (?, ?, NULL)",
+                (name, f"{name} products"),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO categories (name, description, parent_category_id) VALUES (?, ?, ?)",
+                [(f"Sub-category {j} of {name}", f"Description for sub-category {j}", parent_id)
+                 for j in range(1, 11)],
+            )
+        categories = conn.execute("SELECT COUNT(*) FROM categories").fetchone()[0]
+
+        conn.execute(
+            _sequence(sizes["products"])
+            + "INSERT INTO products (name, description, category_id, price, stock_quantity, sku) "
+            f"SELECT 'Product ' || x, 'Description for product ' || x, "
+            f"{_hash('x', 1)} % {categories} + 1, "
+            f"ROUND(10 + ({_hash('x', 2)} % 99000) / 100.0, 2), "
+            f"{_hash('x', 3)} % 101, 'SKU-' || x FROM seq"
+        )
+        conn.execute(
+            _sequence(sizes["customers"])
+            + "INSERT INTO customers (first_name, last_name, email, phone) "
+            "SELECT 'First' || x, 'Last' || x, 'customer' || x || '@example.com', "
+            f"'555-' || printf('%07d', {_hash('x', 4)} % 10000000) FROM seq"
+        )
+        # Two addresses per customer: address 2c-1 is home, 2c is work
+        conn.execute(
+            _sequence(sizes["customers"] * 2)
+            + "INSERT INTO addresses "
+            "(customer_id, address_type, street_address, city, state, postal_code, country, is_default) "
+            "SELECT (x + 1) / 2, CASE x % 2 WHEN 1 THEN 'home' ELSE 'work' END, "
+            f"x || ' Main Street', 'City ' || ({_hash('x', 5)} % 200), "
+            f"'State ' || ({_hash('x', 6)} % 50), printf('%05d', x % 100000), "
+            "'Country ' || (x % 20), x % 2 FROM seq"
+        )
+        conn.execute(
+            _sequence(sizes["orders"])
+            + "INSERT INTO orders "
+            "(customer_id, order_date, status, shipping_address_id, billing_address_id, total_amount) "
+            f"SELECT c, datetime('2023-01-01', '+' || ({_hash('x', 7)} % 730) || ' days', "
+            f"'+' || ({_hash('x', 8)} % 86400) || ' seconds'), "
+            f"CASE {_hash('x', 9)} % 4 WHEN 0 THEN 'pending' WHEN 1 THEN 'processing' "
+            "WHEN 2 THEN 'shipped' ELSE 'delivered' END, "
+            "2 * c - 1, 2 * c - 1 + (x % 2), 0 "
+            f"FROM (SELECT x, {_hash('x', 10)} % {sizes['customers']} + 1 AS c FROM seq)"
+        )
+        conn.execute(
+            _sequence(order_items)
+            + "INSERT INTO order_items (order_id, product_id, quantity, unit_price, subtotal) "
+            "SELECT o, p.product_id, q, p.price, ROUND(p.price * q, 2) "
+            f"FROM (SELECT (x - 1) % {sizes['orders']} + 1 AS o, "
+            f"{_hash('x', 11)} % {sizes['products']} + 1 AS pid, "
+            f"{_hash('x', 12)} % 5 + 1 AS q FROM seq) "
+            "JOIN products p ON p.product_id = pid"
+        )
+        conn.execute(
+            "CREATE TEMP TABLE order_totals (order_id INTEGER PRIMARY KEY, total DECIMAL(10, 2))"
+        )
+        conn.execute(
+            "INSERT INTO order_totals SELECT order_id, ROUND(SUM(subtotal), 2) "
+            "FROM order_items GROUP BY order_id"
+        )
+        conn.execute(
+            "UPDATE orders SET total_amount = "
+            "(SELECT total FROM order_totals t WHERE t.order_id = orders.order_id) "
+            "WHERE order_id IN (SELECT order_id FROM order_totals)"
+        )
+        conn.execute(
+            _sequence(sizes["reviews"])
+            + "INSERT INTO reviews (product_id, customer_id, rating, comment) "
+            f"SELECT {_hash('x', 13)} % {sizes['products']} + 1, "
+            f"{_hash('x', 14)} % {sizes['customers']} + 1, "
+            f"{_hash('x', 15)} % 5 + 1, 'Review ' || x FROM seq"
+        )
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    return f"sqlite:///{path}"
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+DEFAULT_SQL = "SELECT COUNT(*) AS order_count FROM orders"
+
+# SQL replayed for EcommerceDBChat._get_sample_queries (SQLite dialect)
+SAMPLE_SQL = {
+    "What are the top 5 selling products by quantity?":
+        "SELECT p.name, SUM(oi.quantity) AS total_quantity FROM order_items oi "
+        "JOIN products p ON p.product_id = oi.product_id "
+        "GROUP BY p.product_id, p.name ORDER BY total_quantity DESC LIMIT 5",
+    "Show me the total revenue for each product category":
+        "SELECT c.name AS category, SUM(oi.subtotal) AS revenue FROM order_items oi "
+        "JOIN products p ON p.product_id = oi.product_id "
+        "JOIN categories c ON c.category_id = p.category_id "
+        "GROUP BY c.category_id, c.name ORDER BY revenue DESC",
+    "What's the average order value per customer?":
+        "SELECT c.customer_id, c.first_name, c.last_name, AVG(o.total_amount) AS avg_order_value "
+        "FROM customers c JOIN orders o ON o.customer_id = c.customer_id "
+        "GROUP BY c.customer_id, c.first_name, c.last_name ORDER BY avg_order_value DESC",
+    "List products with stock quantity less than 10":
+        "SELECT product_id, name, stock_quantity FROM products WHERE stock_quantity < 10 "
+        "ORDER BY stock_quantity",
+    "Show me product categories and their subcategories":
+        "SELECT parent.name AS category, child.name AS subcategory FROM categories parent "
+        "JOIN categories child ON child.parent_category_id = parent.category_id "
+        "ORDER BY parent.name, child.name",
+    "What are the top-rated products with at least 3 reviews?":
+        "SELECT p.name, AVG(r.rating) AS avg_rating, COUNT(*) AS review_count FROM reviews r "
+        "JOIN products p ON p.product_id = r.product_id GROUP BY p.product_id, p.name "
+        "HAVING COUNT(*) >= 3 ORDER BY avg_rating DESC LIMIT 10",
+    "Show me monthly sales trends":
+        "SELECT strftime('%Y-%m', order_date) AS month, COUNT(*) AS orders, "
+        "SUM(total_amount) AS revenue FROM orders GROUP BY month ORDER BY month",
+    "List customers who made purchases above $500":
+        "SELECT DISTINCT c.customer_id, c.first_name, c.last_name FROM customers c "
+        "JOIN orders o ON o.customer_id = c.customer_id WHERE o.total_amount > 500",
+    "What's the distribution of order statuses?":
+        "SELECT status, COUNT(*) AS order_count FROM orders GROUP BY status ORDER BY order_count DESC",
+    "Show me the most popular products in each category":
+        "SELECT category, name, total_quantity FROM ("
+        "SELECT c.name AS category, p.name, SUM(oi.quantity) AS total_quantity, "
+        "RANK() OVER (PARTITION BY c.category_id ORDER BY SUM(oi.quantity) DESC) AS category_rank "
+        "FROM order_items oi JOIN products p ON p.product_id = oi.product_id "
+        "JOIN categories c ON c.category_id = p.category_id "
+        "GROUP BY c.category_id, c.name, p.product_id, p.name) ranked "
+        "WHERE category_rank = 1 ORDER BY category",
+}
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic stand-in for ChatOpenAI.
+
+    It answers the single-call SQL generation prompt with SQL, and the ReAct
+    SQL agent prompt with one ``sql_db_query`` action followed by a final
+    answer, replaying the SQL registered for the known question that appears
+    first in the prompt (``default_sql`` if none does), so with few-shot
+    examples in the prompt it copies the nearest one. ``latency`` simulates
+    the network round trip of a hosted model.
+    """
+
+    replay_sql: Dict[str, str] = {}
+    default_sql: str = DEFAULT_SQL
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat"
+
+    def _find_sql(self, prompt: str) -> str:
+        found = [(prompt.find(question), sql) for question, sql in self.replay_sql.items() if question in prompt]
+        return min(found)[1] if found else self.default_sql
+
+    def _respond(self, prompt: str) -> str:
+        sql = self._find_sql(prompt)
+        if prompt.rstrip().endswith("SQLQuery:"):
+            return sql
+        scratchpad = prompt.rsplit("Question:", 1)[-1]
+        if "Observation:" in scratchpad:
+            return "Thought: I now know the final answer\nFinal Answer: The query returned the rows above."
+        return f"Thought: I should query the database.\nAction: sql_db_query\nAction Input: {sql}"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Waits like an HTTP client on the event loop, without a thread
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = self._respond(prompt)
+        # Roughly four characters per token, like the hosted models report
+        usage = {
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": len(text) // 4,
+            "total_tokens": len(prompt) // 4 + len(text) // 4,
+        }
+        message = AIMessage(content=text, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+class FakeLLMServer:
+    """OpenAI-compatible HTTP server backed by ScriptedChatModel's replies.
+
+    A stand-in for a local llama.cpp/vLLM server: it serves
+    ``/v1/chat/completions`` and ``/v1/completions`` (with a list of prompts
+    generated as one batch), and like a single GPU runs one forward pass at
+    a time, each taking ``latency`` seconds plus ``per_prompt`` seconds for
+    every prompt in the batch. ``requests`` counts the HTTP calls served.
+    """
+
+    def __init__(self, replay_sql: Dict[str, str], latency: float = 0.2, per_prompt: float = 0.01):
+        self.model = ScriptedChatModel(replay_sql=replay_sql)
+        self.latency = latency
+        self.per_prompt = per_prompt
+        self.requests = 0
+        self._device = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def generate(self, prompts: List[str], stop: Optional[List[str]]) -> List[str]:
+        with self._device:
+            self.requests += 1
+            time.sleep(self.latency + self.per_prompt * len(prompts))
+        texts = []
+        for prompt in prompts:
+            text = self.model._respond(prompt)
+            for marker in stop or []:
+                text = text.split(marker, 1)[0]
+            texts.append(text)
+        return texts
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stop = body.get("stop")
+                stop = [stop] if isinstance(stop, str) else stop
+                if self.path.endswith("/chat/completions"):
+                    prompt = "\n".join(str(message["content"]) for message in body["messages"])
+                    text = server.generate([prompt], stop)[0]
+                    choices = [{
+                        "index": 0, "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": text},
+                    }]
+                    prompts, texts = [prompt], [text]
+                    kind = "chat.completion"
+                elif self.path.endswith("/completions"):
+                    prompts = body["prompt"] if isinstance(body["prompt"], list) else [body["prompt"]]
+                    texts = server.generate(prompts, stop)
+                    choices = [
+                        {"index": i, "finish_reason": "stop", "text": text, "logprobs": None}
+                        for i, text in enumerate(texts)
+                    ]
+                    kind = "text_completion"
+                else:
+                    self.send_error(404)
+                    return
+                # Roughly four characters per token, like ScriptedChatModel
+                prompt_tokens = sum(len(prompt) for prompt in prompts) // 4
+                completion_tokens = sum(len(text) for text in texts) // 4
+                payload = json.dumps({
+                    "id": "fake", "object": kind, "created": int(time.time()), "model": body.get("model", "local"),
+                    "choices": choices,
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
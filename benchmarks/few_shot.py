@@ -0,0 +1,147 @@
+"""LLM calls and agent retries saved by the few-shot example store.
+
+Asks paraphrases of the sample questions (none of them worded like a seed
+example) through EcommerceDBChat, against a stub LLM that gets a question
+wrong unless a known question appears in its prompt, in which case it
+copies the SQL of the first one, i.e. the nearest example. Zero-shot,
+every paraphrase fails validation and falls back to the agent; with the
+store it is answered by the fast path if retrieval put the right example
+first. A second pass asks the same paraphrases again, now answered from
+the examples learned on the first.
+
+    python -m benchmarks.few_shot
+    python -m benchmarks.few_shot --k 1 --latency 0.2
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Dict, List
+
+from advanced_chat import EcommerceDBChat
+from src.callbacks import LLMCallCounter
+from src.database import get_engine
+from src.examples_store import SEED_EXAMPLES, ExampleStore
+from src.result_cache import CachedSQLDatabase
+from .dataset import build_sqlite_db
+from .fakes import SAMPLE_SQL, ScriptedChatModel
+from .summary_tables import same_rows
+
+# Sample question -> ways users ask it that the stub LLM does not know
+PARAPHRASES = {
+    "What are the top 5 selling products by quantity?": [
+        "Which 5 products sold the most units?",
+        "Top 5 best sellers by units sold",
+    ],
+    "Show me the total revenue for each product category": [
+        "Revenue by category",
+        "How much money did each category bring in?",
+    ],
+    "What's the average order value per customer?": [
+        "How much do customers spend per order on average?",
+        "Average order amount for every customer",
+    ],
+    "List products with stock quantity less than 10": [
+        "Which items are almost out of stock?",
+        "Products with fewer than 10 in stock",
+    ],
+    "Show me product categories and their subcategories": [
+        "List the category hierarchy",
+        "Which subcategories does each category have?",
+    ],
+    "What are the top-rated products with at least 3 reviews?": [
+        "Best reviewed products",
+        "Products with the highest average rating",
+    ],
+    "Show me monthly sales trends": [
+        "Sales per month",
+        "How did revenue develop month by month?",
+    ],
+    "List customers who made purchases above $500": [
+        "Customers with orders over $500",
+        "Who bought something for more than $500?",
+    ],
+    "What's the distribution of order statuses?": [
+        "How many orders are in each status?",
+        "Order count by status",
+    ],
+    "Show me the most popular products in each category": [
+        "Best seller in every category",
+        "Which product sells most within each category?",
+    ],
+}
+
+# Zero-shot answer to anything the stub does not know: fails validation
+WRONG_SQL = "SELECT SUM(amount) FROM sales"
+
+def run_pass(chat: EcommerceDBChat, conn: sqlite3.Connection, counter: LLMCallCounter) -> Dict:
+    calls_before = counter.llm_calls
+    fallbacks = reused = right = 0
+    start = time.perf_counter()
+    questions = [(question, paraphrase) for question, paraphrases in PARAPHRASES.items() for paraphrase in paraphrases]
+    for question, paraphrase in questions:
+        result = chat.process_query(paraphrase)
+        tiers = result["metadata"]["tiers"]
+        fallbacks += len(tiers) > 1
+        reused += tiers[0]["llm_calls"] == 0 and tiers[0]["status"] == "success"
+        sql = result.get("sql_query")
+        if sql and same_rows(conn.execute(sql).fetchall(), conn.execute(SAMPLE_SQL[question]).fetchall()):
+            right += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "questions": len(questions),
+        "llm_calls_per_question": round((counter.llm_calls - calls_before) / len(questions), 2),
+        "agent_fallbacks": fallbacks,
+        "reused": reused,
+        "right_rows": right,
+        "ms_per_question": round(elapsed / len(questions) * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--order-items", type=int, default=10000, help="dataset size (order_items rows)")
+    parser.add_argument("--db", help="SQLite file to use/create (default: temp dir, one per size)")
+    parser.add_argument("--k", type=int, default=3, help="examples per prompt")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per stub LLM call")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.gettempdir(), f"chatwithdb_bench_{args.order_items}.db")
+    db = CachedSQLDatabase(get_engine(build_sqlite_db(db_path, order_items=args.order_items)))
+    counter = LLMCallCounter()
+    llm = ScriptedChatModel(
+        replay_sql=SAMPLE_SQL, default_sql=WRONG_SQL, latency=args.latency, callbacks=[counter]
+    )
+    chat = EcommerceDBChat(db=db, llm=llm, verbose=False)
+    chat.answer_cache.max_entries = 0
+    conn = sqlite3.connect(db_path)
+
+    results: List[Dict] = []
+    # No examples in the prompt and none reused: the store as if absent
+    chat.examples = ExampleStore(db.dialect, k=0, reuse_similarity=0)
+    results.append({"mode": "zero-shot", **run_pass(chat, conn, counter)})
+    chat.examples = ExampleStore(db.dialect, k=args.k)
+    chat.examples.seed(SEED_EXAMPLES)
+    results.append({"mode": "few-shot", **run_pass(chat, conn, counter)})
+    results.append({"mode": "few-shot, 2nd pass", **run_pass(chat, conn, counter)})
+    conn.close()
+
+    print(f"dataset: {db_path}; {results[0]['questions']} paraphrased questions, k={args.k}\n")
+    print(f"{'mode':<20} {'llm/q':>6} {'agent fallbacks':>16} {'reused sql':>11} {'right rows':>11} {'ms/q':>8}")
+    for result in results:
+        print(
+            f"{result['mode']:<20} {result['llm_calls_per_question']:>6.2f} {result['agent_fallbacks']:>16} "
+            f"{result['reused']:>11} {result['right_rows']:>11} {result['ms_per_question']:>8.1f}"
+        )
+    baseline = results[0]
+    for result in results[1:]:
+        print(
+            f"\n{result['mode']}: {baseline['llm_calls_per_question'] - result['llm_calls_per_question']:.2f} "
+            f"LLM calls and {(baseline['agent_fallbacks'] - result['agent_fallbacks']) / result['questions']:.2f} "
+            "agent retries saved per question",
+            end=""
+        )
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""SQL-generation latency and throughput across LLM backends.
+
+Answers the sample questions concurrently through the src/ pipeline (one
+SQL-generation call per question, then the SQL) with the model from
+``get_llm(sql_generation=True)``, for each backend:
+
+  scripted       in-process stub with the same per-call latency and no
+                 limit on concurrent calls, like a hosted API
+  local          LLM_BACKEND=local against a fake OpenAI-compatible server
+                 that, like one GPU, runs one forward pass at a time
+  local-batched  the same server, with concurrent prompts coalesced into
+                 batched /v1/completions requests (LLM_BATCH_WINDOW_MS)
+
+    python -m benchmarks.llm_backends --concurrency 8 --rounds 3
+    python -m benchmarks.llm_backends --latency 0.5 --batch-window-ms 20 --max-batch-size 16
+"""
+import argparse
+import os
+import tempfile
+from typing import Dict
+
+from langchain_community.utilities import SQLDatabase
+
+from src import query_processor
+from src.config import get_llm
+from src.database import get_engine, setup_query_chain
+from src.result_cache import get_result_cache
+from .dataset import build_sqlite_db
+from .fakes import SAMPLE_SQL, FakeLLMServer, ScriptedChatModel
+from .run_benchmark import percentile, run_pipeline
+
+BACKENDS = ("scripted", "local", "local-batched")
+
+def benchmark(name: str, db: SQLDatabase, server: FakeLLMServer, args: argparse.Namespace) -> Dict:
+    os.environ.update({
+        "LLM_BACKEND": "local",
+        "LLM_BASE_URL": server.base_url,
+        "LLM_MODEL": "fake-local",
+        "LLM_BATCH_WINDOW_MS": str(args.batch_window_ms if name == "local-batched" else 0),
+        "LLM_MAX_BATCH_SIZE": str(args.max_batch_size),
+    })
+    if name == "scripted":
+        llm = ScriptedChatModel(replay_sql=SAMPLE_SQL, latency=args.latency + args.per_prompt)
+    else:
+        llm = get_llm(sql_generation=True)
+    chain = setup_query_chain(db, llm)
+
+    def run(question: str) -> None:
+        query_processor.process_query(chain, db, question)
+
+    questions = list(SAMPLE_SQL)
+    run_pipeline(run, questions[:1], 1)
+    requests_before = server.requests
+    measured = run_pipeline(run, questions * args.rounds, args.concurrency)
+    latencies = measured["latencies"]
+    return {
+        "backend": name,
+        "questions": len(latencies),
+        "errors": measured["errors"],
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "throughput_qps": round(len(latencies) / measured["elapsed"], 2),
+        "llm_requests": server.requests - requests_before,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--order-items", type=int, default=10000, help="dataset size (order_items rows)")
+    parser.add_argument("--db", help="SQLite file to use/create (default: temp dir, one per size)")
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the sample questions")
+    parser.add_argument("--concurrency", type=int, default=8, help="questions answered at the same time")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per forward pass of the fake server")
+    parser.add_argument("--per-prompt", type=float, default=0.01, help="extra seconds per prompt in a batch")
+    parser.add_argument("--batch-window-ms", type=float, default=10, help="LLM_BATCH_WINDOW_MS for local-batched")
+    parser.add_argument("--max-batch-size", type=int, default=8, help="LLM_MAX_BATCH_SIZE for local-batched")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="comma-separated backends to run")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.gettempdir(), f"chatwithdb_bench_{args.order_items}.db")
+    db = SQLDatabase(get_engine(build_sqlite_db(db_path, order_items=args.order_items)))
+    # Every round should reach the LLM and the database
+    get_result_cache(db._engine).max_bytes = 0
+    server = FakeLLMServer(SAMPLE_SQL, latency=args.latency, per_prompt=args.per_prompt)
+    print(f"dataset: {db_path}; forward pass {args.latency * 1000:.0f} ms + {args.per_prompt * 1000:.0f} ms/prompt, "
+          f"concurrency {args.concurrency}")
+
+    print(f"\n{'backend':<14} {'p50 ms':>9} {'p95 ms':>9} {'q/s':>7} {'llm requests':>13} {'errors':>7}")
+    try:
+        for name in args.backends.split(","):
+            result = benchmark(name.strip(), db, server, args)
+            print(
+                f"{result['backend']:<14} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+                f"{result['throughput_qps']:>7.2f} {result['llm_requests']:>13} {result['errors']:>7}"
+            )
+    finally:
+        server.close()
+
+if __name__ == "__main__":
+    main()
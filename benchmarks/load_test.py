@@ -0,0 +1,78 @@
+"""Load test for the non-blocking /query path.
+
+Runs EcommerceDBChat against a local SQLite database and a stub LLM with
+simulated latency through the same BoundedExecutor used by app.py, and
+reports throughput at increasing concurrency limits. The answer cache, the
+SQL result cache and example reuse are off (unless asked for), so every
+request calls the LLM and runs its SQL and the numbers reflect the
+executor's concurrency rather than cache hits.
+
+    python -m benchmarks.load_test --requests 64 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from langchain_community.utilities import SQLDatabase
+
+from advanced_chat import EcommerceDBChat
+from src.callbacks import LLMCallCounter
+from src.executor import BoundedExecutor
+from src.result_cache import get_result_cache
+from .dataset import build_sqlite_db
+from .fakes import SAMPLE_SQL, ScriptedChatModel
+
+async def run_level(chat: EcommerceDBChat, concurrency: int, requests: int) -> float:
+    """Fire all requests at once and return the achieved throughput (req/s)."""
+    executor = BoundedExecutor(max_workers=concurrency, max_queue=requests)
+    questions = chat._get_sample_queries()
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(
+            executor.run(chat.process_query, questions[i % len(questions)])
+            for i in range(requests)
+        ))
+    finally:
+        executor.shutdown()
+    elapsed = time.perf_counter() - start
+
+    failed = sum(1 for result in results if result["status"] != "success")
+    if failed:
+        print(f"  warning: {failed} of {requests} requests failed")
+    return requests / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated seconds per LLM call")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated concurrency limits")
+    parser.add_argument("--answer-cache", action="store_true", help="keep the answer cache and example reuse on")
+    parser.add_argument("--result-cache", action="store_true", help="keep the SQL result cache on")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.gettempdir(), "chatwithdb_load_test.db")
+    db_url = build_sqlite_db(db_path, order_items=1000)
+    db = SQLDatabase.from_uri(db_url, engine_args={"connect_args": {"check_same_thread": False}})
+    counter = LLMCallCounter()
+    llm = ScriptedChatModel(replay_sql=SAMPLE_SQL, latency=args.latency, callbacks=[counter])
+    chat = EcommerceDBChat(db=db, llm=llm, verbose=False)
+    if not args.answer_cache:
+        chat.answer_cache.max_entries = 0
+        chat.examples.reuse_similarity = 0
+    if not args.result_cache:
+        get_result_cache(db._engine).max_bytes = 0
+
+    print(f"{args.requests} requests per level, {args.latency:.2f}s simulated LLM latency\n")
+    print(f"{'concurrency':>12} {'req/s':>10} {'speedup':>10} {'llm/req':>8}")
+    baseline = None
+    for level in (int(value) for value in args.levels.split(",")):
+        calls_before = counter.llm_calls
+        throughput = asyncio.run(run_level(chat, level, args.requests))
+        baseline = baseline or throughput
+        llm_per_request = (counter.llm_calls - calls_before) / args.requests
+        print(f"{level:>12} {throughput:>10.2f} {throughput / baseline:>9.1f}x {llm_per_request:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Several worker processes with and without a shared cache store.
+
+Starts N worker processes, each building its own EcommerceDBChat against the
+same SQLite database with the stub LLM, like ``uvicorn --workers N`` would.
+Every round deals the sample questions out to the workers round-robin,
+shifted by one worker per round, so a repeated question usually lands on a
+worker that has not answered it before. Reports worker warm-up time
+(start-up plus first schema snapshot), answer cache hits and LLM calls,
+once with local caches only and once with SHARED_STORE_URL pointing at a
+SQLite store.
+
+    python -m benchmarks.multi_worker --workers 4 --rounds 3
+    python -m benchmarks.multi_worker --order-items 1000000 --latency 0.5
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from .dataset import build_sqlite_db
+from .fakes import SAMPLE_SQL
+
+def worker(db_url: str, latency: float, rounds: List[List[str]], start_barrier, results) -> None:
+    # Imported here so every spawned worker pays its own start-up, like a real one
+    start = time.perf_counter()
+    from langchain_community.utilities import SQLDatabase
+
+    from advanced_chat import EcommerceDBChat
+    from src.callbacks import LLMCallCounter
+    from src.database import get_engine
+    from .fakes import ScriptedChatModel
+
+    counter = LLMCallCounter()
+    llm = ScriptedChatModel(replay_sql=SAMPLE_SQL, latency=latency, callbacks=[counter])
+    chat = EcommerceDBChat(db=SQLDatabase(get_engine(db_url)), llm=llm, verbose=False)
+    chat._get_schema_snapshot()
+    warm_up = time.perf_counter() - start
+
+    errors = 0
+    for questions in rounds:
+        # Every worker finishes a round before any starts the next, so a
+        # repeated question can be served from what a peer stored
+        start_barrier.wait()
+        for question in questions:
+            if chat.process_query(question)["status"] != "success":
+                errors += 1
+    stats = chat.answer_cache.stats()
+    results.put({
+        "warm_up": warm_up,
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "llm_calls": counter.llm_calls,
+        "errors": errors,
+    })
+
+def run(db_url: str, args: argparse.Namespace, store_url: str) -> Dict:
+    os.environ["SHARED_STORE_URL"] = store_url
+    questions = list(SAMPLE_SQL)
+    # rounds[w][r]: the questions worker w answers in round r
+    rounds = [[[] for _ in range(args.rounds)] for _ in range(args.workers)]
+    for r in range(args.rounds):
+        for i, question in enumerate(questions):
+            rounds[(i + r) % args.workers][r].append(question)
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(args.workers)
+    results = context.Queue()
+    start = time.perf_counter()
+    processes = [
+        context.Process(target=worker, args=(db_url, args.latency, rounds[w], barrier, results))
+        for w in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {
+        "elapsed": time.perf_counter() - start,
+        "warm_up_max": max(o["warm_up"] for o in outcomes),
+        "warm_up_total": sum(o["warm_up"] for o in outcomes),
+        "hits": sum(o["hits"] for o in outcomes),
+        "misses": sum(o["misses"] for o in outcomes),
+        "llm_calls": sum(o["llm_calls"] for o in outcomes),
+        "errors": sum(o["errors"] for o in outcomes),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--order-items", type=int, default=10000, help="dataset size (order_items rows)")
+    parser.add_argument("--db", help="SQLite file to use/create (default: temp dir, one per size)")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes")
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the sample questions")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per LLM call")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.gettempdir(), f"chatwithdb_bench_{args.order_items}.db")
+    db_url = build_sqlite_db(db_path, order_items=args.order_items)
+    print(f"dataset: {db_path} ({args.order_items} order_items), {args.workers} workers, {args.rounds} rounds")
+    # Each run starts cold: no schema snapshot on disk, an empty store
+    os.environ["SCHEMA_CACHE_DIR"] = ""
+    store_dir = tempfile.mkdtemp(prefix="chatwithdb_store_")
+
+    print(f"\n{'store':<8} {'elapsed s':>10} {'warm-up max s':>14} {'warm-up sum s':>14} "
+          f"{'hits':>6} {'misses':>7} {'llm calls':>10} {'errors':>7}")
+    for name, store_url in (("none", ""), ("sqlite", f"sqlite:///{store_dir}/shared.db")):
+        result = run(db_url, args, store_url)
+        print(
+            f"{name:<8} {result['elapsed']:>10.2f} {result['warm_up_max']:>14.2f} {result['warm_up_total']:>14.2f} "
+            f"{result['hits']:>6} {result['misses']:>7} {result['llm_calls']:>10} {result['errors']:>7}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""End-to-end benchmark of the query pipelines, fully offline.
+
+Runs the sample questions through EcommerceDBChat (advanced_chat.py), the
+db_chat.py chain and the src/ pipeline, against a deterministic SQLite
+database of the requested size and a stub LLM that replays known SQL for
+each question. Reports p50/p95 latency, throughput, LLM calls per question
+and memory: "py heap MB" is the peak of Python allocations during one pass
+over the questions (tracemalloc; native and driver memory not included),
+"RSS +MB" how much the pipeline (set-up included) raised the process's peak
+resident memory. The peak only grows, so a pipeline that fits in memory
+an earlier one already used shows about 0.
+
+    python -m benchmarks.run_benchmark --order-items 100000 --rounds 5
+    python -m benchmarks.run_benchmark --pipelines advanced --json results.json
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from langchain.chains import create_sql_query_chain
+from langchain_community.utilities import SQLDatabase
+
+import db_chat
+from advanced_chat import EcommerceDBChat
+from src import query_processor
+from src.callbacks import LLMCallCounter
+from src.database import get_engine, setup_query_chain
+from src.result_cache import get_result_cache
+from .dataset import build_sqlite_db
+from .fakes import SAMPLE_SQL, ScriptedChatModel
+
+def build_advanced(db: SQLDatabase, llm: ScriptedChatModel, answer_cache: bool) -> Callable[[str], None]:
+    chat = EcommerceDBChat(db=db, llm=llm, verbose=False)
+    if not answer_cache:
+        # Measure the pipeline itself rather than cache hits on repeated
+        # rounds, or sample questions answered with their seed example's SQL
+        chat.answer_cache.max_entries = 0
+        chat.examples.reuse_similarity = 0
+
+    def run(question: str) -> None:
+        result = chat.process_query(question)
+        if result["status"] != "success":
+            raise RuntimeError(result["result"])
+    return run
+
+def build_db_chat(db: SQLDatabase, llm: ScriptedChatModel, answer_cache: bool) -> Callable[[str], None]:
+    chain = create_sql_query_chain(llm, db)
+    return lambda question: db_chat.process_query(chain, db, question)
+
+def build_src(db: SQLDatabase, llm: ScriptedChatModel, answer_cache: bool) -> Callable[[str], None]:
+    chain = setup_query_chain(db, llm)
+    return lambda question: query_processor.process_query(chain, db, question)
+
+PIPELINES = {
+    "advanced": build_advanced,
+    "db_chat": build_db_chat,
+    "src": build_src,
+}
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def run_pipeline(run: Callable[[str], None], questions: List[str], concurrency: int) -> Dict:
+    """Answer every question once, returning per-question latencies and errors."""
+    # list.append is atomic, so worker threads can record into shared lists
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    def timed(question: str) -> None:
+        start = time.perf_counter()
+        try:
+            run(question)
+        except Exception as e:
+            errors.append(str(e))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        for question in questions:
+            timed(question)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, questions))
+    return {"latencies": latencies, "errors": len(errors), "elapsed": time.perf_counter() - start}
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def benchmark(name: str, db: SQLDatabase, args: argparse.Namespace) -> Dict:
+    rss_before = max_rss_mb()
+    counter = LLMCallCounter()
+    llm = ScriptedChatModel(replay_sql=SAMPLE_SQL, latency=args.latency, callbacks=[counter])
+    run = PIPELINES[name](db, llm, args.answer_cache)
+    questions = list(SAMPLE_SQL)
+
+    # Warm-up pass: schema reflection, cache files and sqlglot imports
+    run_pipeline(run, questions, 1)
+    calls_before = counter.llm_calls
+
+    measured = run_pipeline(run, questions * args.rounds, args.concurrency)
+    llm_calls = counter.llm_calls - calls_before
+
+    # Memory is measured on a separate pass so tracing does not skew latency
+    tracemalloc.start()
+    run_pipeline(run, questions, 1)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = measured["latencies"]
+    return {
+        "pipeline": name,
+        "questions": len(latencies),
+        "errors": measured["errors"],
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "throughput_qps": round(len(latencies) / measured["elapsed"], 2),
+        "llm_calls_per_question": round(llm_calls / len(latencies), 2),
+        "python_heap_peak_mb": round(peak_bytes / 1024 / 1024, 2),
+        "max_rss_growth_mb": round(max_rss_mb() - rss_before, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--order-items", type=int, default=10000, help="dataset size (order_items rows)")
+    parser.add_argument("--db", help="SQLite file to use/create (default: temp dir, one per size)")
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the sample questions")
+    parser.add_argument("--concurrency", type=int, default=1, help="questions answered at the same time")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per LLM call")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES), help="comma-separated pipelines to run")
+    parser.add_argument("--answer-cache", action="store_true", help="keep EcommerceDBChat's answer cache on")
+    parser.add_argument("--result-cache", action="store_true", help="keep the SQL result cache on")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.gettempdir(), f"chatwithdb_bench_{args.order_items}.db")
+    start = time.perf_counter()
+    db_url = build_sqlite_db(db_path, order_items=args.order_items)
+    print(f"dataset: {db_path} ({args.order_items} order_items, ready in {time.perf_counter() - start:.1f}s)")
+    db = SQLDatabase(get_engine(db_url))
+    if not args.result_cache:
+        # Repeated rounds would otherwise be served from cached rows
+        get_result_cache(db._engine).max_bytes = 0
+
+    results = []
+    print(
+        f"\n{'pipeline':<10} {'p50 ms':>9} {'p95 ms':>9} {'q/s':>9} {'llm/q':>7} "
+        f"{'py heap MB':>11} {'RSS +MB':>8} {'errors':>7}"
+    )
+    for name in args.pipelines.split(","):
+        result = benchmark(name.strip(), db, args)
+        results.append(result)
+        print(
+            f"{result['pipeline']:<10} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+            f"{result['throughput_qps']:>9.2f} {result['llm_calls_per_question']:>7.2f} "
+            f"{result['python_heap_peak_mb']:>11.2f} {result['max_rss_growth_mb']:>8.1f} {result['errors']:>7}"
+        )
+    print(f"\nprocess max RSS: {max_rss_mb():.1f} MB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "order_items": args.order_items,
+                "rounds": args.rounds,
+                "concurrency": args.concurrency,
+                "latency": args.latency,
+                "max_rss_mb": round(max_rss_mb(), 1),
+                "results": results,
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
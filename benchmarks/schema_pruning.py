@@ -0,0 +1,73 @@
+"""Prompt-size and recall benchmark for relevance-pruned schema context.
+
+For every sample question, compares the schema text sent with the full
+schema against the tables chosen by SchemaIndex, and checks that the tables
+the question actually needs were kept.
+
+    python -m benchmarks.schema_pruning --top-k 3
+"""
+import argparse
+import os
+import tempfile
+
+from langchain_community.utilities import SQLDatabase
+
+from src.schema_cache import introspect_schema
+from src.schema_index import SchemaIndex
+from .dataset import build_sqlite_db
+
+# Tables each sample question from EcommerceDBChat._get_sample_queries needs
+REQUIRED_TABLES = {
+    "What are the top 5 selling products by quantity?": {"products", "order_items"},
+    "Show me the total revenue for each product category": {"categories", "products", "order_items"},
+    "What's the average order value per customer?": {"orders", "customers"},
+    "List products with stock quantity less than 10": {"products"},
+    "Show me product categories and their subcategories": {"categories"},
+    "What are the top-rated products with at least 3 reviews?": {"products", "reviews"},
+    "Show me monthly sales trends": {"orders"},
+    "List customers who made purchases above $500": {"customers", "orders"},
+    "What's the distribution of order statuses?": {"orders"},
+    "Show me the most popular products in each category": {"products", "categories", "order_items"},
+}
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens with tiktoken when available, else approximate."""
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    except Exception:
+        return max(1, len(text) // 4)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, default=3, help="tables selected before FK expansion")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.gettempdir(), "chatwithdb_schema_pruning.db")
+    db = SQLDatabase.from_uri(build_sqlite_db(db_path, order_items=1000))
+    snapshot = introspect_schema(db)
+    index = SchemaIndex(snapshot)
+    full_tokens = count_tokens(snapshot.table_info())
+
+    total_pruned = 0
+    total_recall = 0.0
+    print(f"{'question':<58} {'tables':>6} {'tokens':>7} {'recall':>7}")
+    for question, required in REQUIRED_TABLES.items():
+        selected = index.select_tables(question, top_k=args.top_k)
+        tokens = count_tokens(snapshot.table_info(selected))
+        recall = len(required & set(selected)) / len(required)
+        total_pruned += tokens
+        total_recall += recall
+        missing = ", ".join(sorted(required - set(selected)))
+        print(f"{question[:58]:<58} {len(selected):>6} {tokens:>7} {recall:>7.0%}"
+              + (f"  missing: {missing}" if missing else ""))
+
+    count = len(REQUIRED_TABLES)
+    average = total_pruned / count
+    print(f"\nFull schema: {len(snapshot.tables)} tables, {full_tokens} tokens per prompt")
+    print(f"Pruned:      {average:.0f} tokens per prompt on average "
+          f"({1 - average / full_tokens:.0%} reduction)")
+    print(f"Recall of required tables: {total_recall / count:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Start-up cost of the server and the CLIs, against an import-time budget.
+
+Imports each entry point in a fresh interpreter under ``python -X
+importtime`` and reports the cumulative import time of the module, the
+wall time of the whole process and the heaviest imports it pulled in. For
+app.py it also times how long the background warm-up takes until /ready
+would answer 200. Nothing connects to OpenAI; the database is a generated
+SQLite file.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 5 --check
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from .dataset import build_sqlite_db
+
+# Cumulative import time allowed per entry point, in milliseconds
+IMPORT_BUDGET_MS = {
+    "app": 1000,
+    "db_chat": 300,
+    "sqlite_chat": 300,
+    "src.main": 300,
+}
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def parse_importtime(stderr: str) -> List[Tuple[int, int, str]]:
+    """(depth, cumulative microseconds, module) for every -X importtime line."""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            entries.append((len(match.group(3)) // 2, int(match.group(2)), match.group(4)))
+    return entries
+
+def measure_import(module: str, env: Dict[str, str]) -> Dict:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    entries = parse_importtime(proc.stderr)
+    total = next(us for depth, us, name in reversed(entries) if name == module and depth == 0)
+    # Third-party packages imported directly by the project's own modules
+    heaviest = sorted(
+        (entry for entry in entries if entry[0] == 1 or (entry[0] == 2 and "." not in entry[2])),
+        key=lambda entry: entry[1], reverse=True
+    )[:3]
+    return {
+        "import_ms": total / 1000,
+        "wall_ms": wall * 1000,
+        "heaviest": [f"{name} {us / 1000:.0f}ms" for _, us, name in heaviest],
+    }
+
+def measure_ready(env: Dict[str, str]) -> float:
+    """Seconds from a cold interpreter to app.py having finished its warm-up."""
+    script = (
+        "import time; start = time.perf_counter(); import app; "
+        "app.chat_warmup.get(); print(time.perf_counter() - start)"
+    )
+    proc = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"app warm-up failed:\n{proc.stderr[-2000:]}")
+    return float(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--order-items", type=int, default=10000, help="dataset size (order_items rows)")
+    parser.add_argument("--db", help="SQLite file to use/create (default: temp dir, one per size)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per entry point; the fastest is reported")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if an import is over budget")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.gettempdir(), f"chatwithdb_bench_{args.order_items}.db")
+    env = {
+        **os.environ,
+        "DATABASE_URL": build_sqlite_db(db_path, order_items=args.order_items),
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-startup-benchmark"),
+        # Cold start: no schema snapshot on disk, no background refresh
+        "SCHEMA_CACHE_DIR": "",
+        "SUMMARY_REFRESH_INTERVAL": "0",
+    }
+
+    over_budget = []
+    print(f"{'entry point':<12} {'import ms':>10} {'budget':>7} {'wall ms':>9}  heaviest imports")
+    for module, budget in IMPORT_BUDGET_MS.items():
+        runs = [measure_import(module, env) for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run["import_ms"])
+        wall = min(run["wall_ms"] for run in runs)
+        flag = "" if best["import_ms"] <= budget else " OVER"
+        if flag:
+            over_budget.append(module)
+        print(f"{module:<12} {best['import_ms']:>10.1f} {budget:>7} {wall:>9.1f}  {', '.join(best['heaviest'])}{flag}")
+
+    ready = min(measure_ready(env) for _ in range(args.repeat))
+    print(f"\napp.py import + warm-up until ready: {ready * 1000:.1f} ms")
+
+    if args.check and over_budget:
+        print(f"over the import-time budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Query time on the raw tables vs. the precomputed summary tables.
+
+Builds (or reuses) a deterministic SQLite database, creates and fills the
+summary tables from src/summary_tables.py, then times each analytics
+question as written against the raw tables and as rewritten against the
+summaries, checking that both return the same rows.
+
+    python -m benchmarks.summary_tables --order-items 10000000
+    python -m benchmarks.summary_tables --order-items 100000 --repeat 5
+"""
+import argparse
+import math
+import os
+import sqlite3
+import tempfile
+import time
+from typing import List, Tuple
+
+from sqlalchemy import create_engine
+
+from src.summary_tables import SummaryManager
+from .dataset import build_sqlite_db
+from .fakes import SAMPLE_SQL
+
+# Sample question -> the same answer from the summary tables
+SUMMARY_SQL = {
+    "What are the top 5 selling products by quantity?":
+        "SELECT p.name, SUM(s.units_sold) AS total_quantity FROM summary_monthly_product_sales s "
+        "JOIN products p ON p.product_id = s.product_id "
+        "GROUP BY p.product_id, p.name ORDER BY total_quantity DESC LIMIT 5",
+    "Show me the total revenue for each product category":
+        "SELECT c.name AS category, SUM(s.revenue) AS revenue FROM summary_daily_category_sales s "
+        "JOIN categories c ON c.category_id = s.category_id "
+        "GROUP BY c.category_id, c.name ORDER BY revenue DESC",
+    "What's the average order value per customer?":
+        "SELECT c.customer_id, c.first_name, c.last_name, s.total_spent * 1.0 / s.order_count AS avg_order_value "
+        "FROM customers c JOIN summary_customer_orders s ON s.customer_id = c.customer_id "
+        "ORDER BY avg_order_value DESC",
+    "What are the top-rated products with at least 3 reviews?":
+        "SELECT p.name, s.avg_rating, s.review_count FROM summary_product_ratings s "
+        "JOIN products p ON p.product_id = s.product_id WHERE s.review_count >= 3 "
+        "ORDER BY s.avg_rating DESC LIMIT 10",
+    "Show me monthly sales trends":
+        "SELECT strftime('%Y-%m', order_day) AS month, SUM(order_count) AS orders, "
+        "SUM(revenue) AS revenue FROM summary_daily_orders GROUP BY month ORDER BY month",
+    "Show me the most popular products in each category":
+        "SELECT category, name, total_quantity FROM ("
+        "SELECT c.name AS category, p.name, SUM(s.units_sold) AS total_quantity, "
+        "RANK() OVER (PARTITION BY c.category_id ORDER BY SUM(s.units_sold) DESC) AS category_rank "
+        "FROM summary_monthly_product_sales s JOIN products p ON p.product_id = s.product_id "
+        "JOIN categories c ON c.category_id = s.category_id "
+        "GROUP BY c.category_id, c.name, p.product_id, p.name) ranked "
+        "WHERE category_rank = 1 ORDER BY category",
+}
+
+def timed(conn: sqlite3.Connection, sql: str, repeat: int) -> Tuple[float, List[Tuple]]:
+    """Best-of-repeat seconds and the rows of the last run."""
+    best = float("inf")
+    rows: List[Tuple] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(sql).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best, rows
+
+def same_rows(raw: List[Tuple], summary: List[Tuple]) -> bool:
+    # Ties may come back in another order, and sums of decimals differ in
+    # the last float digits depending on how they were grouped
+    def ordered(rows: List[Tuple]) -> List[Tuple]:
+        return sorted(rows, key=lambda row: (
+            [v for v in row if not isinstance(v, float)], [v for v in row if isinstance(v, float)]
+        ))
+
+    if len(raw) != len(summary):
+        return False
+    for raw_row, summary_row in zip(ordered(raw), ordered(summary)):
+        for a, b in zip(raw_row, summary_row):
+            if isinstance(a, float) or isinstance(b, float):
+                if not math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6):
+                    return False
+            elif a != b:
+                return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--order-items", type=int, default=10_000_000, help="dataset size (order_items rows)")
+    parser.add_argument("--db", help="SQLite file to use/create (default: temp dir, one per size)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per query; the fastest is reported")
+    args = parser.parse_args()
+
+    # A separate file from run_benchmark's, whose schema stays untouched
+    db_path = args.db or os.path.join(tempfile.gettempdir(), f"chatwithdb_summary_{args.order_items}.db")
+    start = time.perf_counter()
+    db_url = build_sqlite_db(db_path, order_items=args.order_items)
+    print(f"dataset: {db_path} ({args.order_items} order_items, ready in {time.perf_counter() - start:.1f}s)")
+
+    manager = SummaryManager(create_engine(db_url))
+    manager.create()
+    start = time.perf_counter()
+    processed = manager.refresh()
+    print(f"summary refresh: {sum(processed.values()):,} source rows in {time.perf_counter() - start:.1f}s\n")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        print(f"{'question':<58} {'raw ms':>10} {'summary ms':>11} {'speedup':>8} {'same':>5}")
+        for question, summary_sql in SUMMARY_SQL.items():
+            raw_seconds, raw_rows = timed(conn, SAMPLE_SQL[question], args.repeat)
+            summary_seconds, summary_rows = timed(conn, summary_sql, args.repeat)
+            print(
+                f"{question[:58]:<58} {raw_seconds * 1000:>10.1f} {summary_seconds * 1000:>11.1f} "
+                f"{raw_seconds / max(summary_seconds, 1e-9):>7.1f}x "
+                f"{'yes' if same_rows(raw_rows, summary_rows) else 'NO':>5}"
+            )
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
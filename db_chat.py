@@ -1,22 +1,33 @@
-from typing import Any, NoReturn, Tuple
+from typing import TYPE_CHECKING, Any, NoReturn, Tuple
 import os
 import sys
 from dotenv import load_dotenv
 from rich.console import Console
-from langchain_openai import ChatOpenAI
-from langchain_community.utilities import SQLDatabase
-from langchain.chains.sql_database.query import create_sql_query_chain
-from langchain_core.prompts import ChatPromptTemplate
+from src.cli import build_table
+from src.config import get_int_env, get_llm
+from src.warmup import Warmup
+
+if TYPE_CHECKING:
+    from langchain_community.utilities import SQLDatabase
+    from src.results import QueryResult
 
 # Initialize console for rich output
 console = Console()
 
-def setup_environment() -> Tuple[SQLDatabase, Any]:
+def setup_environment() -> Tuple["SQLDatabase", Any, Any]:
     """Setup database and LLM connections."""
+    # langchain and the OpenAI SDK take seconds to import, so they are
+    # loaded here, behind the welcome message, rather than at module import
+    from langchain_community.utilities import SQLDatabase
+    from langchain.chains.sql_database.query import create_sql_query_chain
+    from src.database import get_engine
+    from src.examples_store import few_shot_prompt, get_example_store
+    from src.summary_tables import describe_summary_tables
+
     load_dotenv()
     
-    # Validate environment variables
-    required_vars = ["DB_USER", "DB_PASSWORD", "DB_NAME", "OPENAI_API_KEY"]
+    # Validate environment variables (get_llm checks the LLM backend's own)
+    required_vars = ["DB_USER", "DB_PASSWORD", "DB_NAME"]
     missing_vars = [var for var in required_vars if not os.getenv(var)]
     if missing_vars:
         raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
@@ -27,46 +38,50 @@ def setup_environment() -> Tuple[SQLDatabase, Any]:
               f"/{os.getenv('DB_NAME')}")
     
     try:
-        db = SQLDatabase.from_uri(db_url)
-        llm = ChatOpenAI(
-            model="gpt-4-turbo-preview",
-            temperature=0,
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
-        chain = create_sql_query_chain(llm, db, prompt=None)
-        return db, chain
+        db = SQLDatabase(get_engine(db_url))
+        describe_summary_tables(db)
+        llm = get_llm(sql_generation=True)
+        chain = create_sql_query_chain(llm, db, prompt=few_shot_prompt(db.dialect))
+        return db, chain, get_example_store(db._engine)
     except Exception as e:
         raise ConnectionError(f"Failed to initialize: {str(e)}")
 
-def process_query(chain: Any, db: SQLDatabase, query: str) -> Tuple[str, Any]:
-    """Process a natural language query."""
+def process_query(chain: Any, db: "SQLDatabase", query: str, examples: Any = None) -> Tuple[str, "QueryResult"]:
+    """Process a natural language query, using and growing the example store if given."""
+    from src.results import execute_page
+    from src.sql_validation import clean_sql
+
     try:
-        # Get SQL query from chain
-        sql_query = chain.invoke({"question": query})
-        
-        # Clean up the query by removing any "SQLQuery:" prefix
-        if isinstance(sql_query, str) and sql_query.startswith("SQLQuery:"):
-            sql_query = sql_query.replace("SQLQuery:", "").strip()
+        # Get SQL query from chain (or a stored example), without any
+        # "SQLQuery:" prefix or code fences
+        if examples is not None:
+            sql_query, reused = examples.generate_sql(chain, query)
+        else:
+            sql_query, reused = clean_sql(chain.invoke({"question": query})), False
             
-        # Execute the cleaned query
-        result = db.run(sql_query)
+        # Execute the cleaned query, fetching only the first page of rows
+        result = execute_page(db._engine, sql_query, db.dialect, get_int_env("RESULT_PAGE_SIZE", 100))
+        if examples is not None and not reused:
+            examples.add(query, sql_query)
         return sql_query, result
     except Exception as e:
         raise RuntimeError(f"Error processing query: {str(e)}")
 
-def print_results(sql_query: str, results: Any):
+def print_results(sql_query: str, results: "QueryResult"):
     """Print results in a formatted way."""
     console.print("\n[bold green]Generated SQL:[/bold green]")
     console.print(sql_query)
     
     console.print("\n[bold green]Results:[/bold green]")
-    console.print(results)
+    console.print(build_table(results))
+    if results.has_more:
+        console.print(f"[dim]Showing the first {results.row_count} rows.[/dim]")
 
 def main() -> NoReturn:
     """Main application entry point."""
     try:
-        # Initialize components
-        db, chain = setup_environment()
+        # Connect and build the chain while the user types the first question
+        components = Warmup(lambda warmup: setup_environment(), name="database chat").start()
         
         # Print welcome message
         console.print("[bold blue]Welcome to Database Chat![/bold blue]")
@@ -79,9 +94,10 @@ def main() -> NoReturn:
             if user_input.lower() in ('exit', 'quit'):
                 console.print("[bold blue]Goodbye![/bold blue]")
                 sys.exit(0)
-                
+
+            db, chain, examples = components.get()
             try:
-                sql_query, results = process_query(chain, db, user_input)
+                sql_query, results = process_query(chain, db, user_input, examples)
                 print_results(sql_query, results)
             except Exception as e:
                 console.print(f"[bold red]Error:[/bold red] {str(e)}")
@@ -1,56 +1,79 @@
-import mysql.connector
-from faker import Faker
+"""Generate synthetic e-commerce data at any scale.
+
+Scale 1 matches the original sample (50 products, 50 customers, 100 orders
+with ~300 order items, 200 reviews); every table grows linearly with it.
+Rows are built in batches by worker processes from in-memory lookup tables
+(product prices, addresses per customer), so generating an order never
+queries the database. A single writer bulk-loads the batches with
+executemany, or LOAD DATA LOCAL INFILE on MySQL. The same --seed and
+--batch-size always produce the same data, whatever the number of workers.
+
+    python setup/generate_ecommerce_data.py                       # MySQL, scale 1
+    python setup/generate_ecommerce_data.py --target sqlite --sqlite-path ecommerce.db \\
+        --order-items 10000000 --reset
+    python setup/generate_ecommerce_data.py --scale 1000 --load-data --workers 8
+"""
+import argparse
+import csv
+import getpass
+import multiprocessing
+import multiprocessing.pool
+import os
 import random
+import sqlite3
+import tempfile
+import time
+from array import array
 from datetime import datetime, timedelta
-import json
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 
-fake = Faker()
+from faker import Faker
 
-def connect_to_db():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password=input("Enter MySQL root password: "),
-        database="ecommerce"
-    )
+SQLITE_SCHEMA_PATH = Path(__file__).resolve().parent / "ecommerce_init_sqlite.sql"
 
-def generate_categories(cursor):
-    try:
-        # First, insert main categories
-        main_categories = [
-            ("Electronics", "Electronic devices and accessories"),
-            ("Clothing", "Fashion and apparel"),
-            ("Books", "Books and publications"),
-            ("Home & Garden", "Home improvement and garden supplies"),
-            ("Sports", "Sports equipment and accessories")
-        ]
-        
-        # Insert main categories and get their IDs
-        for name, description in main_categories:
-            cursor.execute(
-                "INSERT INTO categories (name, description, parent_category_id) VALUES (%s, %s, NULL)",
-                (name, description)
-            )
-            parent_id = cursor.lastrowid
-            
-            # Generate and insert sub-categories for this parent
-            sub_categories = [
-                (f"Sub-category {j} of {name}", 
-                 f"Description for sub-category {j}",
-                 parent_id)
-                for j in range(1, 11)
-            ]
-            
-            cursor.executemany(
-                "INSERT INTO categories (name, description, parent_category_id) VALUES (%s, %s, %s)",
-                sub_categories
-            )
-            
-    except Exception as e:
-        print(f"Error in generate_categories: {e}")
-        raise e
+# Columns written for each table; order_items ids are left to AUTO_INCREMENT
+TABLE_COLUMNS = {
+    "categories": ("category_id", "name", "description", "parent_category_id"),
+    "products": ("product_id", "name", "description", "category_id", "price", "stock_quantity", "sku"),
+    "customers": ("customer_id", "first_name", "last_name", "email", "phone"),
+    "addresses": ("address_id", "customer_id", "address_type", "street_address", "city", "state",
+                  "postal_code", "country", "is_default"),
+    "orders": ("order_id", "customer_id", "order_date", "status", "shipping_address_id",
+               "billing_address_id", "total_amount"),
+    "order_items": ("order_id", "product_id", "quantity", "unit_price", "subtotal"),
+    "reviews": ("product_id", "customer_id", "rating", "comment"),
+}
+
+MAIN_CATEGORIES = [
+    ("Electronics", "Electronic devices and accessories"),
+    ("Clothing", "Fashion and apparel"),
+    ("Books", "Books and publications"),
+    ("Home & Garden", "Home improvement and garden supplies"),
+    ("Sports", "Sports equipment and accessories"),
+]
+SUB_CATEGORIES_PER_MAIN = 10
+CATEGORY_COUNT = len(MAIN_CATEGORIES) * (SUB_CATEGORIES_PER_MAIN + 1)
+
+# Each customer owns 1-3 addresses with ids MAX_ADDRESSES * (customer_id - 1) + 1..n,
+# so orders can pick an address without looking it up
+MAX_ADDRESSES = 3
+ORDER_STATUSES = ['pending', 'processing', 'shipped', 'delivered']
+# Orders are spread over the two years before this date (fixed for reproducibility)
+END_DATE = datetime(2025, 1, 1)
+# Distinct Faker values generated per column; rows pick from these pools
+POOL_SIZE = 1000
 
-def generate_product_name():
+def get_table_sizes(scale: float) -> Dict[str, int]:
+    """Row counts for a scale factor (order_items average 3 per order)."""
+    return {
+        "products": max(1, round(50 * scale)),
+        "customers": max(1, round(50 * scale)),
+        "orders": max(1, round(100 * scale)),
+        "reviews": max(1, round(200 * scale)),
+    }
+
+def generate_product_name(rng: random.Random) -> str:
     """Generate a realistic product name"""
     adjectives = ['Premium', 'Deluxe', 'Professional', 'Classic', 'Modern', 'Ultra', 'Smart', 'Essential']
     products = [
@@ -66,40 +89,8 @@ def generate_product_name():
         'Ball', 'Racket', 'Gloves', 'Shoes', 'Bag', 'Mat', 'Weights', 'Helmet'
     ]
     brands = ['TechPro', 'StyleCo', 'HomeLife', 'SportMax', 'EcoBasics', 'LuxuryPlus', 'ValuePro', 'PrimeBrand']
-    
-    return f"{random.choice(adjectives)} {random.choice(brands)} {random.choice(products)}"
-
-def get_category_ids(cursor) -> list:
-    """Get all valid category IDs from the database"""
-    cursor.execute("SELECT category_id FROM categories")
-    return [row[0] for row in cursor.fetchall()]
-
-def generate_products(cursor):
-    # Get valid category IDs first
-    category_ids = get_category_ids(cursor)
-    if not category_ids:
-        raise Exception("No categories found in database")
-    
-    products = []
-    for _ in range(50):
-        # Select a random valid category ID
-        category_id = random.choice(category_ids)
-        product = (
-            generate_product_name(),
-            fake.text(max_nb_chars=200),
-            category_id,
-            round(random.uniform(10, 1000), 2),
-            random.randint(0, 100),
-            fake.ean13()
-        )
-        products.append(product)
-    
-    cursor.executemany(
-        """INSERT INTO products 
-           (name, description, category_id, price, stock_quantity, sku)
-           VALUES (%s, %s, %s, %s, %s, %s)""",
-        products
-    )
+
+    return f"{rng.choice(adjectives)} {rng.choice(brands)} {rng.choice(products)}"
 
 def format_phone_number(phone: str) -> str:
     """Format phone number to fit in VARCHAR(20)"""
@@ -110,166 +101,303 @@ def format_phone_number(phone: str) -> str:
         return f"{digits[:3]}-{digits[3:6]}-{digits[6:10]}"
     return digits[:20]  # Fallback: just return truncated digits
 
-def generate_customers(cursor):
-    customers = []
-    for _ in range(50):
-        customer = (
-            fake.first_name()[:50],  # Limit to 50 chars
-            fake.last_name()[:50],   # Limit to 50 chars
-            fake.email()[:100],      # Limit to 100 chars
-            format_phone_number(fake.phone_number())  # Format phone number
+# Lookup tables shared by the generator functions of a process (set by init_generator)
+_lookups: Dict = {}
+
+def init_generator(seed: int, sizes: Dict[str, int]) -> None:
+    """Build the in-memory lookup tables; runs once per worker process."""
+    fake = Faker()
+    fake.seed_instance(seed)
+    pools = {
+        "first_name": [fake.first_name()[:50] for _ in range(POOL_SIZE)],
+        "last_name": [fake.last_name()[:50] for _ in range(POOL_SIZE)],
+        "phone": [format_phone_number(fake.phone_number()) for _ in range(POOL_SIZE)],
+        "street": [fake.street_address() for _ in range(POOL_SIZE)],
+        "city": [fake.city() for _ in range(POOL_SIZE)],
+        "state": [fake.state() for _ in range(POOL_SIZE)],
+        "postcode": [fake.postcode() for _ in range(POOL_SIZE)],
+        "country": [fake.country() for _ in range(POOL_SIZE)],
+        "text": [fake.text(max_nb_chars=200) for _ in range(POOL_SIZE)],
+    }
+
+    # Product prices and address counts are needed by other tables' rows,
+    # so they come from their own seeded streams rather than per-chunk ones
+    price_rng = random.Random(f"{seed}:prices")
+    prices = array("d", [0.0])
+    prices.extend(round(price_rng.uniform(10, 1000), 2) for _ in range(sizes["products"]))
+    address_rng = random.Random(f"{seed}:addresses")
+    address_counts = bytearray([0])
+    address_counts.extend(address_rng.randint(1, MAX_ADDRESSES) for _ in range(sizes["customers"]))
+
+    _lookups.update(seed=seed, sizes=sizes, pools=pools, prices=prices, address_counts=address_counts)
+
+def _chunk_rng(table: str, start: int) -> random.Random:
+    # Seeded per chunk so output does not depend on which worker ran it
+    return random.Random(f"{_lookups['seed']}:{table}:{start}")
+
+def generate_categories() -> Dict[str, List[Tuple]]:
+    rows = []
+    for name, description in MAIN_CATEGORIES:
+        parent_id = len(rows) + 1
+        rows.append((parent_id, name, description, None))
+        rows.extend(
+            (parent_id + j, f"Sub-category {j} of {name}", f"Description for sub-category {j}", parent_id)
+            for j in range(1, SUB_CATEGORIES_PER_MAIN + 1)
         )
-        customers.append(customer)
-    
-    cursor.executemany(
-        """INSERT INTO customers 
-           (first_name, last_name, email, phone)
-           VALUES (%s, %s, %s, %s)""",
-        customers
-    )
+    return {"categories": rows}
 
-def generate_addresses(cursor):
-    addresses = []
-    for customer_id in range(1, 51):
-        for _ in range(random.randint(1, 3)):
-            address = (
+def generate_products(bounds: Tuple[int, int]) -> Dict[str, List[Tuple]]:
+    start, end = bounds
+    rng = _chunk_rng("products", start)
+    texts = _lookups["pools"]["text"]
+    prices = _lookups["prices"]
+    return {"products": [
+        (
+            product_id,
+            generate_product_name(rng),
+            rng.choice(texts),
+            rng.randint(1, CATEGORY_COUNT),
+            prices[product_id],
+            rng.randint(0, 100),
+            f"SKU-{product_id:010d}",
+        )
+        for product_id in range(start, end)
+    ]}
+
+def generate_customers(bounds: Tuple[int, int]) -> Dict[str, List[Tuple]]:
+    start, end = bounds
+    rng = _chunk_rng("customers", start)
+    pools = _lookups["pools"]
+    address_counts = _lookups["address_counts"]
+    customers, addresses = [], []
+    for customer_id in range(start, end):
+        first_name, last_name = rng.choice(pools["first_name"]), rng.choice(pools["last_name"])
+        # The id keeps emails unique however small the name pools are
+        email = f"{first_name}.{last_name}.{customer_id}@example.com".lower()[:100]
+        customers.append((customer_id, first_name, last_name, email, rng.choice(pools["phone"])))
+        first_address_id = MAX_ADDRESSES * (customer_id - 1) + 1
+        for j in range(address_counts[customer_id]):
+            addresses.append((
+                first_address_id + j,
                 customer_id,
-                random.choice(['home', 'work', 'other']),
-                fake.street_address(),
-                fake.city(),
-                fake.state(),
-                fake.postcode(),
-                fake.country(),
-                random.choice([True, False])
-            )
-            addresses.append(address)
-    
-    cursor.executemany(
-        """INSERT INTO addresses 
-           (customer_id, address_type, street_address, city, state, postal_code, country, is_default)
-           VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
-        addresses
-    )
+                rng.choice(['home', 'work', 'other']),
+                rng.choice(pools["street"]),
+                rng.choice(pools["city"]),
+                rng.choice(pools["state"]),
+                rng.choice(pools["postcode"]),
+                rng.choice(pools["country"]),
+                int(j == 0),
+            ))
+    return {"customers": customers, "addresses": addresses}
 
-def generate_orders(cursor):
-    orders = []
-    order_items = []
-    
-    for _ in range(100):
-        customer_id = random.randint(1, 50)
-        # Get customer's addresses
-        cursor.execute(
-            "SELECT address_id FROM addresses WHERE customer_id = %s",
-            (customer_id,)
-        )
-        customer_addresses = cursor.fetchall()
-        if not customer_addresses:
-            continue
-            
-        shipping_address = random.choice(customer_addresses)[0]
-        billing_address = random.choice(customer_addresses)[0]
-        
-        # Create order
-        order = (
+def generate_orders(bounds: Tuple[int, int]) -> Dict[str, List[Tuple]]:
+    start, end = bounds
+    rng = _chunk_rng("orders", start)
+    sizes = _lookups["sizes"]
+    prices = _lookups["prices"]
+    address_counts = _lookups["address_counts"]
+    orders, order_items = [], []
+    for order_id in range(start, end):
+        customer_id = rng.randint(1, sizes["customers"])
+        first_address_id = MAX_ADDRESSES * (customer_id - 1) + 1
+        shipping_address = first_address_id + rng.randrange(address_counts[customer_id])
+        billing_address = first_address_id + rng.randrange(address_counts[customer_id])
+        order_date = END_DATE - timedelta(seconds=rng.randrange(730 * 86400))
+
+        # The total is known up front, so no UPDATE pass is needed
+        total_amount = 0.0
+        for _ in range(rng.randint(1, 5)):
+            product_id = rng.randint(1, sizes["products"])
+            quantity = rng.randint(1, 5)
+            unit_price = prices[product_id]
+            subtotal = round(unit_price * quantity, 2)
+            total_amount += subtotal
+            order_items.append((order_id, product_id, quantity, unit_price, subtotal))
+        orders.append((
+            order_id,
             customer_id,
-            random.choice(['pending', 'processing', 'shipped', 'delivered']),
+            order_date.strftime("%Y-%m-%d %H:%M:%S"),
+            rng.choice(ORDER_STATUSES),
             shipping_address,
             billing_address,
-            0  # Total amount will be updated later
+            round(total_amount, 2),
+        ))
+    return {"orders": orders, "order_items": order_items}
+
+def generate_reviews(bounds: Tuple[int, int]) -> Dict[str, List[Tuple]]:
+    start, end = bounds
+    rng = _chunk_rng("reviews", start)
+    sizes = _lookups["sizes"]
+    texts = _lookups["pools"]["text"]
+    return {"reviews": [
+        (
+            rng.randint(1, sizes["products"]),
+            rng.randint(1, sizes["customers"]),
+            rng.randint(1, 5),
+            rng.choice(texts),
         )
-        cursor.execute(
-            """INSERT INTO orders 
-               (customer_id, status, shipping_address_id, billing_address_id, total_amount)
-               VALUES (%s, %s, %s, %s, %s)""",
-            order
+        for _ in range(start, end)
+    ]}
+
+class SQLiteWriter:
+    """Bulk-loads batches into a SQLite file, creating the schema if needed."""
+
+    def __init__(self, path: str, reset: bool = False):
+        if reset and os.path.exists(path):
+            os.remove(path)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.executescript(SQLITE_SCHEMA_PATH.read_text())
+
+    def write(self, table: str, rows: List[Tuple]) -> None:
+        columns = TABLE_COLUMNS[table]
+        self.conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            rows
         )
-        order_id = cursor.lastrowid
-        
-        # Generate order items
-        total_amount = 0
-        for _ in range(random.randint(1, 5)):
-            product_id = random.randint(1, 50)
-            quantity = random.randint(1, 5)
-            
-            # Get product price
-            cursor.execute(
-                "SELECT price FROM products WHERE product_id = %s",
-                (product_id,)
-            )
-            unit_price = cursor.fetchone()[0]
-            subtotal = unit_price * quantity
-            total_amount += subtotal
-            
-            order_item = (
-                order_id,
-                product_id,
-                quantity,
-                unit_price,
-                subtotal
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.execute("ANALYZE")
+        self.conn.close()
+
+class MySQLWriter:
+    """Bulk-loads batches into MySQL with multi-row INSERTs or LOAD DATA LOCAL INFILE."""
+
+    def __init__(self, conn, load_data: bool = False, reset: bool = False):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.load_data = load_data
+        # Constraints are checked by construction; skipping the checks speeds up loading
+        self.cursor.execute("SET foreign_key_checks = 0")
+        self.cursor.execute("SET unique_checks = 0")
+        if reset:
+            for table in TABLE_COLUMNS:
+                self.cursor.execute(f"TRUNCATE TABLE {table}")
+
+    def write(self, table: str, rows: List[Tuple]) -> None:
+        columns = TABLE_COLUMNS[table]
+        if self.load_data:
+            self._load_data(table, columns, rows)
+            return
+        # mysql.connector rewrites executemany INSERTs into one multi-row statement
+        self.cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('%s' for _ in columns)})",
+            rows
+        )
+
+    def _load_data(self, table: str, columns: Tuple[str, ...], rows: List[Tuple]) -> None:
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", delete=False) as f:
+            csv.writer(f, lineterminator="\n").writerows(
+                tuple("\\N" if value is None else value for value in row) for row in rows
             )
-            cursor.execute(
-                """INSERT INTO order_items 
-                   (order_id, product_id, quantity, unit_price, subtotal)
-                   VALUES (%s, %s, %s, %s, %s)""",
-                order_item
+        try:
+            self.cursor.execute(
+                f"LOAD DATA LOCAL INFILE '{f.name}' INTO TABLE {table} "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\' "
+                f"LINES TERMINATED BY '\\n' ({', '.join(columns)})"
             )
-        
-        # Update order total
-        cursor.execute(
-            "UPDATE orders SET total_amount = %s WHERE order_id = %s",
-            (total_amount, order_id)
-        )
+        finally:
+            os.remove(f.name)
 
-def generate_reviews(cursor):
-    reviews = []
-    for _ in range(200):
-        review = (
-            random.randint(1, 50),  # product_id
-            random.randint(1, 50),  # customer_id
-            random.randint(1, 5),   # rating
-            fake.text(max_nb_chars=200)  # comment
-        )
-        reviews.append(review)
-    
-    cursor.executemany(
-        """INSERT INTO reviews 
-           (product_id, customer_id, rating, comment)
-           VALUES (%s, %s, %s, %s)""",
-        reviews
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.cursor.execute("SET foreign_key_checks = 1")
+        self.cursor.execute("SET unique_checks = 1")
+        self.cursor.close()
+        self.conn.close()
+
+def connect_to_db(load_data: bool = False):
+    import mysql.connector
+
+    return mysql.connector.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", "3306")),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASSWORD") or getpass.getpass("Enter MySQL root password: "),
+        database=os.getenv("DB_NAME", "ecommerce"),
+        allow_local_infile=load_data
     )
 
+def generate_table(generator: Callable, total: int, batch_size: int, writer,
+                   pool: Optional[multiprocessing.pool.Pool]) -> None:
+    """Generate rows in batches (in parallel when a pool is given) and load them in order."""
+    start = time.perf_counter()
+    batches = [(first, min(first + batch_size, total + 1)) for first in range(1, total + 1, batch_size)]
+    results = pool.imap(generator, batches) if pool else map(generator, batches)
+    counts: Dict[str, int] = {}
+    for tables in results:
+        for table, rows in tables.items():
+            writer.write(table, rows)
+            counts[table] = counts.get(table, 0) + len(rows)
+    writer.commit()
+
+    elapsed = time.perf_counter() - start
+    for table, count in counts.items():
+        print(f"  {table}: {count:,} rows in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)")
+
 def main():
-    conn = connect_to_db()
-    cursor = conn.cursor()
-    
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["mysql", "sqlite"], default="mysql")
+    parser.add_argument("--sqlite-path", default="ecommerce.db", help="database file for --target sqlite")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--scale", type=float, default=1.0, help="multiple of the original sample size")
+    size.add_argument("--order-items", type=int, help="approximate order_items to generate (sets the scale)")
+    parser.add_argument("--seed", type=int, default=42, help="same seed, same data")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="row-generating processes")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows of the driving table per batch")
+    parser.add_argument("--load-data", action="store_true", help="MySQL: load batches with LOAD DATA LOCAL INFILE")
+    parser.add_argument("--reset", action="store_true", help="delete existing data first")
+    args = parser.parse_args()
+
+    scale = args.order_items / 300 if args.order_items else args.scale
+    sizes = get_table_sizes(scale)
+    print(f"Generating scale {scale:g}: " + ", ".join(f"{count:,} {table}" for table, count in sizes.items()))
+
+    if args.target == "sqlite":
+        writer = SQLiteWriter(args.sqlite_path, reset=args.reset)
+    else:
+        writer = MySQLWriter(connect_to_db(args.load_data), load_data=args.load_data, reset=args.reset)
+
+    init_generator(args.seed, sizes)
+    pool = None
+    if args.workers > 1:
+        pool = multiprocessing.Pool(args.workers, initializer=init_generator, initargs=(args.seed, sizes))
+
+    start = time.perf_counter()
     try:
         print("Generating categories...")
-        generate_categories(cursor)
-        
+        for table, rows in generate_categories().items():
+            writer.write(table, rows)
+        writer.commit()
+
         print("Generating products...")
-        generate_products(cursor)
-        
-        print("Generating customers...")
-        generate_customers(cursor)
-        
-        print("Generating addresses...")
-        generate_addresses(cursor)
-        
+        generate_table(generate_products, sizes["products"], args.batch_size, writer, pool)
+
+        print("Generating customers and addresses...")
+        generate_table(generate_customers, sizes["customers"], args.batch_size, writer, pool)
+
         print("Generating orders and order items...")
-        generate_orders(cursor)
-        
+        # Orders average three items, so batches are a third as many orders
+        generate_table(generate_orders, sizes["orders"], max(1, args.batch_size // 3), writer, pool)
+
         print("Generating reviews...")
-        generate_reviews(cursor)
-        
-        conn.commit()
-        print("Sample data generation completed successfully!")
-        
+        generate_table(generate_reviews, sizes["reviews"], args.batch_size, writer, pool)
+
+        writer.close()
+        print(f"Sample data generation completed successfully in {time.perf_counter() - start:.1f}s!")
     except Exception as e:
         print(f"Error: {e}")
-        conn.rollback()
+        raise
     finally:
-        cursor.close()
-        conn.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
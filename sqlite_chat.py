@@ -1,17 +1,18 @@
 import os
-from typing import Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List
 from dotenv import load_dotenv
-from langchain_community.utilities import SQLDatabase
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-from langchain_community.agent_toolkits.sql.base import create_sql_agent
-from langchain.agents.agent_types import AgentType
-from langchain_community.agent_toolkits import SQLDatabaseToolkit
+from src.config import get_llm
+from src.warmup import Warmup
+
+if TYPE_CHECKING:
+    from langchain_community.utilities import SQLDatabase
 
 load_dotenv()
 
-def setup_database() -> SQLDatabase:
+def setup_database() -> "SQLDatabase":
     """Initialize SQLite database with sample e-commerce data"""
+    from langchain_community.utilities import SQLDatabase
+
     # Using SQLite in-memory for demo purposes
     db = SQLDatabase.from_uri("sqlite:///ecommerce.db")
     
@@ -83,23 +84,29 @@ def process_query(agent_executor: any, query: str) -> Dict:
             )
         }
 
-def run_chat():
-    """Run the interactive chat session"""
-    # Initialize components
-    db = setup_database()
-    llm = ChatOpenAI(
-        model="gpt-4-turbo-preview",
-        temperature=0
-    )
+def setup_agent(warmup: Warmup) -> Any:
+    """Create the sample database and the SQL agent over it"""
+    with warmup.step("imports"):
+        from langchain_community.agent_toolkits.sql.base import create_sql_agent
+        from langchain.agents.agent_types import AgentType
+        from langchain_community.agent_toolkits import SQLDatabaseToolkit
+    with warmup.step("database"):
+        db = setup_database()
+    llm = get_llm()
     toolkit = SQLDatabaseToolkit(db=db, llm=llm)
     
-    agent_executor = create_sql_agent(
+    return create_sql_agent(
         llm=llm,
         toolkit=toolkit,
         verbose=True,
         agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION
     )
 
+def run_chat():
+    """Run the interactive chat session"""
+    # Imports and set-up run in the background while the user types
+    agent = Warmup(setup_agent, name="sqlite chat").start()
+
     # Start chat interface
     print("\nWelcome to SQLite E-commerce Chat!")
     print("You can ask questions about products and orders.")
@@ -121,7 +128,7 @@ def run_chat():
         if not query:
             continue
             
-        result = process_query(agent_executor, query)
+        result = process_query(agent.get(), query)
         if result["status"] == "error":
             print("\nError:", result["result"])
         else:
@@ -0,0 +1,446 @@
+"""Mirror the ecommerce tables into DuckDB and run aggregate queries there.
+
+    python -m src.analytics_backend             # copy rows added since the last refresh
+    python -m src.analytics_backend --rebuild   # copy every table again
+
+Enabled with ANALYTICS_BACKEND=duckdb (needs ``pip install duckdb``).
+"""
+import argparse
+import csv
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import MetaData, Table, create_engine, func, inspect, select, types
+from sqlalchemy.engine import Engine
+from sqlglot import exp
+
+from .config import get_database_url, get_int_env
+from .data_versions import get_data_version_tracker
+from .metrics import REGISTRY
+from .shared_store import store_namespace
+from .sql_validation import SQLValidationError, get_sqlglot_dialect, parse_sql
+from .workload import record_query
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_QUERIES = REGISTRY.counter(
+    "chatdb_analytics_queries_total", "Queries run on the analytics mirror, by outcome", ["outcome"]
+)
+
+# Tables aggregated by the analytics questions, and the lookups they join
+DEFAULT_TABLES = ("categories", "products", "customers", "orders", "order_items", "reviews")
+STATE_TABLE = "_mirror_state"
+# Written in place of NULL in the staging CSV
+NULL_MARKER = "\\N"
+
+@dataclass
+class MirroredTable:
+    """What the mirror knows about one copied table."""
+    name: str
+    columns: List[str]
+    # Primary key and leading index columns on the source; an equality on
+    # one of them is a lookup the source answers from its index
+    key_columns: List[str]
+    # Column new rows are found by; None copies the whole table every time
+    watermark_column: Optional[str]
+    watermark: Any
+    # Source data version the copy corresponds to
+    source_version: Optional[str]
+    rows: int
+
+def duckdb_type(column_type: types.TypeEngine) -> str:
+    """DuckDB column type for a reflected SQLAlchemy type."""
+    if isinstance(column_type, types.Boolean):
+        return "BOOLEAN"
+    if isinstance(column_type, types.Integer):
+        return "BIGINT"
+    if isinstance(column_type, types.Float):
+        return "DOUBLE"
+    if isinstance(column_type, types.Numeric):
+        precision, scale = column_type.precision, column_type.scale
+        if precision and precision <= 38:
+            return f"DECIMAL({precision}, {scale or 0})"
+        return "DOUBLE"
+    if isinstance(column_type, types.DateTime):
+        return "TIMESTAMP"
+    if isinstance(column_type, types.Date):
+        return "DATE"
+    if isinstance(column_type, types.Time):
+        return "TIME"
+    return "VARCHAR"
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _key_columns(inspector: Any, table: str) -> List[str]:
+    columns = list(inspector.get_pk_constraint(table).get("constrained_columns") or [])
+    for index in inspector.get_indexes(table):
+        if index["column_names"] and index["column_names"][0]:
+            columns.append(index["column_names"][0])
+    return columns
+
+class AnalyticsMirror:
+    """Columnar copy of some source tables that aggregate queries run on.
+
+    Each refresh copies, in one DuckDB transaction, the rows added since the
+    last one to every table whose data version changed: by integer primary key or ``created_at`` watermark once a
+    table holds more than ``full_copy_rows`` rows, and the whole table
+    otherwise, which also picks up updates to small lookup tables. An
+    incremental copy is kept only if the table grew and now holds as many
+    rows as the source; a version change without new rows, or a count that
+    does not match, means rows were updated or deleted in place, and the
+    table is copied again in full. Updates made in the same interval as
+    appends to a large table are only seen after a rebuild.
+
+    A query is routed here only if it aggregates, reads mirrored tables
+    only, is not an equality lookup on an indexed column, and the tables'
+    data versions match the ones the copy was taken at; anything else stays
+    on the source.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        path: str,
+        tables: Sequence[str] = DEFAULT_TABLES,
+        full_copy_rows: int = 10_000,
+        chunk_size: int = 100_000
+    ):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("ANALYTICS_BACKEND=duckdb needs the duckdb package: pip install duckdb")
+        self.engine = engine
+        self.path = path
+        self.table_names = [name for name in tables if name]
+        self.full_copy_rows = full_copy_rows
+        self.chunk_size = chunk_size
+        self.data_versions = get_data_version_tracker(engine)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = duckdb.connect(path)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (table_name VARCHAR PRIMARY KEY, "
+            "watermark_column VARCHAR, watermark VARCHAR, source_version VARCHAR, rows BIGINT, refreshed_at DOUBLE)"
+        )
+        self._tables: Dict[str, MirroredTable] = {}
+        self._refresh_lock = threading.Lock()
+        # Canonical SQL that DuckDB failed on; sent to the source from then on
+        self._failed: "OrderedDict[str, None]" = OrderedDict()
+        self._load_state()
+
+    def _load_state(self) -> None:
+        mirrored = {row[0] for row in self._conn.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+        tables = {}
+        for name, watermark_column, watermark, source_version, rows in self._conn.execute(
+            f"SELECT table_name, watermark_column, watermark, source_version, rows FROM {STATE_TABLE}"
+        ).fetchall():
+            if name not in mirrored:
+                continue
+            columns = [row[0] for row in self._conn.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+                [name]
+            ).fetchall()]
+            tables[name] = MirroredTable(name, columns, [], watermark_column, watermark, source_version, rows)
+        inspector = inspect(self.engine)
+        for table in tables.values():
+            table.key_columns = _key_columns(inspector, table.name)
+        self._tables = tables
+
+    def refresh(self, rebuild: bool = False) -> Dict[str, int]:
+        """Copy new source rows into the mirror; returns rows copied per table."""
+        with self._refresh_lock:
+            # Versions are read first, so writes during the copy leave the
+            # mirror looking stale rather than hiding them
+            versions = self.data_versions.table_versions()
+            copied = {}
+            tables = dict(self._tables)
+            conn = self._conn.cursor()
+            source_tables = set(inspect(self.engine).get_table_names())
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                for name in self.table_names:
+                    if name not in source_tables:
+                        continue
+                    current = tables.get(name)
+                    version = versions.get(name)
+                    unchanged = current is not None and version is not None and current.source_version == version
+                    if unchanged and not rebuild:
+                        copied[name] = 0
+                        continue
+                    table, copied[name] = self._refresh_table(conn, name, current, rebuild)
+                    table.source_version = version
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO {STATE_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                        [name, table.watermark_column, None if table.watermark is None else str(table.watermark),
+                         table.source_version, table.rows, time.time()]
+                    )
+                    tables[name] = table
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+            self._tables = tables
+            return copied
+
+    def _refresh_table(
+        self, conn: Any, name: str, current: Optional[MirroredTable], rebuild: bool
+    ) -> Tuple[MirroredTable, int]:
+        source = Table(name, MetaData(), autoload_with=self.engine)
+        columns = [column.name for column in source.columns]
+        primary_key = [column.name for column in source.primary_key.columns]
+        by_key = len(primary_key) == 1 and isinstance(source.c[primary_key[0]].type, types.Integer)
+        if by_key:
+            watermark_column = primary_key[0]
+        elif "created_at" in source.c:
+            watermark_column = "created_at"
+        else:
+            watermark_column = None
+
+        incremental = (
+            not rebuild and current is not None and current.columns == columns
+            and watermark_column is not None and current.watermark_column == watermark_column
+            and current.watermark is not None and current.rows > self.full_copy_rows
+        )
+        query = select(source)
+        if incremental:
+            watermark = current.watermark
+            if by_key:
+                query = query.where(source.c[watermark_column] > int(watermark))
+            else:
+                if isinstance(watermark, str) and isinstance(source.c[watermark_column].type, types.DateTime):
+                    watermark = datetime.fromisoformat(watermark)
+                # Rows stamped with the last watermark may have been added
+                # after the previous copy; take them again
+                conn.execute(f"DELETE FROM {_quote(name)} WHERE {_quote(watermark_column)} >= ?", [watermark])
+                query = query.where(source.c[watermark_column] >= watermark)
+        else:
+            column_sql = ", ".join(f"{_quote(column.name)} {duckdb_type(column.type)}" for column in source.columns)
+            conn.execute(f"CREATE OR REPLACE TABLE {_quote(name)} ({column_sql})")
+            watermark = None
+        if watermark_column is not None:
+            query = query.order_by(source.c[watermark_column])
+
+        copied = 0
+        watermark_index = columns.index(watermark_column) if watermark_column else None
+        with self.engine.connect() as source_conn:
+            result = source_conn.execution_options(stream_results=True, max_row_buffer=self.chunk_size).execute(query)
+            while True:
+                chunk = result.fetchmany(self.chunk_size)
+                if not chunk:
+                    break
+                self._load_chunk(conn, name, chunk)
+                copied += len(chunk)
+                if watermark_index is not None and chunk[-1][watermark_index] is not None:
+                    watermark = chunk[-1][watermark_index]
+        rows = conn.execute(f"SELECT COUNT(*) FROM {_quote(name)}").fetchone()[0]
+        if incremental and not self._explained_by_appends(source, current, rows):
+            logger.info("Analytics mirror: %s changed in place, copying it again in full", name)
+            return self._refresh_table(conn, name, current, rebuild=True)
+        key_columns = _key_columns(inspect(self.engine), name)
+        return MirroredTable(name, columns, key_columns, watermark_column, watermark, None, rows), copied
+
+    def _explained_by_appends(self, source: Table, current: MirroredTable, rows: int) -> bool:
+        # The data version moved; unless the table grew to exactly the
+        # source's row count, rows were also updated or deleted there
+        if rows <= current.rows:
+            return False
+        with self.engine.connect() as source_conn:
+            source_rows = source_conn.execute(select(func.count()).select_from(source)).scalar()
+        return rows == source_rows
+
+    def _load_chunk(self, conn: Any, name: str, chunk: Sequence[Sequence[Any]]) -> None:
+        # DuckDB's CSV reader loads hundreds of thousands of rows a second,
+        # where row-by-row INSERTs manage about a thousand
+        directory = os.path.dirname(self.path) or "."
+        with tempfile.NamedTemporaryFile("w", newline="", suffix=".csv", dir=directory, delete=False) as f:
+            writer = csv.writer(f)
+            for row in chunk:
+                writer.writerow([NULL_MARKER if value is None else value for value in row])
+            staging = f.name
+        try:
+            conn.execute(
+                f"COPY {_quote(name)} FROM '{staging}' (FORMAT csv, HEADER false, NULLSTR '{NULL_MARKER}')"
+            )
+        finally:
+            os.remove(staging)
+
+    def to_duckdb(self, sql: str, dialect: str) -> Optional[str]:
+        """The query in DuckDB's dialect if the mirror should run it, else None."""
+        try:
+            tree = parse_sql(sql, dialect)
+        except SQLValidationError:
+            return None
+        if not isinstance(tree, (exp.Select, exp.SetOperation)):
+            return None
+        cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+        names = {table.name.lower() for table in tree.find_all(exp.Table)} - cte_names
+        tables = self._tables
+        if not names or not names <= set(tables):
+            return None
+        # Aggregates are what a column store is good at; plain row fetches
+        # and indexed lookups are served well by the source's indexes
+        if not (tree.find(exp.AggFunc) or tree.find(exp.Group)):
+            return None
+        if self._is_point_lookup(tree, names):
+            return None
+        versions = self.data_versions.table_versions()
+        if any(tables[name].source_version != versions.get(name) for name in names):
+            ANALYTICS_QUERIES.inc(outcome="stale")
+            return None
+        duckdb_sql = self._keep_column_names(tree, dialect).sql(dialect="duckdb")
+        if duckdb_sql in self._failed:
+            return None
+        return duckdb_sql
+
+    def _keep_column_names(self, tree: exp.Expression, dialect: str) -> exp.Expression:
+        # DuckDB names COUNT(*) "count_star()"; alias unnamed expressions
+        # with their source text so results have the columns the source gives
+        if not isinstance(tree, exp.Select):
+            return tree
+        tree = tree.copy()
+        source_dialect = get_sqlglot_dialect(dialect)
+        tree.set("expressions", [
+            expression if isinstance(expression, (exp.Alias, exp.Column, exp.Star))
+            else exp.alias_(expression, expression.sql(dialect=source_dialect), quoted=True)
+            for expression in tree.expressions
+        ])
+        return tree
+
+    def _is_point_lookup(self, tree: exp.Expression, names: Set[str]) -> bool:
+        keys = {column.lower() for name in names for column in self._tables[name].key_columns}
+        for eq in tree.find_all(exp.EQ):
+            left, right = eq.left, eq.right
+            if isinstance(right, exp.Column):
+                left, right = right, left
+            if isinstance(left, exp.Column) and isinstance(right, exp.Literal) and left.name.lower() in keys:
+                return True
+        return False
+
+    def run(self, sql: str, dialect: str, max_rows: Optional[int] = None) -> Optional[Tuple[List[str], List[Tuple]]]:
+        """Run sql on the mirror if it qualifies; None means run it on the source."""
+        duckdb_sql = self.to_duckdb(sql, dialect)
+        if duckdb_sql is None:
+            return None
+        conn = self._conn.cursor()
+        try:
+            result = conn.execute(duckdb_sql)
+            columns = [column[0] for column in result.description]
+            rows = result.fetchall() if max_rows is None else result.fetchmany(max_rows)
+        except Exception as e:
+            # Functions sqlglot could not translate, mostly; the source runs it
+            logger.info("Analytics mirror could not run %s: %s", duckdb_sql, e)
+            ANALYTICS_QUERIES.inc(outcome="failed")
+            self._failed[duckdb_sql] = None
+            while len(self._failed) > 1000:
+                self._failed.popitem(last=False)
+            return None
+        finally:
+            conn.close()
+        ANALYTICS_QUERIES.inc(outcome="routed")
+        return columns, rows
+
+    def stats(self) -> Dict[str, Any]:
+        """Mirrored tables with their row counts and watermarks."""
+        return {
+            name: {"rows": table.rows, "watermark_column": table.watermark_column, "watermark": str(table.watermark)}
+            for name, table in self._tables.items()
+        }
+
+_mirrors: Dict[str, Optional[AnalyticsMirror]] = {}
+_mirrors_lock = threading.Lock()
+
+def get_analytics_mirror(engine: Engine) -> Optional[AnalyticsMirror]:
+    """Return the process-wide mirror for engine's database, or None if disabled.
+
+    Only one process can open a DuckDB file; other workers keep running
+    every query on the source.
+    """
+    if os.getenv("ANALYTICS_BACKEND", "") != "duckdb":
+        return None
+    url = engine.url.render_as_string(hide_password=False)
+    with _mirrors_lock:
+        if url not in _mirrors:
+            path = os.getenv("ANALYTICS_DB_PATH") or os.path.join(".cache", f"analytics_{store_namespace(url)}.duckdb")
+            tables = os.getenv("ANALYTICS_TABLES")
+            try:
+                _mirrors[url] = AnalyticsMirror(
+                    engine,
+                    path,
+                    tables=tables.split(",") if tables else DEFAULT_TABLES,
+                    full_copy_rows=get_int_env("ANALYTICS_FULL_COPY_ROWS", 10_000),
+                )
+            except ImportError:
+                raise
+            except Exception as e:
+                logger.warning("Analytics mirror %s unavailable, queries stay on the source: %s", path, e)
+                _mirrors[url] = None
+        return _mirrors[url]
+
+def run_analytics(
+    engine: Engine, sql: str, dialect: str, max_rows: Optional[int] = None
+) -> Optional[Tuple[List[str], List[Tuple]]]:
+    """Columns and rows of sql from the analytics mirror, or None to run it on the source."""
+    mirror = get_analytics_mirror(engine)
+    if mirror is None:
+        return None
+    start = time.perf_counter()
+    result = mirror.run(sql, dialect, max_rows)
+    if result is not None:
+        record_query(sql, dialect, time.perf_counter() - start, len(result[1]), "analytics")
+    return result
+
+def start_analytics_refresh(engine: Engine, interval: int) -> Optional[threading.Event]:
+    """Refresh the mirror now and then every interval seconds, if it is enabled.
+
+    Returns an event that stops the refresh thread when set.
+    """
+    mirror = get_analytics_mirror(engine)
+    if mirror is None or interval <= 0:
+        return None
+    stop = threading.Event()
+
+    def loop():
+        while True:
+            try:
+                start = time.perf_counter()
+                copied = mirror.refresh()
+                logger.info("Analytics mirror refreshed in %.1fs: %s", time.perf_counter() - start, copied)
+            except Exception:
+                logger.exception("Analytics mirror refresh failed")
+            if stop.wait(interval):
+                return
+
+    threading.Thread(target=loop, name="analytics-refresh", daemon=True).start()
+    return stop
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="source database (default: DATABASE_URL / DB_*)")
+    parser.add_argument("--path", help="DuckDB file (default: ANALYTICS_DB_PATH or .cache/analytics_<hash>.duckdb)")
+    parser.add_argument("--rebuild", action="store_true", help="copy every table from scratch")
+    args = parser.parse_args()
+
+    os.environ["ANALYTICS_BACKEND"] = "duckdb"
+    if args.path:
+        os.environ["ANALYTICS_DB_PATH"] = args.path
+    mirror = get_analytics_mirror(create_engine(args.database_url or get_database_url()))
+    if mirror is None:
+        raise SystemExit("The analytics mirror could not be opened (see the log)")
+    start = time.perf_counter()
+    for name, rows in mirror.refresh(rebuild=args.rebuild).items():
+        print(f"{name:<20} {rows:>12,} rows copied")
+    print(f"refreshed {mirror.path} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
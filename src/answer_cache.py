@@ -0,0 +1,191 @@
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from .schema_index import tokenize
+from .shared_store import SharedStore
+
+NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s$.%]", " ", question.lower()).split()).rstrip(".")
+
+def _cosine(a: Counter, b: Counter) -> float:
+    dot = sum(count * b.get(token, 0) for token, count in a.items())
+    if not dot:
+        return 0.0
+    norm_a = math.sqrt(sum(count * count for count in a.values()))
+    norm_b = math.sqrt(sum(count * count for count in b.values()))
+    return dot / (norm_a * norm_b)
+
+@dataclass
+class CacheEntry:
+    question: str
+    answer: Dict[str, Any]
+    schema_fingerprint: Optional[str]
+    data_version: str
+    tokens: Counter
+    numbers: frozenset
+    created_at: float = field(default_factory=time.time)
+
+@dataclass
+class CacheLookup:
+    """A cache hit: the stored answer and how the question matched."""
+    answer: Dict[str, Any]
+    match: str
+    similarity: float
+    cached_question: str
+
+class AnswerCache:
+    """Question -> answer cache with LRU/TTL eviction.
+
+    Questions match exactly after normalization, or - when
+    ``similarity_threshold`` is set - by token cosine similarity, as long as
+    both mention the same numbers ("top 5" never matches "top 10"). Entries
+    recorded under a different schema fingerprint or data version are
+    treated as stale. With a shared store, answers are also written there
+    and exact matches missing locally are looked up there, so workers reuse
+    each other's answers; similar matches stay per worker.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: int = 600,
+        similarity_threshold: float = 0.0,
+        store: Optional[SharedStore] = None,
+        store_prefix: str = "answer:"
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.store = store
+        self.store_prefix = store_prefix
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, question: str, schema_fingerprint: Optional[str], data_version: str) -> Optional[CacheLookup]:
+        """Look up a fresh answer for the question."""
+        key = normalize_question(question)
+        with self._lock:
+            self._evict_expired()
+            lookup = self._match(key, schema_fingerprint, data_version)
+        if lookup is None and self.store is not None:
+            lookup = self._match_shared(key, schema_fingerprint, data_version)
+        with self._lock:
+            if lookup is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return lookup
+
+    def put(self, question: str, answer: Dict[str, Any], schema_fingerprint: Optional[str], data_version: str) -> None:
+        """Store the answer for the question."""
+        if self.max_entries <= 0:
+            return
+        key = normalize_question(question)
+        self._add(key, question, answer, schema_fingerprint, data_version, time.time())
+        if self.store is not None:
+            self.store.set(
+                self._store_key(key),
+                (question, answer, schema_fingerprint, data_version, time.time()),
+                self.ttl
+            )
+
+    def _add(
+        self,
+        key: str,
+        question: str,
+        answer: Dict[str, Any],
+        schema_fingerprint: Optional[str],
+        data_version: str,
+        created_at: float
+    ) -> None:
+        with self._lock:
+            self._entries[key] = CacheEntry(
+                question=question,
+                answer=answer,
+                schema_fingerprint=schema_fingerprint,
+                data_version=data_version,
+                tokens=Counter(tokenize(key)),
+                numbers=frozenset(NUMBER_RE.findall(key)),
+                created_at=created_at,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _store_key(self, key: str) -> str:
+        return self.store_prefix + hashlib.sha1(key.encode()).hexdigest()
+
+    def _match_shared(self, key: str, schema_fingerprint: Optional[str], data_version: str) -> Optional[CacheLookup]:
+        shared = self.store.get(self._store_key(key))
+        if shared is None:
+            return None
+        question, answer, entry_fingerprint, entry_version, created_at = shared
+        if entry_fingerprint != schema_fingerprint or entry_version != data_version:
+            return None
+        if self.max_entries > 0:
+            # Keep the original age so the entry expires when the shared one does
+            self._add(key, question, answer, entry_fingerprint, entry_version, created_at)
+        return CacheLookup(answer, "exact", 1.0, question)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for reporting."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _is_fresh(self, entry: CacheEntry, schema_fingerprint: Optional[str], data_version: str) -> bool:
+        return entry.schema_fingerprint == schema_fingerprint and entry.data_version == data_version
+
+    def _match(self, key: str, schema_fingerprint: Optional[str], data_version: str) -> Optional[CacheLookup]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._is_fresh(entry, schema_fingerprint, data_version):
+                self._entries.move_to_end(key)
+                return CacheLookup(entry.answer, "exact", 1.0, entry.question)
+            del self._entries[key]
+
+        if self.similarity_threshold <= 0:
+            return None
+
+        tokens = Counter(tokenize(key))
+        numbers = frozenset(NUMBER_RE.findall(key))
+        best_key, best_similarity = None, 0.0
+        for candidate_key, candidate in self._entries.items():
+            if candidate.numbers != numbers or not self._is_fresh(candidate, schema_fingerprint, data_version):
+                continue
+            similarity = _cosine(tokens, candidate.tokens)
+            if similarity > best_similarity:
+                best_key, best_similarity = candidate_key, similarity
+        if best_key is None or best_similarity < self.similarity_threshold:
+            return None
+
+        self._entries.move_to_end(best_key)
+        entry = self._entries[best_key]
+        return CacheLookup(entry.answer, "similar", round(best_similarity, 4), entry.question)
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - self.ttl
+        # Entries are in LRU order, not insertion order, so scan them all
+        expired = [key for key, entry in self._entries.items() if entry.created_at < cutoff]
+        for key in expired:
+            del self._entries[key]
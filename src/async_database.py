@@ -0,0 +1,159 @@
+"""Run the pipeline's SQL on an async engine instead of a thread per query.
+
+The synchronous engines (``mysql+mysqlconnector``, ``sqlite``) block a
+thread for as long as a query runs. Here the same database is opened
+through an async driver - aiomysql (or asyncmy, with
+ASYNC_MYSQL_DRIVER=asyncmy) for MySQL, aiosqlite for SQLite - with an
+asyncio-aware connection pool, so many requests can wait on the database
+from one event loop. Needs ``pip install -r requirements-async.txt``.
+
+This saves threads, not time: throughput is bounded by the CPU each request
+spends in the pipeline either way, and with all of it on one event loop
+latency under load is no better than the thread pool's (see
+benchmarks/async_database.py). Nothing uses this path by default.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine, make_url
+
+from .analytics_backend import get_analytics_mirror, run_analytics
+from .budget import BudgetExceededError, charge_sql, current_budget
+from .config import get_bool_env, get_int_env
+from .cost_guard import get_cost_guard
+from .database import get_engine, install_statement_limits
+from .metrics import track_stage
+from .result_cache import get_result_cache
+from .results import QueryResult, build_page, paginate_sql
+from .sql_validation import parse_sql
+from .workload import record_query
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Synchronous dialect -> async driver to use for it
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "mysql": "aiomysql",
+}
+
+def async_database_url(database_url: str) -> str:
+    """The URL of the same database through its async driver."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if url.get_driver_name() in ("aiosqlite", "aiomysql", "asyncmy"):
+        return url.render_as_string(hide_password=False)
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    driver = ASYNC_DRIVERS[backend]
+    if backend == "mysql":
+        driver = os.getenv("ASYNC_MYSQL_DRIVER", driver)
+    return url.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+def create_async_db_engine(database_url: str) -> "AsyncEngine":
+    """Create an async engine for database_url, with the pool and statement limits of create_db_engine."""
+    url = async_database_url(database_url)
+    driver = make_url(url).get_driver_name()
+    try:
+        import greenlet  # noqa: F401  (SQLAlchemy's asyncio support needs it)
+        from sqlalchemy.ext.asyncio import create_async_engine
+        # The pool queues waiting requests on the event loop, not on threads
+        engine = create_async_engine(
+            url,
+            pool_size=get_int_env("DB_POOL_SIZE", 5),
+            max_overflow=get_int_env("DB_MAX_OVERFLOW", 10),
+            pool_timeout=get_int_env("DB_POOL_TIMEOUT", 30),
+            pool_recycle=get_int_env("DB_POOL_RECYCLE", 1800),
+            pool_pre_ping=get_bool_env("DB_POOL_PRE_PING", True),
+        )
+    except ImportError as e:
+        raise ImportError(
+            f"The async database path needs {driver} and greenlet: pip install -r requirements-async.txt"
+        ) from e
+    install_statement_limits(engine.sync_engine)
+    return engine
+
+_async_engines: Dict[str, "AsyncEngine"] = {}
+_async_engines_lock = threading.Lock()
+
+def get_async_engine(database_url: str) -> "AsyncEngine":
+    """Return the process-wide async engine for a database URL, creating it once.
+
+    Its pooled connections belong to the event loop that opened them, so
+    use it from one loop (the server's).
+    """
+    with _async_engines_lock:
+        engine = _async_engines.get(database_url)
+        if engine is None:
+            engine = create_async_db_engine(database_url)
+            _async_engines[database_url] = engine
+        return engine
+
+class AsyncDatabase:
+    """Executes the pipeline's queries on the async engine of a database.
+
+    ``engine`` is the synchronous engine of the same database: its result
+    cache, cost guard, data versions and analytics mirror are used as they
+    are by ``execute_page``, so both paths share them. Those are in-memory
+    apart from the occasional change-marker poll, which still runs
+    synchronously.
+    """
+
+    def __init__(self, engine: Engine, async_engine: Optional["AsyncEngine"] = None):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.async_engine = async_engine or get_async_engine(engine.url.render_as_string(hide_password=False))
+
+    @classmethod
+    def from_url(cls, database_url: str) -> "AsyncDatabase":
+        return cls(get_engine(database_url))
+
+    async def execute_page(self, sql: str, page_size: int, offset: int = 0) -> QueryResult:
+        """Async execute_page: run a SELECT and return one page of it as a QueryResult.
+
+        Raises QueryCostError if the query plan is over the cost budget, and
+        BudgetExceededError if the request's deadline passes first.
+        """
+        page_sql = paginate_sql(parse_sql(sql, self.dialect), self.dialect, page_size + 1, offset)
+        guard = get_cost_guard(self.engine)
+
+        async def fetch() -> Tuple[List[str], List[Tuple]]:
+            charge_sql()
+            if get_analytics_mirror(self.engine) is not None:
+                # DuckDB has no async API; it computes locally, so a thread is only busy while it does
+                routed = await asyncio.to_thread(run_analytics, self.engine, page_sql, self.dialect, page_size + 1)
+                if routed is not None:
+                    return routed
+            async with self.async_engine.connect() as conn:
+                # The plan is read on the same pooled connection
+                check = await conn.run_sync(lambda sync_conn: guard.check(sql, self.dialect, conn=sync_conn))
+                start = time.perf_counter()
+                result = await conn.stream(text(page_sql))
+                columns = list(result.keys())
+                rows = [tuple(row) for row in await result.fetchmany(page_size + 1)]
+                await result.close()
+            record_query(page_sql, self.dialect, time.perf_counter() - start, len(rows), "pipeline")
+            guard.record_returned(check, len(rows))
+            return columns, rows
+
+        budget = current_budget()
+        with track_stage("sql"):
+            try:
+                columns, rows = await asyncio.wait_for(
+                    get_result_cache(self.engine).get_or_run_async(page_sql, self.dialect, fetch),
+                    timeout=budget.remaining() if budget is not None else None
+                )
+            except asyncio.TimeoutError:
+                if budget is None:
+                    raise
+                budget.cancel("deadline")
+                raise BudgetExceededError("deadline")
+        return build_page(sql, columns, rows, page_size, offset)
+
+    async def dispose(self) -> None:
+        """Close the pooled connections."""
+        await self.async_engine.dispose()
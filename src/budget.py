@@ -0,0 +1,222 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import get_float_env
+from .metrics import REGISTRY
+
+BUDGET_EXCEEDED = REGISTRY.counter(
+    "chatdb_budget_exceeded_total", "Requests stopped by their budget, by the limit they hit", ["endpoint", "reason"]
+)
+BUDGET_USED = REGISTRY.histogram(
+    "chatdb_budget_used_ratio", "Share of each budget limit a request used", ["endpoint", "limit"],
+    buckets=(0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+)
+
+# Reason -> how it is explained to the user
+REASONS = {
+    "deadline": "the time limit for this request was reached",
+    "llm_calls": "the limit on LLM calls for this request was reached",
+    "tokens": "the limit on LLM tokens for this request was reached",
+    "sql": "the limit on SQL queries for this request was reached",
+    "iterations": "the agent reached its step limit",
+}
+
+class BudgetExceededError(RuntimeError):
+    """Raised at the next checkpoint once a request has used up its budget."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Stopped before finishing: {REASONS.get(reason, reason)}")
+        self.reason = reason
+
+class RequestBudget:
+    """Limits on what answering one request may use.
+
+    A wall-clock deadline (seconds), LLM calls, LLM tokens (prompt plus
+    completion) and SQL executions; 0 means no limit. Work is charged as it
+    happens and checked at every LLM call, tool call and SQL statement,
+    raising BudgetExceededError once a limit is passed or the budget was
+    cancelled. Activate it around a request so SQL executed anywhere
+    below (including from executor threads) is charged and statements
+    still running at the deadline are aborted.
+    """
+
+    def __init__(
+        self,
+        deadline: float = 0.0,
+        max_llm_calls: int = 0,
+        max_tokens: int = 0,
+        max_sql: int = 0,
+        endpoint: str = "default"
+    ):
+        self.deadline = deadline
+        self.max_llm_calls = max_llm_calls
+        self.max_tokens = max_tokens
+        self.max_sql = max_sql
+        self.endpoint = endpoint
+        self.llm_calls = 0
+        self.tokens = 0
+        self.sql_executions = 0
+        self.reason: Optional[str] = None
+        self._started_at = time.monotonic()
+        self._recorded = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_endpoint(cls, endpoint: Optional[str] = None) -> "RequestBudget":
+        """Budget from BUDGET_<ENDPOINT>_* settings, falling back to BUDGET_*.
+
+        The endpoint "/query/stream" reads e.g. BUDGET_QUERY_STREAM_MAX_LLM_CALLS.
+        """
+        prefix = "BUDGET_"
+        if endpoint:
+            prefix += endpoint.strip("/").replace("/", "_").replace("-", "_").upper() + "_"
+
+        def setting(name: str, default: float) -> float:
+            fallback = get_float_env(f"BUDGET_{name}", default)
+            return get_float_env(prefix + name, fallback)
+
+        return cls(
+            deadline=setting("DEADLINE_SECONDS", 60),
+            max_llm_calls=int(setting("MAX_LLM_CALLS", 20)),
+            max_tokens=int(setting("MAX_TOKENS", 0)),
+            max_sql=int(setting("MAX_SQL", 10)),
+            endpoint=endpoint or "default"
+        )
+
+    @property
+    def deadline_at(self) -> Optional[float]:
+        """time.monotonic() value of the deadline, or None without one."""
+        return self._started_at + self.deadline if self.deadline > 0 else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline, or None without one."""
+        deadline_at = self.deadline_at
+        return None if deadline_at is None else max(0.0, deadline_at - time.monotonic())
+
+    def exceeded(self) -> Optional[str]:
+        """The limit that stopped the request, or None while within budget."""
+        with self._lock:
+            if self.reason is None and self.remaining() == 0:
+                self.reason = "deadline"
+            return self.reason
+
+    def cancel(self, reason: str) -> None:
+        """Stop the request at its next checkpoint (the first reason given wins)."""
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+
+    def check(self) -> None:
+        reason = self.exceeded()
+        if reason is not None:
+            raise BudgetExceededError(reason)
+
+    def charge_llm_call(self) -> None:
+        """Count an LLM call about to be made, refusing it if over the limit."""
+        with self._lock:
+            self.llm_calls += 1
+            over = 0 < self.max_llm_calls < self.llm_calls
+        if over:
+            self.cancel("llm_calls")
+        self.check()
+
+    def charge_tokens(self, tokens: int) -> None:
+        with self._lock:
+            self.tokens += tokens
+            over = 0 < self.max_tokens < self.tokens
+        if over:
+            self.cancel("tokens")
+        self.check()
+
+    def charge_sql(self) -> None:
+        """Count a SQL statement about to be executed, refusing it if over the limit."""
+        with self._lock:
+            self.sql_executions += 1
+            over = 0 < self.max_sql < self.sql_executions
+        if over:
+            self.cancel("sql")
+        self.check()
+
+    @contextmanager
+    def activate(self) -> Iterator["RequestBudget"]:
+        token = _current_budget.set(self)
+        try:
+            yield self
+        finally:
+            _current_budget.reset(token)
+
+    def record(self) -> None:
+        """Add the request's usage to the metrics (once per budget)."""
+        with self._lock:
+            if self._recorded:
+                return
+            self._recorded = True
+        reason = self.exceeded()
+        if reason is not None:
+            BUDGET_EXCEEDED.inc(endpoint=self.endpoint, reason=reason)
+        elapsed = time.monotonic() - self._started_at
+        for limit, used, maximum in (
+            ("deadline", elapsed, self.deadline),
+            ("llm_calls", self.llm_calls, self.max_llm_calls),
+            ("tokens", self.tokens, self.max_tokens),
+            ("sql", self.sql_executions, self.max_sql),
+        ):
+            if maximum > 0:
+                BUDGET_USED.observe(min(used / maximum, 1.0), endpoint=self.endpoint, limit=limit)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "elapsed_ms": round((time.monotonic() - self._started_at) * 1000, 1),
+                "llm_calls": self.llm_calls,
+                "tokens": self.tokens,
+                "sql_executions": self.sql_executions,
+                "limits": {
+                    "deadline_seconds": self.deadline,
+                    "llm_calls": self.max_llm_calls,
+                    "tokens": self.max_tokens,
+                    "sql": self.max_sql,
+                },
+                "exceeded": self.reason,
+            }
+
+_current_budget: contextvars.ContextVar[Optional[RequestBudget]] = contextvars.ContextVar(
+    "request_budget", default=None
+)
+
+def current_budget() -> Optional[RequestBudget]:
+    """The budget of the request being handled, if any."""
+    return _current_budget.get()
+
+def charge_sql() -> None:
+    """Charge a SQL execution to the active budget, raising if it is used up."""
+    budget = _current_budget.get()
+    if budget is not None:
+        budget.charge_sql()
+
+def partial_response(steps: List[Dict[str, Any]], budget: RequestBudget) -> Dict[str, Any]:
+    """The best answer available when a request is stopped by its budget.
+
+    steps are a QueryEventHandler's; if one of them ran SQL successfully its
+    rows are returned with status "partial", otherwise the reason is
+    returned as an error.
+    """
+    from .sql_validation import clean_sql
+
+    message = str(BudgetExceededError(budget.exceeded() or "deadline"))
+    answered = [
+        step for step in steps
+        if step["action"] == "sql_db_query" and step.get("observation")
+        and not step["observation"].startswith("Error")
+    ]
+    if not answered:
+        return {"status": "error", "result": message + ".", "schema_used": True}
+    return {
+        "status": "partial",
+        "result": f"{message}. The last query run returned:\n{answered[-1]['observation']}",
+        "sql_query": clean_sql(answered[-1]["input"]),
+        "schema_used": True
+    }
@@ -0,0 +1,248 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from .budget import RequestBudget
+from .metrics import observe_stage, record_llm_call
+
+class LLMCallCounter(BaseCallbackHandler):
+    """Count LLM calls made while handling one request."""
+
+    def __init__(self):
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        with self._lock:
+            self.llm_calls += 1
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any) -> None:
+        with self._lock:
+            self.llm_calls += 1
+
+# Observations longer than this are truncated in the trace
+MAX_OBSERVATION_CHARS = 2000
+
+def _truncate(text: str) -> str:
+    if len(text) <= MAX_OBSERVATION_CHARS:
+        return text
+    return text[:MAX_OBSERVATION_CHARS] + f"... [{len(text) - MAX_OBSERVATION_CHARS} more characters]"
+
+def get_token_usage(response: LLMResult) -> Tuple[int, int]:
+    """Prompt and completion tokens reported for an LLM call (0, 0 if unknown)."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+    prompt_tokens = completion_tokens = 0
+    # Chat models that stream report usage on the message instead
+    for generations in response.generations:
+        for generation in generations:
+            usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt_tokens += usage_metadata.get("input_tokens", 0)
+            completion_tokens += usage_metadata.get("output_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+# Pipeline stage that each agent tool's time counts towards
+TOOL_STAGES = {
+    "sql_db_query": "sql",
+    "sql_db_schema": "schema",
+    "sql_db_list_tables": "schema",
+}
+
+class StageMetricsHandler(BaseCallbackHandler):
+    """Time LLM calls (with their token usage) and agent tool calls for the metrics."""
+
+    def __init__(self):
+        self._llm_started: Dict[UUID, float] = {}
+        self._tools_started: Dict[UUID, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _start_llm(self, run_id: UUID) -> None:
+        with self._lock:
+            self._llm_started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start_llm(run_id)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+        self._start_llm(run_id)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            started = self._llm_started.pop(run_id, None)
+        if started is not None:
+            record_llm_call(time.perf_counter() - started, *get_token_usage(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            started = self._llm_started.pop(run_id, None)
+        if started is not None:
+            record_llm_call(time.perf_counter() - started, 0, 0)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        stage = TOOL_STAGES.get((serialized or {}).get("name"))
+        if stage is not None:
+            with self._lock:
+                self._tools_started[run_id] = (stage, time.perf_counter())
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            started = self._tools_started.pop(run_id, None)
+        if started is not None:
+            stage, start = started
+            observe_stage(stage, time.perf_counter() - start)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self.on_tool_end(None, run_id=run_id)
+
+class BudgetHandler(BaseCallbackHandler):
+    """Charge LLM calls and tokens to a RequestBudget, stopping the run once it is used up.
+
+    Errors raised here propagate (``raise_error``), so the chain or agent
+    aborts at the LLM call or tool call where the budget ran out.
+    """
+
+    raise_error = True
+
+    def __init__(self, budget: RequestBudget):
+        self.budget = budget
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self.budget.charge_llm_call()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any) -> None:
+        self.budget.charge_llm_call()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        self.budget.charge_tokens(sum(get_token_usage(response)))
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any) -> None:
+        self.budget.check()
+
+class QueryEventHandler(BaseCallbackHandler):
+    """Collect a structured trace of a query and stream it as events.
+
+    Every tool call is recorded with its input, observation, wall time and
+    the tokens of the LLM call that chose it, along with totals for the
+    whole request; ``thought_process()`` returns this compact trace.
+    Each event is also passed to ``emit(event, data)`` as it happens
+    (e.g. to feed a Server-Sent Events stream).
+
+    Events: ``tier``, ``cache``, ``step``, ``observation``, ``sql``, ``rows``,
+    ``token`` and ``answer``.
+    """
+
+    def __init__(self, emit: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.emit = emit
+        self.steps: List[Dict[str, Any]] = []
+        self.final_answer: Optional[str] = None
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._started_at = time.perf_counter()
+        self._step_started_at: Optional[float] = None
+        self._pending_tokens = 0
+        self._lock = threading.Lock()
+
+    def _emit(self, event: str, data: Dict[str, Any]) -> None:
+        if self.emit is not None:
+            self.emit(event, data)
+
+    def _start_step(self, action: str, tool_input: str) -> Dict[str, Any]:
+        # Tokens of the LLM call(s) since the previous step produced this action
+        step = {"action": action, "input": tool_input, "tokens": self._pending_tokens}
+        self._pending_tokens = 0
+        self._step_started_at = time.perf_counter()
+        self.steps.append(step)
+        return step
+
+    def _finish_step(self, observation: str) -> bool:
+        if not self.steps or "observation" in self.steps[-1]:
+            return False
+        step = self.steps[-1]
+        step["observation"] = _truncate(observation)
+        if self._step_started_at is not None:
+            step["duration_ms"] = round((time.perf_counter() - self._step_started_at) * 1000, 1)
+            self._step_started_at = None
+        return True
+
+    def on_query_event(self, event: str, data: Dict[str, Any]) -> None:
+        """Events raised by the query pipeline itself rather than by langchain."""
+        with self._lock:
+            if event == "sql":
+                self._start_step("sql_db_query", data["sql"])
+            elif event == "rows":
+                self._finish_step(str(data["rows"]))
+        self._emit(event, data)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        with self._lock:
+            self.llm_calls += 1
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any) -> None:
+        with self._lock:
+            self.llm_calls += 1
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        prompt_tokens, completion_tokens = get_token_usage(response)
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self._pending_tokens += prompt_tokens + completion_tokens
+
+    def on_agent_action(self, action: AgentAction, **kwargs: Any) -> None:
+        with self._lock:
+            step = self._start_step(action.tool, str(action.tool_input))
+            event = {"action": step["action"], "input": step["input"]}
+        self._emit("step", event)
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        observation = str(output)
+        with self._lock:
+            finished = self._finish_step(observation)
+        if finished:
+            self._emit("observation", {"output": _truncate(observation)})
+
+    def on_tool_error(self, error: BaseException, **kwargs: Any) -> None:
+        self.on_tool_end(f"Error: {error}")
+
+    def on_agent_finish(self, finish: AgentFinish, **kwargs: Any) -> None:
+        self.final_answer = finish.return_values.get("output")
+        self._emit("answer", {"text": self.final_answer})
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if token:
+            self._emit("token", {"text": token})
+
+    def thought_process(self) -> Optional[Dict[str, Any]]:
+        """The compact trace, in the shape the chat UI renders."""
+        with self._lock:
+            if not self.steps and self.final_answer is None:
+                return None
+            return {
+                "steps": [dict(step) for step in self.steps],
+                "final_answer": self.final_answer,
+                "llm_calls": self.llm_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_ms": round((time.perf_counter() - self._started_at) * 1000, 1),
+            }
+
+    def last_sql(self) -> Optional[str]:
+        """The most recent SQL the agent ran, if any."""
+        with self._lock:
+            for step in reversed(self.steps):
+                if step["action"] == "sql_db_query":
+                    return step["input"]
+        return None
+
+def emit_query_event(callbacks: Optional[List[BaseCallbackHandler]], event: str, data: Dict[str, Any]) -> None:
+    """Send a pipeline event to every QueryEventHandler in callbacks."""
+    for handler in callbacks or []:
+        if isinstance(handler, QueryEventHandler):
+            handler.on_query_event(event, data)
@@ -1,8 +1,13 @@
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Optional
 import sys
 from rich.console import Console
 from rich.table import Table
 
+if TYPE_CHECKING:
+    # src.results pulls in SQLAlchemy, sqlglot and langchain; the welcome
+    # message should not wait for them
+    from .results import QueryResult
+
 console = Console()
 
 def print_welcome_message():
@@ -12,20 +17,30 @@ def print_welcome_message():
 
 def print_results(sql_query: str, results: Any):
     """Print SQL query and results in a formatted way."""
+    from .results import QueryResult
+
     console.print("\n[bold green]Generated SQL:[/bold green]")
     console.print(sql_query)
     
     console.print("\n[bold green]Results:[/bold green]")
-    if isinstance(results, str):
-        console.print(results)
+    if isinstance(results, QueryResult):
+        console.print(build_table(results))
+        if results.has_more:
+            console.print(f"[dim]Showing the first {results.row_count} rows.[/dim]")
     else:
-        # Attempt to format as table if possible
-        try:
-            table = Table(show_header=True)
-            # Add columns and rows based on results structure
-            console.print(table)
-        except:
-            console.print(results)
+        console.print(results)
+
+def build_table(result: "QueryResult") -> Table:
+    """Render a query result as a rich Table."""
+    from .results import to_json_value
+
+    table = Table(show_header=True)
+    for name, type_ in zip(result.columns, result.types):
+        numeric = type_ in ("integer", "float", "decimal")
+        table.add_column(name, justify="right" if numeric else "left")
+    for row in result.rows():
+        table.add_row(*("" if v is None else str(to_json_value(v)) for v in row))
+    return table
 
 def get_user_input() -> str:
     """Get input from user."""
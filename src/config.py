@@ -1,13 +1,46 @@
 from dotenv import load_dotenv
 import os
-from typing import Optional
-from langchain_core.language_models import BaseChatModel
-from langchain_openai import ChatOpenAI
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
 
 load_dotenv()
 
+def get_int_env(name: str, default: int) -> int:
+    """Read an integer setting from the environment."""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+
+def get_float_env(name: str, default: float) -> float:
+    """Read a float setting from the environment."""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got {value!r}")
+
+def get_bool_env(name: str, default: bool) -> bool:
+    """Read a boolean setting (1/0, true/false, yes/no) from the environment."""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
 def get_database_url() -> str:
     """Get database URL from environment variables."""
+    # A full URL (e.g. sqlite:///ecommerce.db) takes precedence over DB_* parts
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return url
+
     user = os.getenv("DB_USER")
     password = os.getenv("DB_PASSWORD")
     host = os.getenv("DB_HOST", "localhost")
@@ -19,14 +52,13 @@ def get_database_url() -> str:
         
     return f"mysql+mysqlconnector://{user}:{password}@{host}:{port}/{database}"
 
-def get_llm() -> BaseChatModel:
-    """Initialize and return the LLM."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY environment variable is required")
-        
-    return ChatOpenAI(
-        model="gpt-4-turbo-preview",
-        temperature=0,
-        api_key=api_key
-    ) 
\ No newline at end of file
+def get_llm(sql_generation: bool = False, **kwargs: Any) -> "BaseChatModel":
+    """Initialize and return the LLM of the configured backend (LLM_BACKEND).
+
+    sql_generation=True is for single-shot SQL generation prompts, which may
+    be batched (LLM_BATCH_WINDOW_MS); kwargs go to the model client.
+    """
+    # The OpenAI SDK takes about a second to import; only pay for it here
+    from .llm import create_llm, create_sql_llm
+
+    return create_sql_llm(**kwargs) if sql_generation else create_llm(**kwargs) 
\ No newline at end of file
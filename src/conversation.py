@@ -0,0 +1,222 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Collection, Dict, List, Optional
+
+from .metrics import REGISTRY
+from .schema_index import expand_query, tokenize
+from .shared_store import SharedStore
+
+CONVERSATION_TURNS = REGISTRY.counter(
+    "chatdb_conversation_turns_total",
+    "Questions asked within a session, by whether they built on an earlier answer",
+    ["kind"]
+)
+SESSIONS_EVICTED = REGISTRY.counter(
+    "chatdb_sessions_evicted_total",
+    "Conversation sessions dropped from memory",
+    ["reason"]
+)
+
+# Wording that only makes sense relative to the previous answer:
+# "now only for Electronics", "what about last year?", "sort them by price"
+FOLLOW_UP_START_RE = re.compile(
+    r"^\s*(now|but|also|then|same|what about|how about|break it|make it)\b",
+    re.IGNORECASE
+)
+FOLLOW_UP_REFERENCE_RE = re.compile(
+    r"\b(those|these|them|that one|the same|the above|instead)\b",
+    re.IGNORECASE
+)
+# Openings that narrow the previous answer ("only the top 3") but also start
+# questions of their own ("sort products by price")
+FOLLOW_UP_WEAK_START_RE = re.compile(
+    r"^\s*(and|only|just|except|excluding|without|sort)\b",
+    re.IGNORECASE
+)
+
+def is_follow_up(question: str, table_terms: Collection[str] = ()) -> bool:
+    """Whether question refers back to the previous answer rather than standing alone.
+
+    A back-reference ("them", "what about ...") always makes a follow-up; a
+    narrowing opening ("only", "sort") only when the question names none
+    of table_terms (SchemaIndex.table_terms), so it has nothing to run on
+    by itself.
+    """
+    if FOLLOW_UP_START_RE.search(question) or FOLLOW_UP_REFERENCE_RE.search(question):
+        return True
+    if FOLLOW_UP_WEAK_START_RE.search(question):
+        return not set(expand_query(tokenize(question))) & set(table_terms)
+    return False
+
+@dataclass
+class Turn:
+    question: str
+    sql: Optional[str]
+    summary: str
+    tables: List[str]
+
+@dataclass
+class Session:
+    turns: List[Turn] = field(default_factory=list)
+    # Older turns, one line each, compacted to at most summary_chars
+    summary: str = ""
+    last_used: float = field(default_factory=time.time)
+
+@dataclass
+class ConversationContext:
+    """What a follow-up question can build on: earlier turns and the last SQL."""
+    summary: str
+    turns: List[Turn]
+
+    @property
+    def previous_sql(self) -> Optional[str]:
+        for turn in reversed(self.turns):
+            if turn.sql:
+                return turn.sql
+        return None
+
+    @property
+    def tables(self) -> List[str]:
+        tables: List[str] = []
+        for turn in self.turns:
+            tables.extend(table for table in turn.tables if table not in tables)
+        return tables
+
+    def to_prompt(self) -> str:
+        """The conversation so far, formatted for a SQL prompt."""
+        parts = ["This question follows up on an earlier conversation."]
+        if self.summary:
+            parts.append(f"Earlier questions:\n{self.summary}")
+        for turn in self.turns:
+            lines = [f"Question: {turn.question}"]
+            if turn.sql:
+                lines.append(f"SQLQuery: {turn.sql}")
+            lines.append(f"Result: {turn.summary}")
+            parts.append("\n".join(lines))
+        if self.previous_sql:
+            parts.append(
+                "Start from the last SQLQuery above and change only what the new question asks for "
+                "(filters, grouping, ordering, limits); keep the rest of it."
+            )
+        return "\n\n".join(parts) + "\n\n"
+
+class ConversationStore:
+    """Per-session conversation state for follow-up questions.
+
+    Each session keeps its last ``max_turns`` turns (question, SQL, a
+    result summary of at most ``result_chars`` and the tables read) in
+    full; older turns are compacted into one line each, keeping the
+    newest ``summary_chars`` of them. Sessions idle for ``idle_ttl``
+    seconds are dropped, as are the least recently used ones beyond
+    ``max_sessions``. With a shared store, sessions are also written
+    there, so a conversation can continue on another worker.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        idle_ttl: int = 1800,
+        max_turns: int = 3,
+        summary_chars: int = 1000,
+        result_chars: int = 300,
+        store: Optional[SharedStore] = None,
+        store_prefix: str = "session:"
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.summary_chars = summary_chars
+        self.result_chars = result_chars
+        self.store = store
+        self.store_prefix = store_prefix
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def context(self, session_id: str) -> Optional[ConversationContext]:
+        """The session's conversation so far, or None for a new or expired session."""
+        with self._lock:
+            self._evict_idle()
+            session = self._session(session_id)
+            if session is None or not (session.turns or session.summary):
+                return None
+            session.last_used = time.time()
+            return ConversationContext(summary=session.summary, turns=list(session.turns))
+
+    def record(
+        self,
+        session_id: str,
+        question: str,
+        sql: Optional[str],
+        result: str,
+        tables: List[str],
+        follow_up: bool = False
+    ) -> None:
+        """Append a turn, compacting the oldest full turn if over max_turns."""
+        summary = " ".join(result.split())
+        if len(summary) > self.result_chars:
+            summary = summary[:self.result_chars - 3] + "..."
+        turn = Turn(question=question, sql=sql, summary=summary, tables=list(tables))
+        with self._lock:
+            self._evict_idle()
+            session = self._session(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session()
+            session.turns.append(turn)
+            while len(session.turns) > self.max_turns:
+                self._compact(session, session.turns.pop(0))
+            session.last_used = time.time()
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                SESSIONS_EVICTED.inc(reason="capacity")
+            if self.store is not None:
+                self.store.set(self.store_prefix + session_id, session, self.idle_ttl)
+        CONVERSATION_TURNS.inc(kind="follow_up" if follow_up else "standalone")
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self.store is not None:
+            self.store.delete(self.store_prefix + session_id)
+
+    def _session(self, session_id: str) -> Optional[Session]:
+        if self.store is not None:
+            # The store has the latest turns, wherever they were answered
+            session = self.store.get(self.store_prefix + session_id)
+            if session is not None:
+                self._sessions[session_id] = session
+        else:
+            session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _compact(self, session: Session, turn: Turn) -> None:
+        tables = f" [{', '.join(turn.tables)}]" if turn.tables else ""
+        line = f"- {turn.question}{tables}: {turn.summary[:80]}"[:self.summary_chars]
+        summary = f"{session.summary}\n{line}" if session.summary else line
+        # Drop the oldest lines first
+        while len(summary) > self.summary_chars:
+            summary = summary.split("\n", 1)[1]
+        session.summary = summary
+
+    def _evict_idle(self) -> None:
+        cutoff = time.time() - self.idle_ttl
+        # Oldest first: stop at the first session used since the cutoff
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used >= cutoff:
+                break
+            del self._sessions[session_id]
+            SESSIONS_EVICTED.inc(reason="idle")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._evict_idle()
+            return {
+                "sessions": len(self._sessions),
+                "turns": sum(len(session.turns) for session in self._sessions.values()),
+            }
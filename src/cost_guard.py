@@ -0,0 +1,311 @@
+import logging
+import re
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_community.agent_toolkits import SQLDatabaseToolkit
+from langchain_community.tools.sql_database.tool import QuerySQLDatabaseTool
+from langchain_community.utilities.sql_database import truncate_word
+from langchain_core.tools import BaseTool
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlglot import exp
+
+from .analytics_backend import get_analytics_mirror
+from .config import get_int_env
+from .metrics import REGISTRY, track_stage
+from .sql_validation import SQLValidationError, get_sqlglot_dialect, parse_sql
+
+logger = logging.getLogger(__name__)
+
+COST_CHECKS = REGISTRY.counter(
+    "chatdb_cost_guard_total", "Generated queries checked against the cost budget, by outcome", ["outcome"]
+)
+COST_UNDERESTIMATES = REGISTRY.counter(
+    "chatdb_cost_guard_underestimates_total",
+    "Checked queries that returned more rows than they were estimated to examine"
+)
+
+# SQLite's own guesses when sqlite_stat1 has nothing for an index
+DEFAULT_EQ_ROWS = 10
+RANGE_FRACTION = 4
+
+_SEARCH_INDEX = re.compile(r"USING (?:AUTOMATIC )?(?:COVERING )?INDEX (\S+)(?: \((.*)\))?")
+
+class QueryCostError(SQLValidationError):
+    """Generated SQL would examine more rows than the configured budget."""
+
+@dataclass
+class CostCheck:
+    """Outcome of checking one query: the SQL to run and its estimated cost."""
+    sql: str
+    # None when the plan could not be estimated for this dialect
+    estimated_rows: Optional[int]
+    limit_added: bool = False
+
+def _table_aliases(tree: exp.Expression) -> Dict[str, str]:
+    """Map every alias (and bare name) used in the query to its table."""
+    aliases = {}
+    for table in tree.find_all(exp.Table):
+        aliases[table.alias_or_name.lower()] = table.name.lower()
+        aliases.setdefault(table.name.lower(), table.name.lower())
+    return aliases
+
+class CostGuard:
+    """Estimates rows examined from the query plan and enforces a budget.
+
+    The estimate comes from EXPLAIN (MySQL) or EXPLAIN QUERY PLAN plus
+    sqlite_stat1 (SQLite); other dialects, and queries the analytics mirror
+    will answer, are not checked. Queries without
+    a LIMIT get one added so the agent never pulls an unbounded result.
+    """
+
+    def __init__(self, engine: Engine, max_rows_examined: int = 50_000_000, row_limit: int = 1000,
+                 stats_ttl: int = 300):
+        self.engine = engine
+        self.max_rows_examined = max_rows_examined
+        self.row_limit = row_limit
+        self.stats_ttl = stats_ttl
+        self._table_rows: Dict[str, int] = {}
+        self._index_stats: Dict[str, List[int]] = {}
+        self._stats_loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def check(self, sql: str, dialect: str, add_limit: bool = False, conn: Optional[Connection] = None) -> CostCheck:
+        """Return the SQL to run, raising QueryCostError if it is over budget.
+
+        The plan is read on conn if given, else on a connection of the engine.
+        """
+        tree = parse_sql(sql, dialect)
+        limit_added = False
+        if add_limit and self.row_limit > 0 and isinstance(tree, (exp.Select, exp.SetOperation)) \
+                and not tree.args.get("limit"):
+            tree = tree.limit(self.row_limit)
+            sql = tree.sql(dialect=get_sqlglot_dialect(dialect))
+            limit_added = True
+        if self.max_rows_examined <= 0:
+            return CostCheck(sql, None, limit_added)
+        mirror = get_analytics_mirror(self.engine)
+        if mirror is not None and mirror.to_duckdb(sql, dialect) is not None:
+            # The mirror scans columns, not the source's rows
+            COST_CHECKS.inc(outcome="routed")
+            return CostCheck(sql, None, limit_added)
+
+        with track_stage("cost_check"):
+            estimated = self.estimate_rows_examined(sql, dialect, tree, conn)
+        if estimated is None:
+            COST_CHECKS.inc(outcome="skipped")
+            return CostCheck(sql, None, limit_added)
+        if estimated > self.max_rows_examined:
+            COST_CHECKS.inc(outcome="rejected")
+            logger.warning("Rejected query estimated to examine %d rows (budget %d): %s",
+                           estimated, self.max_rows_examined, sql)
+            raise QueryCostError(
+                f"Query would examine about {estimated:,} rows, over the budget of "
+                f"{self.max_rows_examined:,}. Add selective filters or join conditions, or aggregate instead."
+            )
+        COST_CHECKS.inc(outcome="passed")
+        return CostCheck(sql, estimated, limit_added)
+
+    def record_returned(self, check: CostCheck, rows: int) -> None:
+        """Flag an estimate the query's result proves too low.
+
+        Neither database reports the rows a query actually examined, and
+        for aggregates they have nothing to do with the rows returned. A
+        query does examine at least as many rows as it returns, though, so
+        returning more than the estimate (rows fetched so far counts) is a
+        certain underestimate.
+        """
+        if check.estimated_rows is not None and rows > check.estimated_rows:
+            COST_UNDERESTIMATES.inc()
+            logger.info("Query estimated to examine %d rows returned %d rows: %s",
+                        check.estimated_rows, rows, check.sql)
+
+    def estimate_rows_examined(
+        self, sql: str, dialect: str, tree: Optional[exp.Expression] = None, conn: Optional[Connection] = None
+    ) -> Optional[int]:
+        """Rows the database expects to read for sql, or None if unknown."""
+        if dialect not in ("sqlite", "mysql"):
+            return None
+        try:
+            with (nullcontext(conn) if conn is not None else self.engine.connect()) as conn:
+                if dialect == "mysql":
+                    return self._estimate_mysql(conn, sql)
+                return self._estimate_sqlite(conn, sql, tree if tree is not None else parse_sql(sql, dialect))
+        except Exception as e:
+            # A query EXPLAIN cannot plan fails the same way when run, with a
+            # better message, so leave it to the caller to execute
+            logger.debug("Could not estimate the cost of %s: %s", sql, e)
+            return None
+
+    def _estimate_mysql(self, conn: Connection, sql: str) -> int:
+        # One row per table access; rows * filtered% is the fan-out into the
+        # next table of the same SELECT, and dependent subqueries run once
+        # per row of the outer query
+        plan = [dict(row._mapping) for row in conn.execute(text(f"EXPLAIN {sql}"))]
+        groups: Dict[Any, List[Dict]] = {}
+        for row in plan:
+            groups.setdefault(row.get("id"), []).append(row)
+        total = 0.0
+        outer_rows = 1.0
+        for select_id, rows in groups.items():
+            prefix = 1.0
+            examined = 0.0
+            for row in rows:
+                prefix *= float(row.get("rows") or 1)
+                examined += prefix
+                prefix *= float(row.get("filtered") or 100) / 100
+            if "DEPENDENT" in str(rows[0].get("select_type", "")).upper():
+                examined *= outer_rows
+            elif select_id == 1:
+                outer_rows = max(prefix, 1.0)
+            total += examined
+        return int(total)
+
+    def _estimate_sqlite(self, conn: Connection, sql: str, tree: exp.Expression) -> int:
+        self._load_sqlite_stats(conn)
+        # (id, parent, notused, detail); children are listed under their parent
+        plan = [tuple(row) for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+        children: Dict[int, List[Tuple[int, str]]] = {}
+        for node_id, parent, _, detail in plan:
+            children.setdefault(parent, []).append((node_id, detail))
+        aliases = _table_aliases(tree)
+        # Rows produced by MATERIALIZE/CO-ROUTINE subqueries, scanned later by name
+        derived: Dict[str, int] = {}
+
+        def cost(parent: int) -> Tuple[float, float]:
+            """Rows examined under parent, and rows it produces."""
+            examined = 0.0
+            loop_rows = 1.0
+            for node_id, detail in children.get(parent, []):
+                if detail.startswith(("SCAN ", "SEARCH ")):
+                    rows, build = self._sqlite_loop_rows(detail, aliases, derived)
+                    examined += build
+                    loop_rows *= max(rows, 1.0)
+                    examined += loop_rows
+                    continue
+                sub_examined, sub_rows = cost(node_id)
+                if detail.startswith("CORRELATED"):
+                    sub_examined *= loop_rows
+                match = re.match(r"(?:MATERIALIZE|CO-ROUTINE) (\S+)", detail)
+                if match:
+                    derived[match.group(1).lower()] = int(sub_rows)
+                examined += sub_examined
+            return examined, loop_rows
+
+        return int(cost(0)[0])
+
+    def _sqlite_loop_rows(self, detail: str, aliases: Dict[str, str], derived: Dict[str, int]) -> Tuple[float, float]:
+        """Rows one SCAN/SEARCH step yields per outer row, and one-off build cost."""
+        name = detail.split(" ", 2)[1].lower()
+        if name in derived:
+            table_rows = derived[name]
+        else:
+            table_rows = self._table_rows.get(aliases.get(name, name), 1)
+        if detail.startswith("SCAN "):
+            return float(table_rows), 0.0
+        constraint = detail[detail.find("(") + 1:detail.rfind(")")] if "(" in detail else ""
+        equalities = constraint.count("=?")
+        if "PRIMARY KEY" in detail and not _SEARCH_INDEX.search(detail):
+            return (1.0 if equalities else table_rows / RANGE_FRACTION), 0.0
+        match = _SEARCH_INDEX.search(detail)
+        build = float(table_rows) if "AUTOMATIC" in detail else 0.0
+        stats = self._index_stats.get(match.group(1).lower()) if match else None
+        if not equalities:
+            return table_rows / RANGE_FRACTION, build
+        if stats and len(stats) > equalities:
+            return float(stats[equalities]), build
+        return float(min(DEFAULT_EQ_ROWS, table_rows)), build
+
+    def _load_sqlite_stats(self, conn: Connection) -> None:
+        """Read table sizes and index selectivity, at most once per stats_ttl."""
+        with self._lock:
+            if time.time() - self._stats_loaded_at < self.stats_ttl:
+                return
+            table_rows: Dict[str, int] = {}
+            index_stats: Dict[str, List[int]] = {}
+            has_stat1 = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+            )).first()
+            if has_stat1:
+                for table, index, stat in conn.execute(text("SELECT tbl, idx, stat FROM sqlite_stat1")):
+                    numbers = [int(n) for n in str(stat).split() if n.isdigit()]
+                    if not numbers:
+                        continue
+                    table_rows.setdefault(table.lower(), numbers[0])
+                    if index:
+                        index_stats[index.lower()] = numbers
+            # Tables ANALYZE has not seen: MAX(rowid) is an index lookup, unlike COUNT(*)
+            tables = [row[0] for row in conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            ))]
+            for table in tables:
+                if table.lower() in table_rows:
+                    continue
+                try:
+                    rows = conn.execute(text(f'SELECT MAX(rowid) FROM "{table}"')).scalar()
+                except Exception:
+                    rows = conn.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+                table_rows[table.lower()] = int(rows or 0)
+            self._table_rows = table_rows
+            self._index_stats = index_stats
+            self._stats_loaded_at = time.time()
+
+_guards: Dict[str, CostGuard] = {}
+_guards_lock = threading.Lock()
+
+def get_cost_guard(engine: Engine) -> CostGuard:
+    """Return the process-wide CostGuard for engine's database URL."""
+    url = engine.url.render_as_string(hide_password=False)
+    with _guards_lock:
+        guard = _guards.get(url)
+        if guard is None:
+            guard = CostGuard(
+                engine,
+                max_rows_examined=get_int_env("COST_GUARD_MAX_ROWS_EXAMINED", 50_000_000),
+                row_limit=get_int_env("COST_GUARD_ROW_LIMIT", 1000)
+            )
+            _guards[url] = guard
+        return guard
+
+class GuardedQuerySQLDatabaseTool(QuerySQLDatabaseTool):
+    """sql_db_query that checks each query's cost before running it.
+
+    An over-budget query, or one that cannot be parsed and so cannot be
+    checked, comes back to the agent as an error message, so it rewrites
+    the query rather than the whole run failing.
+    """
+
+    def _run(self, query: str, run_manager: Any = None) -> Any:
+        guard = get_cost_guard(self.db._engine)
+        try:
+            check = guard.check(query, self.db.dialect, add_limit=True)
+        except SQLValidationError as e:
+            # QueryCostError included: nothing runs without a cost check
+            return f"Error: {e} Rewrite the query and try again."
+        try:
+            rows = self.db._execute(check.sql)
+        except SQLAlchemyError as e:
+            return f"Error: {e}"
+        guard.record_returned(check, len(rows))
+        # Formatted as SQLDatabase.run formats them
+        result = [
+            tuple(truncate_word(value, length=self.db._max_string_length) for value in row.values())
+            for row in rows
+        ]
+        return str(result) if result else ""
+
+class GuardedSQLDatabaseToolkit(SQLDatabaseToolkit):
+    """SQLDatabaseToolkit whose query tool goes through the cost guard."""
+
+    def get_tools(self) -> List[BaseTool]:
+        tools = super().get_tools()
+        return [
+            GuardedQuerySQLDatabaseTool(db=tool.db, description=tool.description)
+            if isinstance(tool, QuerySQLDatabaseTool) else tool
+            for tool in tools
+        ]
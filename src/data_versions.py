@@ -0,0 +1,127 @@
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from .config import get_int_env
+from .shared_store import SharedStore, get_shared_store, store_namespace
+
+def open_sqlite_probe(engine: Engine) -> Any:
+    """A DBAPI connection of its own to engine's SQLite database, for PRAGMA data_version.
+
+    It is kept outside the pool: data_version only moves for commits made
+    by other connections, so it must be read on one connection that never
+    writes.
+    """
+    cargs, cparams = engine.dialect.create_connect_args(engine.url)
+    return engine.dialect.dbapi.connect(*cargs, **{**cparams, "check_same_thread": False})
+
+def read_table_versions(engine: Engine, probe: Any = None) -> Dict[str, str]:
+    """Read a cheap change marker for every table.
+
+    MySQL reports UPDATE_TIME, AUTO_INCREMENT and TABLE_ROWS from
+    INFORMATION_SCHEMA in a single query, read with MySQL 8's statistics
+    cache (information_schema_stats_expiry, a day by default) turned off.
+    SQLite has no per-table change time: MAX(rowid) tracks inserts per
+    table, and PRAGMA data_version on probe (see open_sqlite_probe) moves
+    with every commit to the database, so updates and deletes change the
+    marker of every table. Without a probe they need an explicit bump().
+    """
+    dialect = engine.dialect.name
+    with engine.connect() as conn:
+        if dialect == "mysql":
+            try:
+                conn.execute(text("SET SESSION information_schema_stats_expiry = 0"))
+            except DBAPIError:
+                # MySQL 5.7 and MariaDB have no such cache
+                conn.rollback()
+            rows = conn.execute(text(
+                "SELECT TABLE_NAME, UPDATE_TIME, AUTO_INCREMENT, TABLE_ROWS "
+                "FROM information_schema.tables WHERE TABLE_SCHEMA = DATABASE()"
+            )).fetchall()
+            return {row[0]: f"{row[1]}:{row[2]}:{row[3]}" for row in rows}
+        if dialect == "sqlite":
+            changes = probe.execute("PRAGMA data_version").fetchone()[0] if probe is not None else ""
+            versions = {}
+            for table in inspect(engine).get_table_names():
+                max_rowid = conn.execute(text(f'SELECT MAX(rowid) FROM "{table}"')).scalar()
+                versions[table] = f"{max_rowid}:{changes}"
+            return versions
+    return {}
+
+class DataVersionTracker:
+    """Polls table change markers at most every ``poll_interval`` seconds.
+
+    ``bump(table)`` is the explicit invalidation hook for writers that know
+    they changed a table; it takes effect immediately. With a shared store
+    the bump counters live there, so other workers see them at their next
+    poll.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        poll_interval: int = 5,
+        store: Optional[SharedStore] = None,
+        store_prefix: str = ""
+    ):
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.store = store
+        self.store_prefix = store_prefix
+        self._versions: Dict[str, str] = {}
+        self._bumps: Dict[str, int] = {}
+        self._polled_at = 0.0
+        self._probe = open_sqlite_probe(engine) if engine.dialect.name == "sqlite" else None
+        self._lock = threading.Lock()
+
+    def table_versions(self) -> Dict[str, str]:
+        """Current version string of every table."""
+        with self._lock:
+            now = time.time()
+            if now - self._polled_at > self.poll_interval:
+                self._versions = read_table_versions(self.engine, self._probe)
+                if self.store is not None:
+                    self._bumps = self.store.get_counters(self.store_prefix)
+                self._polled_at = now
+            return {
+                table: f"{version}:{self._bumps.get(table, 0)}"
+                for table, version in self._versions.items()
+            }
+
+    def version(self, tables: Optional[Iterable[str]] = None) -> str:
+        """Combined version of some tables (default: the whole database)."""
+        versions = self.table_versions()
+        names = sorted(versions if tables is None else set(tables))
+        payload = "|".join(f"{name}={versions.get(name, '')}" for name in names)
+        return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+    def bump(self, table: str) -> None:
+        """Mark a table as changed without waiting for the next poll."""
+        with self._lock:
+            if self.store is not None:
+                self._bumps[table] = self.store.incr(self.store_prefix + table)
+            else:
+                self._bumps[table] = self._bumps.get(table, 0) + 1
+
+_trackers: Dict[str, DataVersionTracker] = {}
+_trackers_lock = threading.Lock()
+
+def get_data_version_tracker(engine: Engine) -> DataVersionTracker:
+    """Return the process-wide DataVersionTracker for engine's database URL."""
+    url = engine.url.render_as_string(hide_password=False)
+    with _trackers_lock:
+        tracker = _trackers.get(url)
+        if tracker is None:
+            tracker = DataVersionTracker(
+                engine,
+                poll_interval=get_int_env("DATA_VERSION_POLL_INTERVAL", 5),
+                store=get_shared_store(),
+                store_prefix=f"bump:{store_namespace(url)}:"
+            )
+            _trackers[url] = tracker
+        return tracker
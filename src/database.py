@@ -1,29 +1,194 @@
+import re
+import threading
+import time
 from typing import Any, Dict, Optional
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 from langchain_community.utilities import SQLDatabase
 from langchain_core.language_models import BaseChatModel
 from langchain.chains import create_sql_query_chain
 from langchain_core.output_parsers import StrOutputParser
+from .budget import current_budget
+from .config import get_bool_env, get_int_env
+from .examples_store import few_shot_prompt
+from .result_cache import CachedSQLDatabase
+from .schema_cache import get_schema_cache
+from .summary_tables import describe_summary_tables
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+# Statements the MAX_EXECUTION_TIME optimizer hint can be added to
+SELECT_RE = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+def _set_mysql_statement_timeout(engine: Engine, timeout_ms: int) -> None:
+    # MAX_EXECUTION_TIME aborts long-running SELECTs on the server side
+    @event.listens_for(engine, "connect")
+    def set_max_execution_time(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {int(timeout_ms)}")
+        cursor.close()
+
+def _limit_mysql_statements_to_budget(engine: Engine, timeout_ms: int) -> None:
+    # A SELECT run for a request with a deadline gets at most the time left,
+    # via an optimizer hint, as the session's MAX_EXECUTION_TIME is fixed
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def add_max_execution_time(conn, cursor, statement, parameters, context, executemany):
+        budget = current_budget()
+        remaining = budget.remaining() if budget is not None else None
+        if remaining is not None and SELECT_RE.match(statement):
+            limit_ms = max(1, int(remaining * 1000))
+            if timeout_ms > 0:
+                limit_ms = min(limit_ms, timeout_ms)
+            statement = SELECT_RE.sub(rf"\g<0> /*+ MAX_EXECUTION_TIME({limit_ms}) */", statement, 1)
+        return statement, parameters
+
+def _set_sqlite_statement_timeout(engine: Engine, timeout_ms: int) -> None:
+    # SQLite has no server-side limit, so abort from a progress handler once
+    # the current statement (including fetching its rows) runs too long or
+    # the request it runs for is out of time or cancelled
+    @event.listens_for(engine, "connect")
+    def install_progress_handler(dbapi_connection, connection_record):
+        # [deadline, request budget] of the running statement
+        running = connection_record.info["statement_deadline"] = [None, None]
+
+        def interrupt() -> int:
+            return int(
+                (running[0] is not None and time.monotonic() > running[0])
+                or (running[1] is not None and running[1].exceeded() is not None)
+            )
+
+        if hasattr(dbapi_connection, "run_async"):
+            # aiosqlite, through an async engine (see src/async_database.py)
+            dbapi_connection.run_async(lambda conn: conn.set_progress_handler(interrupt, 10000))
+        else:
+            dbapi_connection.set_progress_handler(interrupt, 10000)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement_clock(conn, cursor, statement, parameters, context, executemany):
+        running = conn.connection.info.get("statement_deadline")
+        if running is not None:
+            running[0] = time.monotonic() + timeout_ms / 1000 if timeout_ms > 0 else None
+            running[1] = current_budget()
+
+    @event.listens_for(engine, "checkin")
+    def stop_statement_clock(dbapi_connection, connection_record):
+        running = connection_record.info.get("statement_deadline")
+        if running is not None:
+            running[0] = running[1] = None
+
+def install_statement_limits(engine: Engine) -> None:
+    """Apply DB_STATEMENT_TIMEOUT_MS and request-budget deadlines to engine's statements.
+
+    For an async engine, pass its ``sync_engine``.
+    """
+    timeout_ms = get_int_env("DB_STATEMENT_TIMEOUT_MS", 30000)
+    if engine.dialect.name == "sqlite":
+        # Installed even without a timeout, to stop statements of requests out of budget
+        _set_sqlite_statement_timeout(engine, timeout_ms)
+    elif engine.dialect.name == "mysql":
+        if timeout_ms > 0:
+            _set_mysql_statement_timeout(engine, timeout_ms)
+        _limit_mysql_statements_to_budget(engine, timeout_ms)
+
+def create_db_engine(database_url: str) -> Engine:
+    """Create an engine with pool and statement-timeout settings from the environment."""
+    if database_url.startswith("sqlite"):
+        # Pool sizing does not apply to SQLite; it only needs cross-thread use
+        engine = create_engine(database_url, connect_args={"check_same_thread": False})
+        install_statement_limits(engine)
+        return engine
+
+    engine = create_engine(
+        database_url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=get_int_env("DB_POOL_SIZE", 5),
+        max_overflow=get_int_env("DB_MAX_OVERFLOW", 10),
+        pool_timeout=get_int_env("DB_POOL_TIMEOUT", 30),
+        # Recycle well before MySQL's wait_timeout closes idle connections
+        pool_recycle=get_int_env("DB_POOL_RECYCLE", 1800),
+        pool_pre_ping=get_bool_env("DB_POOL_PRE_PING", True),
+    )
+    install_statement_limits(engine)
+    return engine
+
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+def get_engine(database_url: str) -> Engine:
+    """Return the process-wide engine for a database URL, creating it once."""
+    with _engines_lock:
+        engine = _engines.get(database_url)
+        if engine is None:
+            engine = create_db_engine(database_url)
+            _engines[database_url] = engine
+        return engine
+
+def get_pool_stats(engine: Engine) -> Dict[str, Any]:
+    """Report connection pool usage for an engine."""
+    pool = engine.pool
+    stats: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(0, pool.overflow()),
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._stats_lock:
+            stats.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                avg_wait_ms=round(pool.total_wait / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+                max_wait_ms=round(pool.max_wait * 1000, 3),
+            )
+    return stats
 
 def create_db_connection(database_url: str) -> SQLDatabase:
     """Create and return a SQLDatabase instance."""
     try:
-        return SQLDatabase.from_uri(database_url)
+        db = CachedSQLDatabase(get_engine(database_url))
+        describe_summary_tables(db)
+        return db
     except Exception as e:
         raise ConnectionError(f"Failed to connect to database: {str(e)}")
 
 def get_schema_info(db: SQLDatabase) -> str:
     """Get database schema information."""
-    inspector = inspect(db.engine)
+    snapshot = get_schema_cache(db).get()
     schema_info = []
     
-    for table_name in inspector.get_table_names():
-        columns = inspector.get_columns(table_name)
-        column_info = [f"{col['name']} ({col['type']})" for col in columns]
+    for table_name, table in snapshot.tables.items():
+        column_info = [f"{col['name']} ({col['type']})" for col in table.columns]
         schema_info.append(f"Table: {table_name}\nColumns: {', '.join(column_info)}\n")
     
     return "\n".join(schema_info)
 
 def setup_query_chain(db: SQLDatabase, llm: BaseChatModel):
-    """Create and return a SQL query chain."""
-    return create_sql_query_chain(llm, db) 
\ No newline at end of file
+    """Create and return a SQL query chain that accepts few-shot examples."""
+    return create_sql_query_chain(llm, db, prompt=few_shot_prompt(db.dialect))
\ No newline at end of file
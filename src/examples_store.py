@@ -0,0 +1,407 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import sqlglot
+from langchain.chains.sql_database.prompt import PROMPT, SQL_PROMPTS
+from langchain_core.prompts import BasePromptTemplate, PromptTemplate
+from sqlalchemy.engine import Engine
+
+from .answer_cache import NUMBER_RE, normalize_question
+from .config import get_float_env, get_int_env
+from .metrics import REGISTRY
+from .schema_cache import SchemaSnapshot
+from .schema_index import expand_query, tokenize
+from .shared_store import store_namespace
+from .sql_validation import SQLValidationError, clean_sql, get_sqlglot_dialect, validate_sql
+
+logger = logging.getLogger(__name__)
+
+EXAMPLE_LOOKUPS = REGISTRY.counter(
+    "chatdb_examples_total", "Few-shot example store lookups and additions, by outcome", ["outcome"]
+)
+
+# Words every question has; they would make unrelated questions look alike
+STOPWORDS = frozenset(
+    "a all an and any are by do does each every for from give have how i in is it list me my of on per "
+    "s show tell that the their there these this to what whats which who with".split()
+)
+
+# Ways of asking that the schema index's synonyms do not cover
+QUESTION_SYNONYMS = {
+    "month": ["monthly"],
+    "monthly": ["month"],
+    "best": ["top"],
+    "reviewed": ["rated", "review"],
+    "hierarchy": ["subcategory"],
+    "seller": ["selling"],
+    "unit": ["quantity"],
+}
+
+def question_tokens(question: str) -> Counter:
+    """Tokens a question is indexed and searched by."""
+    tokens = [token for token in tokenize(normalize_question(question)) if token not in STOPWORDS]
+    for token in list(tokens):
+        tokens.extend(QUESTION_SYNONYMS.get(token, []))
+    return Counter(expand_query(tokens))
+
+# Verified answers to the sample questions (MySQL dialect, translated to the
+# database's dialect when seeded); EcommerceDBChat offers these questions
+SEED_EXAMPLES = {
+    "What are the top 5 selling products by quantity?":
+        "SELECT p.name, SUM(oi.quantity) AS total_quantity FROM order_items oi "
+        "JOIN products p ON p.product_id = oi.product_id "
+        "GROUP BY p.product_id, p.name ORDER BY total_quantity DESC LIMIT 5",
+    "Show me the total revenue for each product category":
+        "SELECT c.name AS category, SUM(oi.subtotal) AS revenue FROM order_items oi "
+        "JOIN products p ON p.product_id = oi.product_id "
+        "JOIN categories c ON c.category_id = p.category_id "
+        "GROUP BY c.category_id, c.name ORDER BY revenue DESC",
+    "What's the average order value per customer?":
+        "SELECT c.customer_id, c.first_name, c.last_name, AVG(o.total_amount) AS avg_order_value "
+        "FROM customers c JOIN orders o ON o.customer_id = c.customer_id "
+        "GROUP BY c.customer_id, c.first_name, c.last_name ORDER BY avg_order_value DESC",
+    "List products with stock quantity less than 10":
+        "SELECT product_id, name, stock_quantity FROM products WHERE stock_quantity < 10 "
+        "ORDER BY stock_quantity",
+    "Show me product categories and their subcategories":
+        "SELECT parent.name AS category, child.name AS subcategory FROM categories parent "
+        "JOIN categories child ON child.parent_category_id = parent.category_id "
+        "ORDER BY parent.name, child.name",
+    "What are the top-rated products with at least 3 reviews?":
+        "SELECT p.name, AVG(r.rating) AS avg_rating, COUNT(*) AS review_count FROM reviews r "
+        "JOIN products p ON p.product_id = r.product_id GROUP BY p.product_id, p.name "
+        "HAVING COUNT(*) >= 3 ORDER BY avg_rating DESC LIMIT 10",
+    "Show me monthly sales trends":
+        "SELECT DATE_FORMAT(order_date, '%Y-%m') AS month, COUNT(*) AS orders, "
+        "SUM(total_amount) AS revenue FROM orders GROUP BY month ORDER BY month",
+    "List customers who made purchases above $500":
+        "SELECT DISTINCT c.customer_id, c.first_name, c.last_name FROM customers c "
+        "JOIN orders o ON o.customer_id = c.customer_id WHERE o.total_amount > 500",
+    "What's the distribution of order statuses?":
+        "SELECT status, COUNT(*) AS order_count FROM orders GROUP BY status ORDER BY order_count DESC",
+    "Show me the most popular products in each category":
+        "SELECT category, name, total_quantity FROM ("
+        "SELECT c.name AS category, p.name, SUM(oi.quantity) AS total_quantity, "
+        "RANK() OVER (PARTITION BY c.category_id ORDER BY SUM(oi.quantity) DESC) AS category_rank "
+        "FROM order_items oi JOIN products p ON p.product_id = oi.product_id "
+        "JOIN categories c ON c.category_id = p.category_id "
+        "GROUP BY c.category_id, c.name, p.product_id, p.name) ranked "
+        "WHERE category_rank = 1 ORDER BY category",
+}
+
+@dataclass
+class Example:
+    question: str
+    sql: str
+    # "seed" examples are never evicted or replaced by learned ones
+    source: str
+    tokens: Counter
+    numbers: frozenset
+    uses: int = 0
+    created_at: float = field(default_factory=time.time)
+
+@dataclass
+class ExampleMatch:
+    example: Example
+    similarity: float
+
+class ExampleStore:
+    """Verified (question, SQL) pairs, searchable by question similarity.
+
+    Questions are tokenized like the schema index (stemmed, with business
+    synonyms) and kept in an inverted index, so a search only scores the
+    examples sharing a word with the question; scores are TF-IDF cosine
+    similarities. Learned examples are appended to a JSON Lines file at
+    ``path`` and loaded again at start-up; past ``max_examples`` of them
+    the least recently used is dropped. Seed examples are never dropped.
+
+    ``k`` examples go into each SQL generation prompt (0 disables that);
+    an example at least ``reuse_similarity`` similar to a question has its
+    SQL run without asking the LLM (0 disables that).
+    """
+
+    def __init__(
+        self,
+        dialect: str,
+        path: Optional[str] = None,
+        max_examples: int = 1000,
+        k: int = 3,
+        reuse_similarity: float = 1.0
+    ):
+        self.dialect = dialect
+        self.path = path
+        self.max_examples = max_examples
+        self.k = k
+        self.reuse_similarity = reuse_similarity
+        self._examples: "OrderedDict[str, Example]" = OrderedDict()
+        self._postings: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._file_lines = 0
+        if path:
+            self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self._add(entry["question"], entry["sql"], "learned", entry.get("ts"))
+                except (ValueError, KeyError):
+                    # A line cut short by a crash mid-write
+                    continue
+                self._file_lines += 1
+        self._evict()
+        if self._file_lines > 2 * max(len(self._examples), 1):
+            self._compact()
+
+    def seed(self, examples: Dict[str, str], dialect: str = "mysql") -> None:
+        """Add verified examples written in ``dialect``, translated to the store's."""
+        for question, sql in examples.items():
+            if dialect != self.dialect:
+                try:
+                    sql = sqlglot.transpile(
+                        sql, read=get_sqlglot_dialect(dialect), write=get_sqlglot_dialect(self.dialect)
+                    )[0]
+                except sqlglot.errors.SqlglotError as e:
+                    logger.warning("Could not translate seed example %r: %s", question, e)
+                    continue
+            with self._lock:
+                self._add(question, sql, "seed")
+
+    def add(self, question: str, sql: str) -> bool:
+        """Remember SQL that answered a question; False if a seed already covers it."""
+        key = normalize_question(question)
+        with self._lock:
+            existing = self._examples.get(key)
+            if existing is not None and (existing.source == "seed" or existing.sql == sql):
+                return False
+            self._add(question, sql, "learned")
+            self._evict()
+            self._append(question, sql)
+        EXAMPLE_LOOKUPS.inc(outcome="learned")
+        return True
+
+    def _add(self, question: str, sql: str, source: str, created_at: Optional[float] = None) -> None:
+        key = normalize_question(question)
+        self._remove(key)
+        example = Example(
+            question, sql, source,
+            tokens=question_tokens(key),
+            numbers=frozenset(NUMBER_RE.findall(key)),
+            created_at=created_at or time.time()
+        )
+        self._examples[key] = example
+        for token in example.tokens:
+            self._postings.setdefault(token, set()).add(key)
+
+    def _remove(self, key: str) -> None:
+        example = self._examples.pop(key, None)
+        if example is None:
+            return
+        for token in example.tokens:
+            keys = self._postings.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[token]
+
+    def _evict(self) -> None:
+        learned = [key for key, example in self._examples.items() if example.source == "learned"]
+        for key in learned[:max(0, len(learned) - self.max_examples)]:
+            self._remove(key)
+
+    def _append(self, question: str, sql: str) -> None:
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": round(time.time(), 3), "question": question, "sql": sql}) + "\n")
+            self._file_lines += 1
+            if self._file_lines > 2 * self.max_examples:
+                self._compact()
+        except OSError as e:
+            # The example still helps this process; never fail a query over it
+            logger.warning("Could not save example to %s: %s", self.path, e)
+
+    def _compact(self) -> None:
+        learned = [example for example in self._examples.values() if example.source == "learned"]
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for example in learned:
+                f.write(json.dumps({
+                    "ts": round(example.created_at, 3), "question": example.question, "sql": example.sql
+                }) + "\n")
+        os.replace(temp_path, self.path)
+        self._file_lines = len(learned)
+
+    def search(self, question: str, k: int = 3, min_similarity: float = 0.1) -> List[ExampleMatch]:
+        """The k examples most similar to question, most similar first."""
+        query = question_tokens(question)
+        with self._lock:
+            total = len(self._examples)
+            idf = {token: math.log(1 + total / len(self._postings[token])) for token in query if token in self._postings}
+            candidates = set().union(*(self._postings[token] for token in idf)) if idf else set()
+            query_norm = math.sqrt(sum((count * idf.get(token, 0)) ** 2 for token, count in query.items()))
+            matches = []
+            for key in candidates:
+                example = self._examples[key]
+                dot = sum(count * example.tokens.get(token, 0) * idf[token] ** 2 for token, count in query.items()
+                          if token in idf)
+                norm = math.sqrt(sum(
+                    (count * math.log(1 + total / len(self._postings[token]))) ** 2
+                    for token, count in example.tokens.items()
+                ))
+                # Rounded first, so the same question scores exactly 1.0
+                similarity = round(dot / (query_norm * norm), 4) if query_norm and norm else 0.0
+                if similarity >= min_similarity:
+                    matches.append(ExampleMatch(example, similarity))
+            matches.sort(key=lambda match: -match.similarity)
+            for match in matches[:k]:
+                match.example.uses += 1
+                self._examples.move_to_end(normalize_question(match.example.question))
+        return matches[:k]
+
+    def reusable(self, question: str) -> Optional[ExampleMatch]:
+        """An example whose SQL answers question as is, if one is similar enough.
+
+        Both questions must mention the same numbers, so "top 5" never
+        reuses the SQL of "top 10".
+        """
+        if self.reuse_similarity <= 0:
+            return None
+        matches = self.search(question, k=1, min_similarity=self.reuse_similarity)
+        numbers = frozenset(NUMBER_RE.findall(normalize_question(question)))
+        if matches and matches[0].example.numbers == numbers:
+            EXAMPLE_LOOKUPS.inc(outcome="reused")
+            return matches[0]
+        return None
+
+    def prompt_examples(self, question: str, snapshot: Optional[SchemaSnapshot] = None) -> str:
+        """The k nearest examples formatted for a SQL prompt, or "".
+
+        With a schema snapshot, examples whose SQL no longer validates
+        against it are left out.
+        """
+        k = self.k
+        if k <= 0:
+            return ""
+        examples = []
+        for match in self.search(question, k=k * 2 if snapshot is not None else k):
+            if snapshot is not None:
+                try:
+                    validate_sql(match.example.sql, snapshot, self.dialect)
+                except SQLValidationError:
+                    continue
+            examples.append(match.example)
+            if len(examples) == k:
+                break
+        if not examples:
+            EXAMPLE_LOOKUPS.inc(outcome="none")
+            return ""
+        EXAMPLE_LOOKUPS.inc(outcome="prompted")
+        rendered = "\n\n".join(f"Question: {example.question}\nSQLQuery: {example.sql}" for example in examples)
+        return f"Examples of questions answered correctly on this database:\n\n{rendered}\n\n"
+
+    def generate_sql(
+        self,
+        chain: Any,
+        question: str,
+        snapshot: Optional[SchemaSnapshot] = None,
+        config: Optional[Dict[str, Any]] = None,
+        **inputs: Any
+    ) -> Tuple[str, bool]:
+        """SQL for question and whether it was reused rather than generated.
+
+        A matching example's SQL is returned without calling the LLM (if it
+        still validates against snapshot); otherwise the SQL query chain
+        (built with ``few_shot_prompt``) is invoked with the nearest examples.
+        """
+        sql = self._reused_sql(question, snapshot)
+        if sql is not None:
+            return sql, True
+        text = chain.invoke(
+            {"question": question, "examples": self.prompt_examples(question, snapshot), **inputs},
+            config=config
+        )
+        return clean_sql(text), False
+
+    async def agenerate_sql(
+        self,
+        chain: Any,
+        question: str,
+        snapshot: Optional[SchemaSnapshot] = None,
+        config: Optional[Dict[str, Any]] = None,
+        **inputs: Any
+    ) -> Tuple[str, bool]:
+        """generate_sql, awaiting the chain (``ainvoke``) instead of blocking on it."""
+        sql = self._reused_sql(question, snapshot)
+        if sql is not None:
+            return sql, True
+        text = await chain.ainvoke(
+            {"question": question, "examples": self.prompt_examples(question, snapshot), **inputs},
+            config=config
+        )
+        return clean_sql(text), False
+
+    def _reused_sql(self, question: str, snapshot: Optional[SchemaSnapshot]) -> Optional[str]:
+        match = self.reusable(question)
+        if match is None:
+            return None
+        if snapshot is not None:
+            try:
+                validate_sql(match.example.sql, snapshot, self.dialect)
+            except SQLValidationError:
+                return None
+        return match.example.sql
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            seeds = sum(1 for example in self._examples.values() if example.source == "seed")
+            return {"examples": len(self._examples), "seeds": seeds, "learned": len(self._examples) - seeds}
+
+def few_shot_prompt(dialect: str) -> BasePromptTemplate:
+    """langchain's SQL generation prompt for dialect with room for examples.
+
+    The examples go right before the question, as an ``examples`` input
+    that defaults to "", so the prompt is unchanged without them.
+    """
+    prompt = SQL_PROMPTS.get(dialect, PROMPT)
+    head, tail = prompt.template.rsplit("Question: {input}", 1)
+    return PromptTemplate(
+        template=head + "{examples}Question: {input}" + tail,
+        input_variables=[*prompt.input_variables, "examples"],
+        partial_variables={**prompt.partial_variables, "examples": ""},
+    )
+
+_stores: Dict[str, ExampleStore] = {}
+_stores_lock = threading.Lock()
+
+def get_example_store(engine: Engine) -> ExampleStore:
+    """Return the process-wide ExampleStore for engine's database URL, seeded."""
+    url = engine.url.render_as_string(hide_password=False)
+    with _stores_lock:
+        store = _stores.get(url)
+        if store is None:
+            path = os.getenv("EXAMPLES_PATH", os.path.join(".cache", f"examples_{store_namespace(url)}.jsonl"))
+            store = ExampleStore(
+                engine.dialect.name,
+                path=path or None,
+                max_examples=get_int_env("EXAMPLES_MAX", 1000),
+                k=get_int_env("EXAMPLES_K", 3),
+                reuse_similarity=get_float_env("EXAMPLES_REUSE_SIMILARITY", 1.0)
+            )
+            store.seed(SEED_EXAMPLES)
+            _stores[url] = store
+        return store
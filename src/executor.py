@@ -0,0 +1,62 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+class QueueFullError(RuntimeError):
+    """Raised when the executor already holds its maximum number of jobs."""
+
+class BoundedExecutor:
+    """Run blocking callables off the event loop with bounded concurrency.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more
+    wait for a worker; anything beyond that is rejected with QueueFullError
+    so the caller can apply backpressure (e.g. HTTP 429).
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_queue < 0:
+            raise ValueError("max_queue must not be negative")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query-worker")
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of jobs currently running or waiting for a worker."""
+        return self._in_flight
+
+    @property
+    def is_full(self) -> bool:
+        """Whether run() would currently reject a new job."""
+        return self._in_flight >= self.max_workers + self.max_queue
+
+    @property
+    def queued(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return max(0, self._in_flight - self.max_workers)
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run fn(*args, **kwargs) in the pool and await its result."""
+        if self.is_full:
+            raise QueueFullError(
+                f"Server is busy ({self._in_flight} queries in flight), please retry shortly"
+            )
+
+        # Only touched from the event loop thread, so no lock is needed
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            call = functools.partial(context.run, fn, *args, **kwargs)
+            return await loop.run_in_executor(self._pool, call)
+        finally:
+            self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        """Stop accepting work and release the worker threads."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
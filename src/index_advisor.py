@@ -0,0 +1,335 @@
+"""Index advisor driven by the workload log.
+
+Reads the SQL captured in the workload log (see src/workload.py), finds the
+columns the queries filter, join, group and sort on, drops candidates an
+existing index already serves and prints CREATE INDEX statements ranked by
+the query time they could save.
+
+    python -m src.index_advisor
+    python -m src.index_advisor --schema-sql setup/ecommerce_init.sql
+    python -m src.index_advisor --validate ecommerce.db
+
+Existing indexes come from the live database (DATABASE_URL / DB_*) or, with
+--schema-sql, from a DDL script such as setup/ecommerce_init.sql. --validate
+times the affected queries on a copy of a SQLite database before and after
+creating each proposed index; the original file is not modified.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlalchemy import create_engine, inspect
+from sqlglot import exp
+from sqlglot.optimizer.scope import traverse_scope
+
+from .result_cache import canonicalize_sql
+from .sql_validation import get_sqlglot_dialect
+from .workload import read_workload
+
+# How much an index on a column used this way can cut the rows read
+USAGE_WEIGHTS = {"eq": 1.0, "join": 0.8, "range": 0.5, "group": 0.3, "order": 0.3}
+# Columns per proposed index; wider keys rarely pay for their write cost
+MAX_INDEX_COLUMNS = 3
+
+@dataclass
+class TableSchema:
+    columns: List[str]
+    # Column lists of existing indexes, primary key included
+    indexes: List[Tuple[str, ...]] = field(default_factory=list)
+
+@dataclass
+class WorkloadQuery:
+    sql: str
+    dialect: str
+    executions: int = 0
+    total_ms: float = 0.0
+
+@dataclass
+class Candidate:
+    table: str
+    columns: Tuple[str, ...]
+    score: float = 0.0
+    executions: int = 0
+    total_ms: float = 0.0
+    queries: List[WorkloadQuery] = field(default_factory=list)
+    # Existing index whose leading column this one extends, if any
+    extends: Optional[Tuple[str, ...]] = None
+
+    @property
+    def name(self) -> str:
+        return f"idx_{self.table}_{'_'.join(self.columns)}"
+
+    def create_sql(self) -> str:
+        return f"CREATE INDEX {self.name} ON {self.table} ({', '.join(self.columns)})"
+
+def load_workload(path: str) -> List[WorkloadQuery]:
+    """Group logged executions by canonical SQL."""
+    queries: Dict[str, WorkloadQuery] = {}
+    for entry in read_workload(path):
+        # Queries the analytics mirror answered never touched the source's indexes
+        if entry.get("source") == "analytics":
+            continue
+        dialect = entry.get("dialect", "mysql")
+        canonical = canonicalize_sql(entry.get("sql", ""), dialect)
+        if canonical is None:
+            continue
+        query = queries.get(canonical[0])
+        if query is None:
+            query = queries[canonical[0]] = WorkloadQuery(canonical[0], dialect)
+        query.executions += 1
+        query.total_ms += float(entry.get("duration_ms") or 0)
+    return list(queries.values())
+
+def _sqlite_indexes(engine, table: str) -> List[Tuple[str, ...]]:
+    # The inspector skips the automatic indexes behind UNIQUE columns
+    with engine.connect() as conn:
+        names = [row[1] for row in conn.exec_driver_sql(f'PRAGMA index_list("{table}")')]
+        return [
+            tuple(row[2].lower() for row in conn.exec_driver_sql(f'PRAGMA index_info("{name}")') if row[2])
+            for name in names
+        ]
+
+def schema_from_database(url: str) -> Dict[str, TableSchema]:
+    """Tables, columns and indexes of a live database."""
+    engine = create_engine(url)
+    try:
+        inspector = inspect(engine)
+        schema = {}
+        for table in inspector.get_table_names():
+            if engine.dialect.name == "sqlite":
+                indexes = _sqlite_indexes(engine, table)
+            else:
+                indexes = [tuple(c.lower() for c in index["column_names"] if c) for index in inspector.get_indexes(table)]
+            pk = inspector.get_pk_constraint(table).get("constrained_columns") or []
+            if pk:
+                indexes.append(tuple(c.lower() for c in pk))
+            schema[table.lower()] = TableSchema(
+                [column["name"].lower() for column in inspector.get_columns(table)], indexes
+            )
+        return schema
+    finally:
+        engine.dispose()
+
+def schema_from_sql(path: str, dialect: str) -> Dict[str, TableSchema]:
+    """Tables, columns and indexes declared in a DDL script."""
+    with open(path, encoding="utf-8") as f:
+        statements = sqlglot.parse(f.read(), read=get_sqlglot_dialect(dialect))
+    schema: Dict[str, TableSchema] = {}
+    for statement in statements:
+        if not isinstance(statement, exp.Create):
+            continue
+        if statement.kind == "TABLE" and isinstance(statement.this, exp.Schema):
+            table = TableSchema([])
+            for item in statement.this.expressions:
+                if isinstance(item, exp.ColumnDef):
+                    table.columns.append(item.name.lower())
+                    if any(isinstance(c.kind, (exp.PrimaryKeyColumnConstraint, exp.UniqueColumnConstraint))
+                           for c in item.constraints):
+                        table.indexes.append((item.name.lower(),))
+                elif isinstance(item, exp.ForeignKey) and dialect == "mysql":
+                    # InnoDB indexes foreign key columns automatically
+                    table.indexes.append(tuple(e.name.lower() for e in item.expressions))
+                elif isinstance(item, (exp.PrimaryKey, exp.IndexColumnConstraint)):
+                    table.indexes.append(tuple(e.name.lower() for e in item.expressions))
+            schema[statement.this.this.name.lower()] = table
+        elif statement.kind == "INDEX":
+            index = statement.this
+            table = schema.get(index.args["table"].name.lower())
+            params = index.args.get("params")
+            if table is not None and params is not None:
+                table.indexes.append(tuple(c.this.name.lower() for c in params.args.get("columns") or []))
+    return schema
+
+def _resolve(column: exp.Column, sources: Dict[str, str], schema: Dict[str, TableSchema]) -> Optional[Tuple[str, str]]:
+    """(table, column) a column reference reads, if it is a base table column."""
+    name = column.name.lower()
+    if column.table:
+        table = sources.get(column.table.lower())
+        return (table, name) if table else None
+    owners = [t for t in set(sources.values()) if t in schema and name in schema[t].columns]
+    return (owners[0], name) if len(owners) == 1 else None
+
+def _own_nodes(scope_expression: exp.Expression, node: Optional[exp.Expression]):
+    """Nodes under node that belong to this SELECT rather than a nested one."""
+    if node is None:
+        return
+    for child in node.walk():
+        if child.find_ancestor(exp.Select) is scope_expression or child is scope_expression:
+            yield child
+
+def column_usage(query: WorkloadQuery, schema: Dict[str, TableSchema]) -> Dict[str, Dict[str, str]]:
+    """Per table, how each column is used: eq, join, range, group or order."""
+    usage: Dict[str, Dict[str, str]] = defaultdict(dict)
+    try:
+        tree = sqlglot.parse_one(query.sql, read=get_sqlglot_dialect(query.dialect))
+    except sqlglot.errors.ParseError:
+        return usage
+
+    def mark(ref: Optional[Tuple[str, str]], kind: str) -> None:
+        if ref is None:
+            return
+        current = usage[ref[0]].get(ref[1])
+        # Keep the most index-friendly use of a column
+        if current is None or USAGE_WEIGHTS[kind] > USAGE_WEIGHTS[current]:
+            usage[ref[0]][ref[1]] = kind
+
+    for scope in traverse_scope(tree):
+        select = scope.expression
+        if not isinstance(select, exp.Select):
+            continue
+        sources = {
+            alias.lower(): source.name.lower()
+            for alias, source in scope.sources.items() if isinstance(source, exp.Table)
+        }
+        conditions = [select.args.get("where")] + [join.args.get("on") for join in select.args.get("joins") or []]
+        for condition in conditions:
+            for node in _own_nodes(select, condition):
+                if isinstance(node, exp.EQ):
+                    left, right = node.left, node.right
+                    if isinstance(left, exp.Column) and isinstance(right, exp.Column):
+                        mark(_resolve(left, sources, schema), "join")
+                        mark(_resolve(right, sources, schema), "join")
+                    elif isinstance(left, exp.Column) or isinstance(right, exp.Column):
+                        column = left if isinstance(left, exp.Column) else right
+                        mark(_resolve(column, sources, schema), "eq")
+                elif isinstance(node, exp.In) and isinstance(node.this, exp.Column):
+                    mark(_resolve(node.this, sources, schema), "eq")
+                elif isinstance(node, (exp.GT, exp.GTE, exp.LT, exp.LTE, exp.Between, exp.Like)) \
+                        and isinstance(node.this, exp.Column):
+                    mark(_resolve(node.this, sources, schema), "range")
+        for kind, key in (("group", "group"), ("order", "order")):
+            clause = select.args.get(key)
+            for node in _own_nodes(select, clause):
+                if isinstance(node, exp.Column):
+                    mark(_resolve(node, sources, schema), kind)
+    return usage
+
+def index_columns(columns: Dict[str, str]) -> Tuple[str, ...]:
+    """Composite key for one table's filters: equality columns, then one range.
+
+    Join columns are left to single-column candidates, since a table is
+    probed through one join condition at a time. With no filters at all,
+    the GROUP BY columns are proposed so the grouping can read an index.
+    """
+    ordered = sorted(c for c, kind in columns.items() if kind == "eq")
+    ordered += sorted(c for c, kind in columns.items() if kind == "range")[:1]
+    if not ordered and not any(kind == "join" for kind in columns.values()):
+        ordered = sorted(c for c, kind in columns.items() if kind == "group")
+    return tuple(ordered[:MAX_INDEX_COLUMNS])
+
+def _served_by(columns: Tuple[str, ...], indexes: List[Tuple[str, ...]]) -> bool:
+    return any(index[:len(columns)] == columns for index in indexes)
+
+def advise(queries: List[WorkloadQuery], schema: Dict[str, TableSchema]) -> List[Candidate]:
+    """Candidate indexes ranked by estimated benefit (query ms they apply to)."""
+    candidates: Dict[Tuple[str, Tuple[str, ...]], Candidate] = {}
+    for query in queries:
+        for table, columns in column_usage(query, schema).items():
+            if table not in schema:
+                continue
+            indexes = schema[table].indexes
+            keys = {index_columns(columns)}
+            keys.update((column,) for column, kind in columns.items() if kind in ("eq", "join"))
+            for key in keys:
+                if not key or _served_by(key, indexes):
+                    continue
+                candidate = candidates.get((table, key))
+                if candidate is None:
+                    candidate = candidates[(table, key)] = Candidate(table, key)
+                    candidate.extends = next((index for index in indexes if index[0] == key[0]), None)
+                weight = USAGE_WEIGHTS[columns[key[0]]] * len(key) ** 0.5
+                if candidate.extends is not None:
+                    # The leading column is indexed already; only the extra columns help
+                    weight *= 0.3
+                candidate.score += query.total_ms * weight
+                candidate.executions += query.executions
+                candidate.total_ms += query.total_ms
+                candidate.queries.append(query)
+
+    ranked = sorted(candidates.values(), key=lambda c: c.score, reverse=True)
+    # A narrower candidate is redundant next to a better-ranked wider one
+    kept: List[Candidate] = []
+    for candidate in ranked:
+        if not any(other.table == candidate.table and other.columns[:len(candidate.columns)] == candidate.columns
+                   for other in kept):
+            kept.append(candidate)
+    return kept
+
+def _time_queries(conn: sqlite3.Connection, queries: List[WorkloadQuery], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            sql = sqlglot.transpile(query.sql, read=get_sqlglot_dialect(query.dialect), write="sqlite")[0]
+            conn.execute(sql).fetchall()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+def validate(candidates: List[Candidate], sqlite_path: str, repeat: int = 3) -> Dict[str, Tuple[float, float]]:
+    """Before/after ms for each candidate's queries, measured on a copy of sqlite_path.
+
+    Each index is dropped again after its measurement, so every candidate is
+    compared against the existing indexes alone.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_path = os.path.join(tmp, "advisor.db")
+        shutil.copyfile(sqlite_path, copy_path)
+        conn = sqlite3.connect(copy_path)
+        try:
+            for candidate in candidates:
+                before = _time_queries(conn, candidate.queries, repeat)
+                conn.execute(candidate.create_sql())
+                conn.execute("ANALYZE")
+                after = _time_queries(conn, candidate.queries, repeat)
+                results[candidate.name] = (before, after)
+                conn.execute(f"DROP INDEX {candidate.name}")
+        finally:
+            conn.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=os.getenv("WORKLOAD_LOG") or os.path.join(".cache", "workload.jsonl"),
+                        help="workload log to analyse (default: WORKLOAD_LOG)")
+    parser.add_argument("--schema-sql", help="read existing indexes from this DDL script instead of the database")
+    parser.add_argument("--dialect", default="mysql", help="dialect of --schema-sql (default: mysql)")
+    parser.add_argument("--database-url", help="database to inspect (default: DATABASE_URL / DB_*)")
+    parser.add_argument("--top", type=int, default=10, help="number of indexes to propose")
+    parser.add_argument("--validate", metavar="SQLITE_DB", help="time queries before/after each index on a copy of this file")
+    args = parser.parse_args()
+
+    queries = load_workload(args.log)
+    if not queries:
+        print(f"No queries in {args.log}; run some questions with WORKLOAD_LOG set first.")
+        return
+    if args.schema_sql:
+        schema = schema_from_sql(args.schema_sql, args.dialect)
+    else:
+        from .config import get_database_url
+        schema = schema_from_database(args.database_url or get_database_url())
+
+    candidates = advise(queries, schema)[:args.top]
+    print(f"{len(queries)} distinct queries, {sum(q.executions for q in queries)} executions in {args.log}\n")
+    if not candidates:
+        print("Existing indexes already cover the captured workload.")
+        return
+    timings = validate(candidates, args.validate) if args.validate else {}
+    for rank, candidate in enumerate(candidates, 1):
+        print(f"{rank:>2}. {candidate.create_sql()};")
+        detail = (f"    score {candidate.score:.1f}, {len(candidate.queries)} queries, "
+                  f"{candidate.executions} executions, {candidate.total_ms:.1f} ms")
+        if candidate.extends:
+            detail += f", extends index on ({', '.join(candidate.extends)})"
+        print(detail)
+        if candidate.name in timings:
+            before, after = timings[candidate.name]
+            print(f"    measured: {before:.1f} ms -> {after:.1f} ms per pass ({before / max(after, 1e-6):.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from .config import get_float_env, get_int_env
+from .metrics import REGISTRY
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_OPENAI_MODEL = "gpt-4-turbo-preview"
+
+BATCH_SIZE = REGISTRY.histogram(
+    "chatdb_llm_batch_size", "Prompts sent per batched completion request",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+def create_llm(backend: Optional[str] = None, **kwargs: Any) -> BaseChatModel:
+    """Chat model for the configured backend.
+
+    LLM_BACKEND=openai (the default) uses the OpenAI API; ``local`` points
+    at an OpenAI-compatible server (llama.cpp, vLLM, ...) at LLM_BASE_URL.
+    LLM_MODEL picks the model on either; kwargs (streaming, max_tokens, ...)
+    are passed through to the client.
+    """
+    from langchain_openai import ChatOpenAI
+
+    backend = backend or os.getenv("LLM_BACKEND", "openai")
+    settings: Dict[str, Any] = {"temperature": 0, **kwargs}
+    if backend == "openai":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is required")
+        return ChatOpenAI(model=os.getenv("LLM_MODEL") or DEFAULT_OPENAI_MODEL, api_key=api_key, **settings)
+    if backend == "local":
+        return ChatOpenAI(model=os.getenv("LLM_MODEL") or "local", **_local_client_settings(), **settings)
+    raise ValueError(f"Unknown LLM_BACKEND {backend!r}; expected 'openai' or 'local'")
+
+def _local_client_settings() -> Dict[str, Any]:
+    return {
+        "base_url": os.getenv("LLM_BASE_URL", "http://localhost:8080/v1"),
+        # Local servers usually accept any key, but the client insists on one
+        "api_key": os.getenv("LLM_API_KEY") or "not-needed",
+    }
+
+class MicroBatcher(Generic[T, R]):
+    """Coalesce concurrent calls into batches.
+
+    ``submit`` blocks its caller. The first item waits up to ``window``
+    seconds for others, or until ``max_batch_size`` items are waiting; items
+    are grouped by key (only items with the same key can share a batch) and
+    ``run_batch(key, items)`` is called once per group, returning one result
+    per item. Up to ``max_in_flight`` batches run at the same time, so a
+    slow batch does not hold up collecting the next one.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Hashable, List[T]], List[R]],
+        window: float = 0.01,
+        max_batch_size: int = 8,
+        max_in_flight: int = 4
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending: List[Tuple[Hashable, T, Future]] = []
+        self._deadline: Optional[float] = None
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="llm-batch")
+        threading.Thread(target=self._dispatch, name="llm-batcher", daemon=True).start()
+
+    def submit(self, key: Hashable, item: T) -> R:
+        future: Future = Future()
+        with self._cond:
+            if not self._pending:
+                self._deadline = time.monotonic() + self.window
+            self._pending.append((key, item, future))
+            self._cond.notify()
+        return future.result()
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                while len(self._pending) < self.max_batch_size:
+                    remaining = self._deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch_size]
+                self._pending = self._pending[self.max_batch_size:]
+                if self._pending:
+                    # Items left over from a full batch start the next one at once
+                    self._deadline = time.monotonic()
+            groups: Dict[Hashable, List[Tuple[T, Future]]] = {}
+            for key, item, future in batch:
+                groups.setdefault(key, []).append((item, future))
+            for key, entries in groups.items():
+                self._pool.submit(self._run, key, entries)
+
+    def _run(self, key: Hashable, entries: List[Tuple[T, Future]]) -> None:
+        try:
+            results = self.run_batch(key, [item for item, _ in entries])
+        except Exception as e:
+            for _, future in entries:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(entries, results):
+            future.set_result(result)
+
+def render_prompt(messages: List[BaseMessage]) -> str:
+    """Flatten chat messages into a completion prompt."""
+    if len(messages) == 1:
+        return str(messages[0].content)
+    return "\n\n".join(f"{message.type.upper()}: {message.content}" for message in messages)
+
+class BatchedCompletionsModel(BaseChatModel):
+    """Chat model that sends concurrent prompts as one completions request.
+
+    OpenAI-compatible servers accept a list of prompts on ``/v1/completions``
+    and generate them as one batch, which a local GPU server handles in
+    about the time of one prompt. Calls arriving within ``batch_window``
+    seconds of each other share a request; calls with different stop
+    sequences or token limits never do. Batch token usage is split over the
+    prompts by prompt length.
+    """
+
+    model: str
+    base_url: str
+    api_key: str
+    max_tokens: int = 1000
+    temperature: float = 0.0
+    batch_window: float = 0.01
+    max_batch_size: int = 8
+    _client: Any = PrivateAttr()
+    _batcher: Any = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        from openai import OpenAI
+
+        self._client = OpenAI(base_url=self.base_url, api_key=self.api_key)
+        self._batcher = MicroBatcher(
+            self._complete, window=self.batch_window, max_batch_size=self.max_batch_size
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "batched-completions"
+
+    def _complete(self, key: Hashable, prompts: List[str]) -> List[Tuple[str, Dict[str, int]]]:
+        stop, max_tokens = key
+        BATCH_SIZE.observe(len(prompts))
+        response = self._client.completions.create(
+            model=self.model,
+            prompt=prompts,
+            max_tokens=max_tokens,
+            temperature=self.temperature,
+            stop=list(stop) or None,
+        )
+        texts = [""] * len(prompts)
+        for choice in response.choices:
+            texts[choice.index] = choice.text
+        usage = response.usage
+        total_chars = sum(len(prompt) for prompt in prompts) or 1
+        results = []
+        for prompt, text in zip(prompts, texts):
+            share = len(prompt) / total_chars
+            input_tokens = round(usage.prompt_tokens * share) if usage else 0
+            output_tokens = round(usage.completion_tokens * share) if usage else 0
+            results.append((text, {
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            }))
+        return results
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key = (tuple(stop or ()), kwargs.get("max_tokens", self.max_tokens))
+        text, usage = self._batcher.submit(key, render_prompt(messages))
+        message = AIMessage(content=text, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+def create_sql_llm(**kwargs: Any) -> BaseChatModel:
+    """Chat model for single-shot SQL generation.
+
+    With LLM_BATCH_WINDOW_MS set, concurrent SQL-generation prompts are
+    coalesced into batched completions (up to LLM_MAX_BATCH_SIZE per request)
+    on the local backend; otherwise this is ``create_llm``.
+    """
+    window_ms = get_float_env("LLM_BATCH_WINDOW_MS", 0.0)
+    if window_ms <= 0:
+        return create_llm(**kwargs)
+    if os.getenv("LLM_BACKEND", "openai") != "local":
+        raise ValueError("LLM_BATCH_WINDOW_MS needs LLM_BACKEND=local (an OpenAI-compatible completions server)")
+    return BatchedCompletionsModel(
+        model=os.getenv("LLM_MODEL") or "local",
+        max_tokens=kwargs.get("max_tokens", 1000),
+        batch_window=window_ms / 1000,
+        max_batch_size=get_int_env("LLM_MAX_BATCH_SIZE", 8),
+        **_local_client_settings(),
+    )
@@ -1,19 +1,29 @@
-from typing import NoReturn
+from typing import Any, NoReturn, Tuple
 import sys
 from .config import get_database_url, get_llm
-from .database import create_db_connection, get_schema_info, setup_query_chain
-from .query_processor import process_query
 from .cli import print_welcome_message, print_results, get_user_input, console
+from .warmup import Warmup
+
+def setup(warmup: Warmup) -> Tuple[Any, Any, Any]:
+    """Connect to the database and build the query chain and example store."""
+    with warmup.step("imports"):
+        from .database import create_db_connection, setup_query_chain
+        from .examples_store import get_example_store
+    with warmup.step("llm"):
+        llm = get_llm(sql_generation=True)
+    with warmup.step("database"):
+        db = create_db_connection(get_database_url())
+    with warmup.step("chain"):
+        chain = setup_query_chain(db, llm)
+        examples = get_example_store(db._engine)
+    return db, chain, examples
 
 def main() -> NoReturn:
     """Main application entry point."""
     try:
-        # Initialize components
-        db_url = get_database_url()
-        llm = get_llm()
-        db = create_db_connection(db_url)
-        chain = setup_query_chain(db, llm)
-        
+        # Connect and build the chain while the user types the first question
+        components = Warmup(setup, name="database chat").start()
+
         # Start CLI interface
         print_welcome_message()
         
@@ -23,9 +33,11 @@ def main() -> NoReturn:
             if user_input.lower() in ('exit', 'quit'):
                 console.print("[bold blue]Goodbye![/bold blue]")
                 sys.exit(0)
-                
+
+            db, chain, examples = components.get()
+            from .query_processor import process_query
             try:
-                sql_query, results = process_query(chain, db, user_input)
+                sql_query, results = process_query(chain, db, user_input, examples)
                 print_results(sql_query, results)
             except Exception as e:
                 console.print(f"[bold red]Error:[/bold red] {str(e)}")
@@ -0,0 +1,243 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; spans cached lookups (ms) up to slow agent runs (tens of seconds)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+BYTE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}"
+                for key, value in sorted(self._values.items())
+            ]
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus model."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (+Inf last), sum, count
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            series[0][index] += 1
+            series[1][0] += value
+            series[1][1] += 1
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, (total, count)) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else _format_number(bound)
+                    labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+                lines.append(f"{self.name}_count{labels} {int(count)}")
+        return lines
+
+class Collector:
+    """Metric whose samples are read from elsewhere (e.g. cache stats) when rendered."""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 read: Callable[[], Iterable[Tuple[LabelValues, float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}"
+            for key, value in self.read()
+        ]
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, name: str, documentation: str, kind: str,
+                  read: Callable[[], Iterable[Tuple[LabelValues, float]]],
+                  labelnames: Sequence[str] = ()) -> Collector:
+        metric = Collector(name, documentation, kind, labelnames, read)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "chatdb_stage_seconds", "Time spent in each query pipeline stage", ["stage"]
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "chatdb_request_seconds", "End-to-end request latency", ["endpoint"]
+)
+REQUESTS = REGISTRY.counter(
+    "chatdb_requests_total", "Requests handled, by outcome", ["endpoint", "status"]
+)
+LLM_TOKENS = REGISTRY.counter(
+    "chatdb_llm_tokens_total", "Tokens sent to and generated by the LLM", ["kind"]
+)
+SQL_ROWS = REGISTRY.histogram(
+    "chatdb_sql_result_rows", "Rows returned per SQL execution", buckets=ROW_BUCKETS
+)
+SQL_BYTES = REGISTRY.histogram(
+    "chatdb_sql_result_bytes", "Approximate size of the rows returned per SQL execution", buckets=BYTE_BUCKETS
+)
+
+class RequestTimings:
+    """Per-request totals of stage time, LLM tokens and SQL rows.
+
+    Activate it around a request; track_stage() and the record_* helpers add
+    to the active instance, including from executor threads (the context is
+    copied into them).
+    """
+
+    def __init__(self):
+        self.stages_ms: Dict[str, float] = {}
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.sql_rows = 0
+        self.sql_bytes = 0
+        self._started_at = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages_ms[stage] = self.stages_ms.get(stage, 0.0) + seconds * 1000
+
+    @contextmanager
+    def activate(self) -> Iterator["RequestTimings"]:
+        token = _current_timings.set(self)
+        try:
+            yield self
+        finally:
+            _current_timings.reset(token)
+
+    def to_dict(self) -> Dict[str, float]:
+        with self._lock:
+            timings = {f"{stage}_ms": round(ms, 1) for stage, ms in self.stages_ms.items()}
+            timings.update(
+                llm_calls=self.llm_calls,
+                prompt_tokens=self.prompt_tokens,
+                completion_tokens=self.completion_tokens,
+                sql_rows=self.sql_rows,
+                sql_bytes=self.sql_bytes,
+                total_ms=round((time.perf_counter() - self._started_at) * 1000, 1),
+            )
+            return timings
+
+_current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record time spent in a stage, globally and for the active request."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add_stage(stage, seconds)
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """Time the enclosed block as one occurrence of a pipeline stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+def record_llm_call(seconds: float, prompt_tokens: int, completion_tokens: int) -> None:
+    observe_stage("llm", seconds)
+    LLM_TOKENS.inc(prompt_tokens, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, kind="completion")
+    timings = _current_timings.get()
+    if timings is not None:
+        with timings._lock:
+            timings.llm_calls += 1
+            timings.prompt_tokens += prompt_tokens
+            timings.completion_tokens += completion_tokens
+
+def record_sql_result(rows: int, size: int) -> None:
+    SQL_ROWS.observe(rows)
+    SQL_BYTES.observe(size)
+    timings = _current_timings.get()
+    if timings is not None:
+        with timings._lock:
+            timings.sql_rows += rows
+            timings.sql_bytes += size
@@ -1,16 +1,57 @@
-from typing import Dict, Any, Tuple
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
+from .config import get_int_env
+from .examples_store import ExampleStore
+from .results import QueryResult, execute_page
+from .sql_validation import clean_sql
 
-def process_query(chain, db, query: str) -> Tuple[str, Any]:
-    """Process a natural language query and return SQL and results."""
+if TYPE_CHECKING:
+    from .async_database import AsyncDatabase
+
+def process_query(chain, db, query: str, examples: Optional[ExampleStore] = None) -> Tuple[str, QueryResult]:
+    """Process a natural language query and return SQL and the first page of results.
+
+    With an example store (and a chain built by setup_query_chain), matching
+    examples are reused or shown to the LLM, and the answer is learned.
+    """
     try:
         # Generate SQL query
-        sql_query = chain.invoke(query)
+        if examples is not None:
+            sql_query, reused = examples.generate_sql(chain, query)
+        else:
+            sql_query, reused = clean_sql(chain.invoke({"question": query})), False
         
         # Execute the query
-        result = db.run(sql_query)
+        result = execute_page(db._engine, sql_query, db.dialect, get_int_env("RESULT_PAGE_SIZE", 100))
+        if examples is not None and not reused:
+            examples.add(query, sql_query)
         
         return sql_query, result
     except Exception as e:
-        raise RuntimeError(f"Error processing query: {str(e)}") 
\ No newline at end of file
+        raise RuntimeError(f"Error processing query: {str(e)}")
+
+async def process_query_async(
+    chain, db: "AsyncDatabase", query: str, examples: Optional[ExampleStore] = None
+) -> Tuple[str, QueryResult]:
+    """process_query on the async path: the LLM call and the SQL are awaited, so no thread waits on them.
+
+    db is an AsyncDatabase for the database the chain was built on. Load
+    that database's schema cache first (get_schema_cache(...).get()), or
+    building the prompt runs the sample-row SELECTs synchronously.
+    """
+    try:
+        # Generate SQL query
+        if examples is not None:
+            sql_query, reused = await examples.agenerate_sql(chain, query)
+        else:
+            sql_query, reused = clean_sql(await chain.ainvoke({"question": query})), False
+
+        # Execute the query
+        result = await db.execute_page(sql_query, get_int_env("RESULT_PAGE_SIZE", 100))
+        if examples is not None and not reused:
+            examples.add(query, sql_query)
+
+        return sql_query, result
+    except Exception as e:
+        raise RuntimeError(f"Error processing query: {str(e)}")
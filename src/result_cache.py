@@ -0,0 +1,254 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Literal, Optional, Sequence, Tuple, TypeVar, Union
+
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import Executable
+from sqlalchemy.engine import Engine
+from sqlglot import exp
+from sqlglot.optimizer.normalize_identifiers import normalize_identifiers
+
+from .analytics_backend import run_analytics
+from .budget import charge_sql
+from .config import get_int_env
+from .data_versions import DataVersionTracker, get_data_version_tracker
+from .metrics import REGISTRY
+from .shared_store import SharedStore, get_shared_store, store_namespace
+from .sql_validation import SQLValidationError, get_sqlglot_dialect, parse_sql
+from .workload import record_query
+
+T = TypeVar("T")
+
+def canonicalize_sql(sql: str, dialect: str) -> Optional[Tuple[str, Tuple[str, ...]]]:
+    """Canonical text of a read-only query and the tables it reads.
+
+    Whitespace, keyword case, comments and (where the dialect ignores it)
+    identifier case do not change the text. Returns
+    None for anything that is not a single SELECT, which is never cached.
+    """
+    try:
+        tree = parse_sql(sql, dialect)
+    except SQLValidationError:
+        return None
+    if not isinstance(tree, (exp.Select, exp.SetOperation)):
+        return None
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    tables = sorted({
+        table.name.lower() for table in tree.find_all(exp.Table)
+        if table.name.lower() not in cte_names
+    })
+    # Lowercases identifiers only where the dialect treats them case-insensitively
+    tree = normalize_identifiers(tree, dialect=get_sqlglot_dialect(dialect))
+    return tree.sql(dialect=get_sqlglot_dialect(dialect), comments=False), tuple(tables)
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory held by a cached result (rows of plain values)."""
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+@dataclass
+class ResultEntry:
+    value: Any
+    data_version: str
+    size: int
+    created_at: float = field(default_factory=time.time)
+
+class ResultCache:
+    """LRU cache of SQL results keyed on canonical SQL, bounded by memory.
+
+    An entry is reused only while the change markers of every table the
+    query reads are unchanged (see DataVersionTracker); ``invalidate(table)``
+    forces that immediately after a known write. With a shared store, a
+    local miss is looked up there before running the query, and results are
+    written back, so workers reuse each other's results.
+    """
+
+    def __init__(
+        self,
+        data_versions: DataVersionTracker,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: int = 300,
+        store: Optional[SharedStore] = None,
+        store_prefix: str = ""
+    ):
+        self.data_versions = data_versions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.store = store
+        self.store_prefix = store_prefix
+        self._entries: "OrderedDict[str, ResultEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get_or_run(self, sql: str, dialect: str, run: Callable[[], T]) -> T:
+        """Return the cached result of sql, or run() it and cache the result."""
+        hit, value, slot = self._lookup(sql, dialect)
+        if hit:
+            return value
+        value = run()
+        if slot is not None:
+            self._save(slot, value)
+        return value
+
+    async def get_or_run_async(self, sql: str, dialect: str, run: Callable[[], Awaitable[T]]) -> T:
+        """get_or_run for a coroutine function, used by the async execution path."""
+        hit, value, slot = self._lookup(sql, dialect)
+        if hit:
+            return value
+        value = await run()
+        if slot is not None:
+            self._save(slot, value)
+        return value
+
+    def _lookup(self, sql: str, dialect: str) -> Tuple[bool, Any, Optional[Tuple[str, str, str]]]:
+        """(hit, value, slot): slot is where to save a miss, None if sql is not cached."""
+        if self.max_bytes <= 0:
+            return False, None, None
+        canonical = canonicalize_sql(sql, dialect)
+        if canonical is None:
+            return False, None, None
+        key, tables = canonical
+        # Read the version before running, so a write that lands while the
+        # query runs leaves the entry stale rather than hiding the write
+        data_version = self.data_versions.version(tables)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.data_version == data_version and time.time() - entry.created_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry.value, None
+
+        store_key = self.store_prefix + hashlib.sha1(key.encode()).hexdigest()
+        if self.store is not None:
+            shared = self.store.get(store_key)
+            # Same version string means the same table markers in every worker
+            if shared is not None and shared[0] == data_version:
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                self._store(key, shared[1], data_version, estimate_size(shared[1]))
+                return True, shared[1], None
+
+        with self._lock:
+            self.misses += 1
+        return False, None, (key, data_version, store_key)
+
+    def _save(self, slot: Tuple[str, str, str], value: Any) -> None:
+        key, data_version, store_key = slot
+        size = estimate_size(value)
+        self._store(key, value, data_version, size)
+        if self.store is not None and size <= self.max_bytes // 4:
+            self.store.set(store_key, (data_version, value), self.ttl)
+
+    def _store(self, key: str, value: Any, data_version: str, size: int) -> None:
+        # A single huge result would evict everything else
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = ResultEntry(value, data_version, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def invalidate(self, table: Optional[str] = None) -> None:
+        """Drop results that read table (all results when table is None)."""
+        if table is None:
+            with self._lock:
+                self._entries.clear()
+                self._bytes = 0
+            return
+        self.data_versions.bump(table)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory use for reporting."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+_caches: Dict[str, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+def get_result_cache(engine: Engine) -> ResultCache:
+    """Return the process-wide ResultCache for engine's database URL."""
+    url = engine.url.render_as_string(hide_password=False)
+    with _caches_lock:
+        cache = _caches.get(url)
+        if cache is None:
+            cache = ResultCache(
+                get_data_version_tracker(engine),
+                max_bytes=get_int_env("RESULT_CACHE_MAX_MB", 64) * 1024 * 1024,
+                ttl=get_int_env("RESULT_CACHE_TTL", 300),
+                store=get_shared_store(),
+                store_prefix=f"result:{store_namespace(url)}:"
+            )
+            _caches[url] = cache
+        return cache
+
+def _read_cache_stats(name: str):
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [((), sum(cache.stats()[name] for cache in caches))]
+
+REGISTRY.collector("chatdb_result_cache_hits_total", "SQL result cache hits", "counter",
+                   lambda: _read_cache_stats("hits"))
+REGISTRY.collector("chatdb_result_cache_misses_total", "SQL result cache misses", "counter",
+                   lambda: _read_cache_stats("misses"))
+REGISTRY.collector("chatdb_result_cache_bytes", "Approximate memory held by the SQL result cache", "gauge",
+                   lambda: _read_cache_stats("bytes"))
+
+class CachedSQLDatabase(SQLDatabase):
+    """SQLDatabase whose plain SELECTs are answered from the result cache.
+
+    Caching sits below ``run``, so the agent's sql_db_query tool and
+    anything else calling ``run`` benefit, and the cached value is the typed
+    rows rather than their string form.
+    """
+
+    def _execute(
+        self,
+        command: Union[str, Executable],
+        fetch: Literal["all", "one", "cursor"] = "all",
+        *,
+        parameters: Optional[Dict[str, Any]] = None,
+        execution_options: Optional[Dict[str, Any]] = None,
+    ) -> Union[Sequence[Dict[str, Any]], Any]:
+        if not isinstance(command, str) or fetch != "all" or parameters:
+            return super()._execute(command, fetch, parameters=parameters, execution_options=execution_options)
+
+        def execute() -> Sequence[Dict[str, Any]]:
+            charge_sql()
+            routed = run_analytics(self._engine, command, self.dialect)
+            if routed is not None:
+                columns, rows = routed
+                return [dict(zip(columns, row)) for row in rows]
+            start = time.perf_counter()
+            rows = super(CachedSQLDatabase, self)._execute(
+                command, fetch, parameters=parameters, execution_options=execution_options
+            )
+            record_query(command, self.dialect, time.perf_counter() - start, len(rows), "agent")
+            return rows
+
+        return get_result_cache(self._engine).get_or_run(command, self.dialect, execute)
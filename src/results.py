@@ -0,0 +1,201 @@
+import base64
+import datetime
+import decimal
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlglot import exp
+
+from .analytics_backend import run_analytics
+from .budget import charge_sql
+from .config import get_int_env
+from .cost_guard import get_cost_guard
+from .metrics import record_sql_result, track_stage
+from .result_cache import get_result_cache
+from .sql_validation import get_sqlglot_dialect, parse_sql
+from .workload import record_query
+
+# Signs pagination cursors so clients cannot run SQL of their own through
+# them. Set RESULT_CURSOR_SECRET when several workers serve the same users,
+# otherwise a cursor only works on the worker that issued it.
+_CURSOR_SECRET = (os.getenv("RESULT_CURSOR_SECRET") or secrets.token_hex(32)).encode()
+# Seconds a cursor stays valid; later pages are re-run on the current data,
+# so an old cursor would page through rows that no longer match the first
+_CURSOR_TTL = get_int_env("RESULT_CURSOR_TTL", 3600)
+
+class InvalidCursorError(ValueError):
+    """A pagination cursor was malformed, expired or not issued by this server."""
+
+def value_type(value: Any) -> str:
+    """JSON-friendly type name of a database value."""
+    # bool before int: bool is a subclass of int
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, decimal.Decimal):
+        return "decimal"
+    if isinstance(value, datetime.datetime):
+        return "datetime"
+    if isinstance(value, datetime.date):
+        return "date"
+    if isinstance(value, (datetime.time, datetime.timedelta)):
+        return "time"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "bytes"
+    return "string"
+
+def to_json_value(value: Any) -> Any:
+    """Convert a database value to something json.dumps accepts."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode()
+    return str(value)
+
+@dataclass
+class QueryResult:
+    """One page of a query result, stored column by column."""
+    columns: List[str]
+    types: List[str]
+    # One list of values per column
+    data: List[List[Any]]
+    offset: int = 0
+    has_more: bool = False
+    cursor: Optional[str] = field(default=None, repr=False)
+
+    @classmethod
+    def from_rows(cls, columns: List[str], rows: List[Tuple], offset: int = 0, has_more: bool = False) -> "QueryResult":
+        data = [list(values) for values in zip(*rows)] if rows else [[] for _ in columns]
+        types = [
+            next((value_type(v) for v in values if v is not None), "null")
+            for values in data
+        ]
+        return cls(columns=columns, types=types, data=data, offset=offset, has_more=has_more)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.data[0]) if self.data else 0
+
+    def rows(self) -> List[Tuple]:
+        """The page row by row."""
+        return list(zip(*self.data))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON form used in API responses."""
+        return {
+            "columns": [{"name": name, "type": type_} for name, type_ in zip(self.columns, self.types)],
+            "data": [[to_json_value(v) for v in values] for values in self.data],
+            "row_count": self.row_count,
+            "offset": self.offset,
+            "has_more": self.has_more,
+            "cursor": self.cursor,
+        }
+
+    def to_text(self, max_rows: int = 20) -> str:
+        """Pipe-separated table for the console and for LLM prompts."""
+        if not self.row_count:
+            return "The query returned no rows."
+        lines = [" | ".join(self.columns), " | ".join("---" for _ in self.columns)]
+        for row in self.rows()[:max_rows]:
+            lines.append(" | ".join("" if v is None else str(to_json_value(v)) for v in row))
+        hidden = self.row_count - max_rows
+        if hidden > 0:
+            lines.append(f"... {hidden} more rows")
+        if self.has_more:
+            lines.append("... more rows available")
+        return "\n".join(lines)
+
+def paginate_sql(tree: exp.Expression, dialect: str, limit: int, offset: int = 0) -> str:
+    """Render a parsed query restricted to one window of rows."""
+    if tree.args.get("limit") or tree.args.get("offset"):
+        # Keep the query's own LIMIT (e.g. "top 5") and page within it
+        tree = exp.select("*").from_(tree.subquery("page_source"))
+    else:
+        tree = tree.copy()
+    tree = tree.limit(limit)
+    if offset:
+        tree = tree.offset(offset)
+    return tree.sql(dialect=get_sqlglot_dialect(dialect))
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    payload = {**payload, "issued_at": int(time.time())}
+    body = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+    signature = hmac.new(_CURSOR_SECRET, body.encode(), hashlib.sha256).hexdigest()[:32]
+    return f"{body}.{signature}"
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Verify and unpack a cursor issued by encode_cursor."""
+    body, _, signature = cursor.partition(".")
+    expected = hmac.new(_CURSOR_SECRET, body.encode(), hashlib.sha256).hexdigest()[:32]
+    if not signature or not hmac.compare_digest(signature, expected):
+        raise InvalidCursorError("Invalid cursor")
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(body.encode()))
+    except ValueError:
+        raise InvalidCursorError("Malformed cursor")
+    if _CURSOR_TTL > 0 and time.time() - payload.get("issued_at", 0) > _CURSOR_TTL:
+        raise InvalidCursorError("Expired cursor, run the query again")
+    return payload
+
+def execute_page(engine: Engine, sql: str, dialect: str, page_size: int, offset: int = 0) -> QueryResult:
+    """Run a SELECT and return one page of it as a QueryResult.
+
+    The row limit is pushed into the SQL and rows are read from a
+    server-side cursor, so a large result is never fetched in full. Pages
+    are served from the result cache while their tables are unchanged, and
+    aggregates from the analytics mirror when it is enabled. If
+    more rows follow, the result carries a signed cursor for the next page.
+    Raises QueryCostError if the query plan is over the cost budget.
+    """
+    page_sql = paginate_sql(parse_sql(sql, dialect), dialect, page_size + 1, offset)
+    guard = get_cost_guard(engine)
+
+    def fetch() -> Tuple[List[str], List[Tuple]]:
+        # Cached pages are free; anything that runs counts towards the request budget
+        charge_sql()
+        routed = run_analytics(engine, page_sql, dialect, max_rows=page_size + 1)
+        if routed is not None:
+            return routed
+        # Checked on the unpaginated query: LIMIT does not bound the rows
+        # a join or sort reads before returning its first row
+        check = guard.check(sql, dialect)
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=page_size + 1).execute(text(page_sql))
+            columns = list(result.keys())
+            rows = [tuple(row) for row in result.fetchmany(page_size + 1)]
+            result.close()
+        record_query(page_sql, dialect, time.perf_counter() - start, len(rows), "pipeline")
+        guard.record_returned(check, len(rows))
+        return columns, rows
+
+    with track_stage("sql"):
+        columns, rows = get_result_cache(engine).get_or_run(page_sql, dialect, fetch)
+    return build_page(sql, columns, rows, page_size, offset)
+
+def build_page(sql: str, columns: List[str], rows: List[Tuple], page_size: int, offset: int) -> QueryResult:
+    """One page of sql from up to page_size + 1 fetched rows (the extra one means more follow)."""
+    record_sql_result(len(rows), sum(len(str(v)) for row in rows for v in row if v is not None))
+
+    has_more = len(rows) > page_size
+    page = QueryResult.from_rows(columns, rows[:page_size], offset=offset, has_more=has_more)
+    if has_more:
+        page.cursor = encode_cursor({"sql": sql, "offset": offset + page_size, "page_size": page_size})
+    return page
@@ -0,0 +1,332 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from langchain_community.utilities import SQLDatabase
+
+from .config import get_int_env
+from .shared_store import SharedStore, get_shared_store, store_namespace
+from .summary_tables import describe_summary_tables
+
+SNAPSHOT_VERSION = 1
+
+@dataclass
+class TableSchema:
+    """Introspected description of a single table."""
+    name: str
+    columns: List[Dict[str, Any]]
+    primary_key: List[str]
+    foreign_keys: List[Dict[str, Any]]
+    comment: Optional[str] = None
+    # CREATE TABLE statement plus sample rows, as rendered by SQLDatabase.get_table_info
+    info: str = ""
+
+    @property
+    def column_names(self) -> List[str]:
+        return [col["name"] for col in self.columns]
+
+@dataclass
+class SchemaSnapshot:
+    """Point-in-time copy of the database schema, cheap to serialize."""
+    tables: Dict[str, TableSchema]
+    fingerprint: Optional[str]
+    created_at: float = field(default_factory=time.time)
+
+    def table_info(self, table_names: Optional[List[str]] = None) -> str:
+        """Render prompt-ready schema text for all or some of the tables."""
+        names = table_names if table_names is not None else list(self.tables)
+        return "\n\n".join(self.tables[name].info for name in names if name in self.tables)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "fingerprint": self.fingerprint,
+            "created_at": self.created_at,
+            "tables": [asdict(table) for table in self.tables.values()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SchemaSnapshot":
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError("Unsupported schema snapshot version")
+        tables = {table["name"]: TableSchema(**table) for table in data["tables"]}
+        return cls(tables=tables, fingerprint=data["fingerprint"], created_at=data["created_at"])
+
+def get_schema_fingerprint(engine: Engine) -> Optional[str]:
+    """Cheap structural fingerprint of the schema, or None if unsupported.
+
+    Uses server-side checksums over INFORMATION_SCHEMA on MySQL and the
+    schema cookie on SQLite, so no table reflection is needed.
+    """
+    dialect = engine.dialect.name
+    with engine.connect() as conn:
+        if dialect == "mysql":
+            row = conn.execute(text(
+                "SELECT COUNT(*), COALESCE(SUM(CRC32(CONCAT_WS(':', TABLE_NAME, COLUMN_NAME, "
+                "COLUMN_TYPE, IS_NULLABLE, ORDINAL_POSITION))), 0) "
+                "FROM information_schema.columns WHERE TABLE_SCHEMA = DATABASE()"
+            )).fetchone()
+            fk_row = conn.execute(text(
+                "SELECT COALESCE(SUM(CRC32(CONCAT_WS(':', TABLE_NAME, COLUMN_NAME, "
+                "REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME))), 0) "
+                "FROM information_schema.key_column_usage "
+                "WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL"
+            )).fetchone()
+            return f"mysql:{row[0]}:{row[1]}:{fk_row[0]}"
+        if dialect == "sqlite":
+            return f"sqlite:{conn.execute(text('PRAGMA schema_version')).scalar()}"
+    return None
+
+def introspect_schema(db: SQLDatabase) -> SchemaSnapshot:
+    """Reflect every usable table of db into a SchemaSnapshot."""
+    engine = db._engine
+    fingerprint = get_schema_fingerprint(engine)
+    # A fresh SQLDatabase reflects current metadata and renders sample rows
+    # exactly like the agent tools would
+    fresh_db = SQLDatabase(
+        engine,
+        schema=db._schema,
+        include_tables=list(db._include_tables) or None,
+        ignore_tables=list(db._ignore_tables) or None,
+        sample_rows_in_table_info=db._sample_rows_in_table_info,
+    )
+    describe_summary_tables(fresh_db)
+    inspector = inspect(engine)
+
+    tables = {}
+    for name in fresh_db.get_usable_table_names():
+        try:
+            comment = inspector.get_table_comment(name, schema=db._schema).get("text")
+        except NotImplementedError:
+            comment = None
+        tables[name] = TableSchema(
+            name=name,
+            columns=[
+                {
+                    "name": col["name"],
+                    "type": str(col["type"]),
+                    "nullable": bool(col.get("nullable", True)),
+                    "comment": col.get("comment"),
+                }
+                for col in inspector.get_columns(name, schema=db._schema)
+            ],
+            primary_key=inspector.get_pk_constraint(name, schema=db._schema).get("constrained_columns") or [],
+            foreign_keys=[
+                {
+                    "columns": fk["constrained_columns"],
+                    "referred_table": fk["referred_table"],
+                    "referred_columns": fk["referred_columns"],
+                }
+                for fk in inspector.get_foreign_keys(name, schema=db._schema)
+            ],
+            comment=comment,
+            info=fresh_db.get_table_info([name]),
+        )
+
+    return SchemaSnapshot(tables=tables, fingerprint=fingerprint)
+
+class SchemaCache:
+    """Introspect once, then serve the schema from memory and a disk snapshot.
+
+    The snapshot is rebuilt when it is older than ``ttl`` seconds, or when the
+    fingerprint (checked at most every ``check_interval`` seconds) changes.
+    On start-up a snapshot on disk is reused if its fingerprint still matches.
+
+    With a shared store the snapshot is published there too. A worker that
+    needs a new snapshot first takes one a peer published; if none is there
+    it takes a lock and introspects, while other workers wait up to
+    ``peer_wait`` seconds for its result instead of introspecting as well.
+    Within a process one thread checks the fingerprint or refreshes at a
+    time, outside the lock; other threads keep getting the previous
+    snapshot meanwhile, and only wait for the refresh when there is none
+    yet.
+    """
+
+    def __init__(
+        self,
+        db: SQLDatabase,
+        snapshot_path: Optional[str] = None,
+        ttl: int = 3600,
+        check_interval: int = 30,
+        store: Optional[SharedStore] = None,
+        store_key: str = "schema",
+        peer_wait: int = 60
+    ):
+        self.db = db
+        self._dbs = [db]
+        self.snapshot_path = snapshot_path
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.store = store
+        self.store_key = store_key
+        self.peer_wait = peer_wait
+        self._snapshot: Optional[SchemaSnapshot] = None
+        self._last_check = 0.0
+        # Set while a thread of this process refreshes the snapshot
+        self._refreshing: Optional[threading.Event] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> SchemaSnapshot:
+        """Return a current snapshot, refreshing it only when needed."""
+        while True:
+            with self._lock:
+                now = time.time()
+                snapshot = self._snapshot
+                stale = snapshot is None or now - snapshot.created_at > self.ttl
+                check = not stale and self._refreshing is None and now - self._last_check > self.check_interval
+                if check:
+                    # Claimed here, so other callers keep serving the snapshot meanwhile
+                    self._last_check = now
+            if check:
+                # A database round trip, so it is made outside the lock
+                stale = get_schema_fingerprint(self.db._engine) != snapshot.fingerprint
+            if not stale:
+                return snapshot
+            with self._lock:
+                if self._snapshot is not snapshot:
+                    # Refreshed or invalidated during the check; look again
+                    continue
+                refreshing = self._refreshing
+                if refreshing is None:
+                    self._refreshing = threading.Event()
+                    break
+            # Another thread is refreshing (possibly waiting on a peer worker)
+            if snapshot is not None:
+                return snapshot
+            # A failed refresh leaves no snapshot, and the next pass retries it
+            refreshing.wait()
+
+        try:
+            return self._refresh()
+        finally:
+            with self._lock:
+                refreshing, self._refreshing = self._refreshing, None
+            refreshing.set()
+
+    def attach(self, db: SQLDatabase) -> None:
+        """Serve schema tool calls of another SQLDatabase on the same URL from this cache."""
+        with self._lock:
+            if any(existing is db for existing in self._dbs):
+                return
+            self._dbs.append(db)
+            if self._snapshot is not None:
+                self._apply_to_db(self._snapshot)
+
+    def invalidate(self) -> None:
+        """Drop the in-memory snapshot so the next get() re-introspects."""
+        with self._lock:
+            self._snapshot = None
+            if self.snapshot_path and os.path.exists(self.snapshot_path):
+                os.remove(self.snapshot_path)
+            if self.store is not None:
+                self.store.delete(self.store_key)
+
+    def _refresh(self) -> SchemaSnapshot:
+        # On first use, the snapshot saved by an earlier run if still current
+        snapshot = self._load_snapshot() if self._snapshot is None else None
+        if snapshot is None:
+            snapshot = self._fetch_peer_snapshot()
+        if snapshot is None:
+            snapshot = introspect_schema(self.db)
+            self._save_snapshot(snapshot)
+            if self.store is not None:
+                self.store.delete(self.store_key + ":lock")
+        with self._lock:
+            self._snapshot = snapshot
+            self._last_check = time.time()
+            self._apply_to_db(snapshot)
+        return snapshot
+
+    def _fetch_peer_snapshot(self) -> Optional[SchemaSnapshot]:
+        """A current snapshot from the shared store, or None to introspect here."""
+        if self.store is None:
+            return None
+        fingerprint = get_schema_fingerprint(self.db._engine)
+        deadline = time.time() + self.peer_wait
+        while True:
+            snapshot = self._load_shared(fingerprint)
+            if snapshot is not None:
+                return snapshot
+            # The lock expires on its own if its holder dies mid-introspection
+            if self.store.add(self.store_key + ":lock", os.getpid(), self.peer_wait):
+                return None
+            if time.time() >= deadline:
+                return None
+            time.sleep(0.2)
+
+    def _load_shared(self, fingerprint: Optional[str]) -> Optional[SchemaSnapshot]:
+        data = self.store.get(self.store_key)
+        if data is None:
+            return None
+        try:
+            snapshot = SchemaSnapshot.from_dict(data)
+        except (ValueError, KeyError, TypeError):
+            return None
+        if fingerprint is None or snapshot.fingerprint != fingerprint:
+            return None
+        # Skip the snapshot this worker is replacing (or an older one)
+        if time.time() - snapshot.created_at > self.ttl:
+            return None
+        if self._snapshot is not None and snapshot.created_at <= self._snapshot.created_at:
+            return None
+        return snapshot
+
+    def _apply_to_db(self, snapshot: SchemaSnapshot) -> None:
+        # Let the agent's schema tool answer from the snapshot instead of
+        # re-running the sample-row SELECTs on every call
+        custom_table_info = {name: table.info for name, table in snapshot.tables.items()}
+        for db in self._dbs:
+            db._custom_table_info = custom_table_info
+
+    def _load_snapshot(self) -> Optional[SchemaSnapshot]:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = SchemaSnapshot.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if snapshot.fingerprint is None or snapshot.fingerprint != get_schema_fingerprint(self.db._engine):
+            return None
+        return snapshot
+
+    def _save_snapshot(self, snapshot: SchemaSnapshot) -> None:
+        if self.store is not None:
+            self.store.set(self.store_key, snapshot.to_dict(), self.ttl)
+        if not self.snapshot_path:
+            return
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot.to_dict(), f)
+        os.replace(tmp_path, self.snapshot_path)
+
+_caches: Dict[str, SchemaCache] = {}
+_caches_lock = threading.Lock()
+
+def get_schema_cache(db: SQLDatabase) -> SchemaCache:
+    """Return the process-wide SchemaCache for db's database URL."""
+    url = db._engine.url.render_as_string(hide_password=False)
+    with _caches_lock:
+        cache = _caches.get(url)
+        if cache is None:
+            cache_dir = os.getenv("SCHEMA_CACHE_DIR", ".cache")
+            digest = hashlib.sha1(url.encode()).hexdigest()[:12]
+            cache = SchemaCache(
+                db,
+                snapshot_path=os.path.join(cache_dir, f"schema_{digest}.json") if cache_dir else None,
+                ttl=get_int_env("SCHEMA_CACHE_TTL", 3600),
+                check_interval=get_int_env("SCHEMA_CACHE_CHECK_INTERVAL", 30),
+                store=get_shared_store(),
+                store_key=f"schema:{store_namespace(url)}",
+            )
+            _caches[url] = cache
+        else:
+            cache.attach(db)
+        return cache
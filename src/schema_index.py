@@ -0,0 +1,139 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Set
+
+from .schema_cache import SchemaSnapshot
+
+TOKEN_RE = re.compile(r"[A-Za-z][a-z]*|[0-9]+")
+
+# Business vocabulary users ask with, mapped onto words found in schema names
+SYNONYMS = {
+    "purchase": ["order"],
+    "bought": ["order"],
+    "buy": ["order"],
+    "sale": ["order", "item"],
+    "selling": ["order", "item", "quantity", "sale"],
+    "sold": ["order", "item", "quantity", "sale"],
+    "trend": ["daily"],
+    "monthly": ["daily"],
+    "revenue": ["subtotal", "total", "amount"],
+    "spend": ["total", "amount"],
+    "popular": ["order", "item", "quantity"],
+    "client": ["customer"],
+    "buyer": ["customer"],
+    "user": ["customer"],
+    "rating": ["review", "rating"],
+    "rated": ["review", "rating"],
+    "stock": ["stock", "inventory"],
+    "shipping": ["address", "shipping"],
+}
+
+# Table name tokens carry more signal than column name tokens
+TABLE_NAME_WEIGHT = 3
+COLUMN_WEIGHT = 1
+
+def _stem(token: str) -> str:
+    if len(token) <= 3:
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith(("sses", "uses", "xes", "ches", "shes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us")):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Split identifiers and prose into lowercase, lightly stemmed tokens."""
+    tokens = []
+    for raw in TOKEN_RE.findall(text.replace("_", " ")):
+        token = _stem(raw.lower())
+        tokens.append(token)
+        # "subcategories" should also match "categories"
+        if token.startswith("sub") and len(token) > 6:
+            tokens.append(token[3:])
+    return tokens
+
+def expand_query(tokens: List[str]) -> List[str]:
+    """Add schema vocabulary for business terms found in a question."""
+    expanded = list(tokens)
+    for token in tokens:
+        expanded.extend(SYNONYMS.get(token, []))
+    return expanded
+
+class SchemaIndex:
+    """BM25 index over table names, column names and comments.
+
+    ``select_tables`` returns the best matching tables plus the tables they
+    reference through foreign keys that the question also touches, so the
+    generated SQL can still join to the lookup tables it needs.
+    """
+
+    def __init__(self, snapshot: SchemaSnapshot, k1: float = 1.2, b: float = 0.75):
+        self.snapshot = snapshot
+        self.k1 = k1
+        self.b = b
+        self.documents: Dict[str, Counter] = {
+            name: Counter(self._document_tokens(table)) for name, table in snapshot.tables.items()
+        }
+        # Words that name a table; a question using one can stand on its own
+        self.table_terms: Set[str] = {token for name in snapshot.tables for token in tokenize(name)}
+        self.neighbours: Dict[str, Set[str]] = {
+            name: {fk["referred_table"] for fk in table.foreign_keys if fk["referred_table"] != name}
+            for name, table in snapshot.tables.items()
+        }
+        lengths = [sum(doc.values()) for doc in self.documents.values()]
+        self.avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+        document_frequency = Counter(token for doc in self.documents.values() for token in doc)
+        total = len(self.documents)
+        self.idf = {
+            token: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for token, df in document_frequency.items()
+        }
+
+    @staticmethod
+    def _document_tokens(table) -> List[str]:
+        tokens = tokenize(table.name) * TABLE_NAME_WEIGHT
+        for column in table.columns:
+            tokens.extend(tokenize(column["name"]) * COLUMN_WEIGHT)
+            if column.get("comment"):
+                tokens.extend(tokenize(column["comment"]))
+        if table.comment:
+            tokens.extend(tokenize(table.comment))
+        return tokens
+
+    def score(self, question: str) -> Dict[str, float]:
+        """BM25 score of every table for the question."""
+        query = expand_query(tokenize(question))
+        scores = {}
+        for name, doc in self.documents.items():
+            length = sum(doc.values())
+            total = 0.0
+            for token in query:
+                tf = doc.get(token)
+                if not tf:
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * length / self.avg_length)
+                total += self.idf[token] * tf * (self.k1 + 1) / norm
+            scores[name] = total
+        return scores
+
+    def select_tables(self, question: str, top_k: int = 3) -> List[str]:
+        """Return the top_k matching tables plus relevant FK-referenced tables.
+
+        Falls back to every table when nothing in the question matches.
+        """
+        scores = self.score(question)
+        ranked = [name for name, score in sorted(scores.items(), key=lambda item: -item[1]) if score > 0]
+        if not ranked or top_k <= 0:
+            return list(self.snapshot.tables)
+
+        selected = ranked[:top_k]
+        for name in list(selected):
+            for neighbour in sorted(self.neighbours[name]):
+                # Pulling in every referenced table would re-add most of the
+                # schema (orders -> addresses), so require some match
+                if neighbour not in selected and scores.get(neighbour, 0) > 0:
+                    selected.append(neighbour)
+        return [name for name in self.snapshot.tables if name in selected]
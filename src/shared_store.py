@@ -0,0 +1,239 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+
+class SharedStore(ABC):
+    """Key/value store with expiry that several worker processes can share.
+
+    Values are pickled, so only point SHARED_STORE_URL at a store that the
+    application alone writes to.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    def add(self, key: str, value: Any, ttl: int) -> bool:
+        """Set key only if it is absent; True if this call set it (a lock)."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def get_counters(self, prefix: str) -> Dict[str, int]:
+        """All counters whose key starts with prefix, keyed without it."""
+
+class MemoryStore(SharedStore):
+    """In-process stand-in with the same semantics, for one worker and tests."""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[Tuple[Any, float]]:
+        item = self._values.get(key)
+        if item is not None and item[1] < time.time():
+            del self._values[key]
+            return None
+        return item
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._live(key)
+            return pickle.loads(item[0]) if item else None
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        with self._lock:
+            self._values[key] = (pickle.dumps(value), time.time() + ttl)
+
+    def add(self, key: str, value: Any, ttl: int) -> bool:
+        with self._lock:
+            if self._live(key):
+                return False
+            self._values[key] = (pickle.dumps(value), time.time() + ttl)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            item = self._live(key)
+            value = (pickle.loads(item[0]) if item else 0) + 1
+            self._values[key] = (pickle.dumps(value), float("inf"))
+            return value
+
+    def get_counters(self, prefix: str) -> Dict[str, int]:
+        with self._lock:
+            return {
+                key[len(prefix):]: pickle.loads(value)
+                for key, (value, _) in self._values.items() if key.startswith(prefix)
+            }
+
+class SQLiteStore(SharedStore):
+    """Store in a local SQLite file, shared by the workers of one host.
+
+    WAL mode lets readers proceed while a worker writes; each thread keeps
+    its own connection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS shared_store "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; every statement below is atomic on its own
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value FROM shared_store WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO shared_store (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value), time.time() + ttl)
+        )
+        # Expired rows are only skipped by reads, so sweep them now and then
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self.purge_expired()
+
+    def add(self, key: str, value: Any, ttl: int) -> bool:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM shared_store WHERE key = ? AND expires_at <= ?", (key, now))
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO shared_store (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value), now + ttl)
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM shared_store WHERE key = ?", (key,))
+
+    def incr(self, key: str) -> int:
+        # Counters are stored as plain integers so they can be updated in SQL.
+        # One write transaction, so the value read back is this increment's;
+        # plain statements rather than UPSERT ... RETURNING (SQLite 3.35+)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO shared_store (key, value, expires_at) VALUES (?, 0, ?)", (key, float("inf"))
+            )
+            conn.execute("UPDATE shared_store SET value = value + 1 WHERE key = ?", (key,))
+            value = conn.execute("SELECT value FROM shared_store WHERE key = ?", (key,)).fetchone()[0]
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return value
+
+    def get_counters(self, prefix: str) -> Dict[str, int]:
+        rows = self._conn().execute(
+            "SELECT key, value FROM shared_store WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff")
+        )
+        return {key[len(prefix):]: int(value) for key, value in rows}
+
+    def purge_expired(self) -> None:
+        self._conn().execute("DELETE FROM shared_store WHERE expires_at <= ?", (time.time(),))
+
+class RedisStore(SharedStore):
+    """Store on a Redis (or Redis-protocol) server, shared across hosts."""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("SHARED_STORE_URL=redis://... needs the redis package: pip install redis")
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._redis.get(key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        self._redis.set(key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def add(self, key: str, value: Any, ttl: int) -> bool:
+        return bool(self._redis.set(key, pickle.dumps(value), ex=max(1, int(ttl)), nx=True))
+
+    def delete(self, key: str) -> None:
+        self._redis.delete(key)
+
+    def incr(self, key: str) -> int:
+        return int(self._redis.incr(key))
+
+    def get_counters(self, prefix: str) -> Dict[str, int]:
+        keys = list(self._redis.scan_iter(match=prefix + "*"))
+        values = self._redis.mget(keys) if keys else []
+        return {
+            key.decode()[len(prefix):]: int(value)
+            for key, value in zip(keys, values) if value is not None
+        }
+
+def store_namespace(url: str) -> str:
+    """Short key prefix that keeps the entries of different databases apart."""
+    return hashlib.sha1(url.encode()).hexdigest()[:12]
+
+def create_store(url: str) -> SharedStore:
+    """Build a store from a URL: memory://, sqlite:///path or redis://host:port/db."""
+    if url.startswith("memory://"):
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    raise ValueError(f"Unsupported SHARED_STORE_URL: {url!r}")
+
+_store: Optional[SharedStore] = None
+_store_url: Optional[str] = None
+_store_lock = threading.Lock()
+
+def get_shared_store() -> Optional[SharedStore]:
+    """Return the process-wide store, or None when SHARED_STORE_URL is unset.
+
+    Without a store every cache stays local to its process.
+    """
+    global _store, _store_url
+    url = os.getenv("SHARED_STORE_URL", "")
+    if not url:
+        return None
+    with _store_lock:
+        if _store is None or _store_url != url:
+            _store = create_store(url)
+            _store_url = url
+        return _store
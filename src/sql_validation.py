@@ -0,0 +1,94 @@
+import re
+from typing import Dict, Optional, Set
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError
+
+from .schema_cache import SchemaSnapshot
+
+# sqlglot dialect names for SQLAlchemy dialect names that differ
+SQLGLOT_DIALECTS = {"postgresql": "postgres", "mssql": "tsql"}
+
+WRITE_EXPRESSIONS = (
+    exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop,
+    exp.Alter, exp.TruncateTable, exp.Command, exp.Into, exp.Lock,
+)
+
+class SQLValidationError(ValueError):
+    """Generated SQL failed local validation and must not be executed."""
+
+def get_sqlglot_dialect(dialect: str) -> str:
+    return SQLGLOT_DIALECTS.get(dialect, dialect)
+
+def clean_sql(text: str) -> str:
+    """Strip the prefixes and markdown fences LLMs wrap around SQL."""
+    sql = text.strip()
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", sql, re.DOTALL | re.IGNORECASE)
+    if fenced:
+        sql = fenced.group(1).strip()
+    if sql.startswith("SQLQuery:"):
+        sql = sql[len("SQLQuery:"):].strip()
+    # Drop anything the model added after the query itself
+    sql = sql.split("\nSQLResult:")[0].split("\nAnswer:")[0].strip()
+    return sql.rstrip(";").strip()
+
+def parse_sql(sql: str, dialect: str) -> exp.Expression:
+    """Parse a single SQL statement."""
+    try:
+        statements = [s for s in sqlglot.parse(sql, read=get_sqlglot_dialect(dialect)) if s is not None]
+    except ParseError as e:
+        raise SQLValidationError(f"Could not parse SQL: {e}")
+    if len(statements) != 1:
+        raise SQLValidationError(f"Expected exactly one SQL statement, got {len(statements)}")
+    return statements[0]
+
+def validate_sql(sql: str, snapshot: SchemaSnapshot, dialect: str) -> exp.Expression:
+    """Check that sql is a single read-only query over known tables and columns.
+
+    Returns the parsed expression so callers can reuse it.
+    """
+    tree = parse_sql(sql, dialect)
+    if not isinstance(tree, (exp.Select, exp.SetOperation)):
+        raise SQLValidationError(f"Only SELECT queries are allowed, got {tree.key.upper()}")
+    for node in tree.walk():
+        if isinstance(node, WRITE_EXPRESSIONS):
+            raise SQLValidationError(f"Query is not read-only ({node.key.upper()})")
+
+    tables = {name.lower(): table for name, table in snapshot.tables.items()}
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    derived_aliases = {sub.alias_or_name.lower() for sub in tree.find_all(exp.Subquery) if sub.alias}
+
+    aliases: Dict[str, str] = {}
+    for table in tree.find_all(exp.Table):
+        name = table.name.lower()
+        if name in cte_names:
+            continue
+        if name not in tables:
+            raise SQLValidationError(f"Unknown table: {table.name}")
+        aliases[table.alias_or_name.lower()] = name
+        aliases.setdefault(name, name)
+
+    known_columns: Set[str] = set()
+    for name in set(aliases.values()):
+        known_columns.update(column.lower() for column in tables[name].column_names)
+    output_aliases = {alias.alias.lower() for alias in tree.find_all(exp.Alias)}
+    has_derived_sources = bool(cte_names or derived_aliases)
+
+    for column in tree.find_all(exp.Column):
+        column_name = column.name.lower()
+        if not column_name or isinstance(column.this, exp.Star):
+            continue
+        qualifier: Optional[str] = column.table.lower() or None
+        if qualifier:
+            if qualifier in cte_names or qualifier in derived_aliases:
+                continue
+            if qualifier not in aliases:
+                raise SQLValidationError(f"Unknown table or alias: {column.table}")
+            table_columns = {c.lower() for c in tables[aliases[qualifier]].column_names}
+            if column_name not in table_columns:
+                raise SQLValidationError(f"Unknown column: {column.table}.{column.name}")
+        elif column_name not in known_columns and column_name not in output_aliases and not has_derived_sources:
+            raise SQLValidationError(f"Unknown column: {column.name}")
+
+    return tree
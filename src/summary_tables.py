@@ -0,0 +1,387 @@
+"""Precomputed summary tables for the common analytics questions.
+
+Revenue per category, monthly trends, top sellers, customer spend and
+product ratings otherwise scan order_items/orders/reviews in full. The
+tables below hold the same aggregates at day/product/customer grain and are
+refreshed incrementally: each remembers the highest source id it has
+folded in, and a refresh aggregates only the newer rows and adds them to the
+existing totals.
+
+    python -m src.summary_tables            # create if missing, then refresh
+    python -m src.summary_tables --rebuild  # recompute from scratch
+
+Only inserts are picked up incrementally. Updates to existing orders (for
+example a status change) or deleted rows need --rebuild, which is why no
+summary is keyed on order status. Rows are also taken strictly in id order:
+a row that commits after a refresh has passed its id (a transaction holding
+a lower auto-increment id that was still open when a higher id committed)
+is never folded in until --rebuild.
+
+Refreshers running at the same time (several workers, a refresh outliving
+its interval, this CLI next to the server) take turns on each table's
+refresh state row, so no source row is added twice.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from .config import get_database_url, get_int_env
+from .data_versions import get_data_version_tracker
+from .shared_store import get_shared_store, store_namespace
+
+logger = logging.getLogger(__name__)
+
+STATE_TABLE = "summary_refresh_state"
+
+@dataclass
+class SummaryTable:
+    name: str
+    # Shown to the LLM next to the table's schema
+    description: str
+    columns: str
+    key: Tuple[str, ...]
+    # Table and integer id column whose new rows are folded in on refresh
+    source: Tuple[str, str]
+    # Aggregates source rows with :low < id <= :high into columns named (and
+    # ordered) as key + sums + minimums + maximums
+    delta_sql: str
+    sums: Tuple[str, ...] = ()
+    minimums: Tuple[str, ...] = ()
+    maximums: Tuple[str, ...] = ()
+    # column -> expression over the summed columns, recomputed on every upsert
+    # (e.g. an average from a sum and a count)
+    derived: Dict[str, str] = field(default_factory=dict)
+    indexes: Tuple[Tuple[str, ...], ...] = ()
+
+    @property
+    def insert_columns(self) -> List[str]:
+        return [*self.key, *self.sums, *self.minimums, *self.maximums]
+
+SUMMARY_TABLES = [
+    SummaryTable(
+        name="summary_daily_orders",
+        description=(
+            "Precomputed daily totals of orders: order count and revenue (sum of total_amount) per day. "
+            "Use it instead of scanning orders for sales trends by day, month or year."
+        ),
+        columns="order_day DATE NOT NULL PRIMARY KEY, order_count INT NOT NULL, revenue DECIMAL(14, 2) NOT NULL",
+        key=("order_day",),
+        source=("orders", "order_id"),
+        delta_sql=(
+            "SELECT DATE(order_date) AS order_day, COUNT(*) AS order_count, SUM(total_amount) AS revenue FROM orders "
+            "WHERE order_id > :low AND order_id <= :high GROUP BY DATE(order_date)"
+        ),
+        sums=("order_count", "revenue"),
+    ),
+    SummaryTable(
+        name="summary_monthly_product_sales",
+        description=(
+            "Precomputed monthly sales per product: order lines, units sold (sum of quantity) and revenue "
+            "(sum of subtotal), with the product's category_id; order_month is the first day of the month. "
+            "Use it instead of joining order_items to orders for top-selling products and revenue per product."
+        ),
+        columns=(
+            "order_month DATE NOT NULL, product_id INT NOT NULL, category_id INT, line_count INT NOT NULL, "
+            "units_sold INT NOT NULL, revenue DECIMAL(14, 2) NOT NULL, PRIMARY KEY (order_month, product_id)"
+        ),
+        key=("order_month", "product_id"),
+        source=("order_items", "order_item_id"),
+        delta_sql=(
+            "SELECT {month_start} AS order_month, oi.product_id, COUNT(*) AS line_count, "
+            "SUM(oi.quantity) AS units_sold, SUM(oi.subtotal) AS revenue, p.category_id "
+            "FROM order_items oi JOIN orders o ON o.order_id = oi.order_id "
+            "JOIN products p ON p.product_id = oi.product_id "
+            "WHERE oi.order_item_id > :low AND oi.order_item_id <= :high "
+            "GROUP BY {month_start}, oi.product_id, p.category_id"
+        ),
+        sums=("line_count", "units_sold", "revenue"),
+        # category_id is functionally dependent on product_id; keep the first value seen
+        minimums=("category_id",),
+        indexes=(("product_id",),),
+    ),
+    SummaryTable(
+        name="summary_daily_category_sales",
+        description=(
+            "Precomputed daily sales per product category: order lines, units sold and revenue (sum of "
+            "order_items.subtotal). Use it instead of joining order_items to products for revenue per "
+            "category and category sales trends."
+        ),
+        columns=(
+            "order_day DATE NOT NULL, category_id INT NOT NULL, line_count INT NOT NULL, "
+            "units_sold INT NOT NULL, revenue DECIMAL(14, 2) NOT NULL, PRIMARY KEY (order_day, category_id)"
+        ),
+        key=("order_day", "category_id"),
+        source=("order_items", "order_item_id"),
+        delta_sql=(
+            "SELECT DATE(o.order_date) AS order_day, p.category_id, COUNT(*) AS line_count, "
+            "SUM(oi.quantity) AS units_sold, SUM(oi.subtotal) AS revenue "
+            "FROM order_items oi JOIN orders o ON o.order_id = oi.order_id "
+            "JOIN products p ON p.product_id = oi.product_id "
+            "WHERE oi.order_item_id > :low AND oi.order_item_id <= :high AND p.category_id IS NOT NULL "
+            "GROUP BY DATE(o.order_date), p.category_id"
+        ),
+        sums=("line_count", "units_sold", "revenue"),
+        indexes=(("category_id",),),
+    ),
+    SummaryTable(
+        name="summary_customer_orders",
+        description=(
+            "Precomputed order statistics per customer: order count, total spent (sum of total_amount) "
+            "and first/last order time. Average order value is total_spent / order_count. Use it "
+            "instead of aggregating orders per customer."
+        ),
+        columns=(
+            "customer_id INT NOT NULL PRIMARY KEY, order_count INT NOT NULL, total_spent DECIMAL(14, 2) NOT NULL, "
+            "first_order_at TIMESTAMP, last_order_at TIMESTAMP"
+        ),
+        key=("customer_id",),
+        source=("orders", "order_id"),
+        delta_sql=(
+            "SELECT customer_id, COUNT(*) AS order_count, SUM(total_amount) AS total_spent, "
+            "MIN(order_date) AS first_order_at, MAX(order_date) AS last_order_at FROM orders "
+            "WHERE order_id > :low AND order_id <= :high AND customer_id IS NOT NULL GROUP BY customer_id"
+        ),
+        sums=("order_count", "total_spent"),
+        minimums=("first_order_at",),
+        maximums=("last_order_at",),
+    ),
+    SummaryTable(
+        name="summary_product_ratings",
+        description=(
+            "Precomputed review statistics per product: review count, sum and average of rating. "
+            "Use it instead of aggregating reviews for top-rated products."
+        ),
+        columns=(
+            "product_id INT NOT NULL PRIMARY KEY, review_count INT NOT NULL, rating_sum INT NOT NULL, "
+            "avg_rating DECIMAL(6, 3) NOT NULL"
+        ),
+        key=("product_id",),
+        source=("reviews", "review_id"),
+        delta_sql=(
+            "SELECT product_id, COUNT(*) AS review_count, SUM(rating) AS rating_sum FROM reviews "
+            "WHERE review_id > :low AND review_id <= :high AND rating IS NOT NULL GROUP BY product_id"
+        ),
+        sums=("review_count", "rating_sum"),
+        derived={"avg_rating": "{rating_sum} * 1.0 / {review_count}"},
+    ),
+]
+
+SUMMARY_TABLE_NAMES = {table.name for table in SUMMARY_TABLES}
+
+# First day of the month of a timestamp column, for {month_start} in delta_sql
+MONTH_START = {
+    "sqlite": "DATE(o.order_date, 'start of month')",
+    "mysql": "DATE_SUB(DATE(o.order_date), INTERVAL DAYOFMONTH(o.order_date) - 1 DAY)",
+}
+
+def _upsert_sql(table: SummaryTable, dialect: str) -> str:
+    """INSERT ... SELECT of the delta that adds to existing rows instead of failing."""
+    delta_sql = table.delta_sql.format(month_start=MONTH_START.get(dialect, MONTH_START["mysql"]))
+    columns = table.insert_columns + list(table.derived)
+    plain = {s: s for s in table.sums}
+    derived = "".join(f", {expr.format(**plain)}" for expr in table.derived.values())
+    # "WHERE true" keeps SQLite from reading ON CONFLICT as a join constraint
+    insert = (
+        f"INSERT INTO {table.name} ({', '.join(columns)}) "
+        f"SELECT delta.*{derived} FROM ({delta_sql}) delta WHERE true"
+    )
+    if dialect == "mysql":
+        # Assignments apply left to right, so derived columns (last) see the new sums
+        current = {s: f"{table.name}.{s}" for s in table.sums}
+        assignments = [f"{c} = {table.name}.{c} + VALUES({c})" for c in table.sums]
+        assignments += [f"{c} = LEAST({table.name}.{c}, VALUES({c}))" for c in table.minimums]
+        assignments += [f"{c} = GREATEST({table.name}.{c}, VALUES({c}))" for c in table.maximums]
+        assignments += [f"{c} = {expr.format(**current)}" for c, expr in table.derived.items()]
+        return f"{insert} ON DUPLICATE KEY UPDATE {', '.join(assignments)}"
+    # SQLite: every expression sees the old row, so derived columns add the sums themselves
+    new_sums = {s: f"({table.name}.{s} + excluded.{s})" for s in table.sums}
+    assignments = [f"{c} = {new_sums[c]}" for c in table.sums]
+    assignments += [f"{c} = MIN({table.name}.{c}, excluded.{c})" for c in table.minimums]
+    assignments += [f"{c} = MAX({table.name}.{c}, excluded.{c})" for c in table.maximums]
+    assignments += [f"{c} = {expr.format(**new_sums)}" for c, expr in table.derived.items()]
+    return f"{insert} ON CONFLICT ({', '.join(table.key)}) DO UPDATE SET {', '.join(assignments)}"
+
+class SummaryManager:
+    """Creates the summary tables and folds new source rows into them."""
+
+    def __init__(self, engine: Engine, tables: Optional[List[SummaryTable]] = None, chunk_size: int = 500_000):
+        self.engine = engine
+        self.tables = tables or SUMMARY_TABLES
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+
+    @property
+    def dialect(self) -> str:
+        return self.engine.dialect.name
+
+    def exists(self) -> bool:
+        existing = set(inspect(self.engine).get_table_names())
+        return all(table.name in existing for table in self.tables)
+
+    def create(self) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (summary_table VARCHAR(64) NOT NULL PRIMARY KEY, "
+                "last_source_id BIGINT NOT NULL, refreshed_at TIMESTAMP)"
+            ))
+            existing = set(inspect(conn).get_table_names())
+            for table in self.tables:
+                if table.name in existing:
+                    continue
+                conn.execute(text(f"CREATE TABLE {table.name} ({table.columns})"))
+                for columns in table.indexes:
+                    conn.execute(text(
+                        f"CREATE INDEX idx_{table.name}_{'_'.join(columns)} ON {table.name} ({', '.join(columns)})"
+                    ))
+
+    def refresh(self, rebuild: bool = False) -> Dict[str, int]:
+        """Fold source rows added since the last refresh in; returns rows read per table."""
+        processed = {}
+        with self._lock:
+            for table in self.tables:
+                self._ensure_state_row(table)
+                if rebuild:
+                    with self._state_transaction(table) as (conn, _):
+                        conn.execute(text(f"DELETE FROM {table.name}"))
+                        self._set_watermark(conn, table, 0)
+                processed[table.name] = self._refresh_table(table)
+                if processed[table.name]:
+                    # Seen at once rather than at the next change-marker poll
+                    get_data_version_tracker(self.engine).bump(table.name)
+        return processed
+
+    def _refresh_table(self, table: SummaryTable) -> int:
+        source, id_column = table.source
+        with self.engine.connect() as conn:
+            high = conn.execute(text(f"SELECT MAX({id_column}) FROM {source}")).scalar() or 0
+        upsert = text(_upsert_sql(table, self.dialect))
+        processed = 0
+        # One transaction per id range: a failure keeps every chunk already
+        # folded in. Each reads the watermark under the state row's lock, so
+        # another refresher waits and then starts after this chunk
+        while True:
+            with self._state_transaction(table) as (conn, low):
+                if low >= high:
+                    break
+                end = min(low + self.chunk_size, high)
+                conn.execute(upsert, {"low": low, "high": end})
+                self._set_watermark(conn, table, end)
+            processed += end - low
+        return processed
+
+    @contextmanager
+    def _state_transaction(self, table: SummaryTable) -> Iterator[Tuple[Connection, int]]:
+        """A transaction holding the write lock on table's state row, and the watermark read under it."""
+        if self.dialect != "sqlite":
+            with self.engine.begin() as conn:
+                yield conn, self._watermark(conn, table, for_update=True)
+            return
+        # SQLite locks the whole database; BEGIN IMMEDIATE takes the write
+        # lock before the watermark is read (pysqlite would only begin at the
+        # first write), which needs the driver's own transaction handling off
+        with self.engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT")
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                yield conn, self._watermark(conn, table)
+            except BaseException:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+            conn.exec_driver_sql("COMMIT")
+
+    def _ensure_state_row(self, table: SummaryTable) -> None:
+        # The row must exist for SELECT ... FOR UPDATE to lock it
+        ignore = "OR IGNORE" if self.dialect == "sqlite" else "IGNORE"
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                f"INSERT {ignore} INTO {STATE_TABLE} (summary_table, last_source_id) VALUES (:name, 0)"
+            ), {"name": table.name})
+
+    @staticmethod
+    def _watermark(conn: Connection, table: SummaryTable, for_update: bool = False) -> int:
+        value = conn.execute(
+            text(
+                f"SELECT last_source_id FROM {STATE_TABLE} WHERE summary_table = :name"
+                + (" FOR UPDATE" if for_update else "")
+            ),
+            {"name": table.name}
+        ).scalar()
+        return int(value or 0)
+
+    def _set_watermark(self, conn: Connection, table: SummaryTable, value: int) -> None:
+        conn.execute(text(
+            f"UPDATE {STATE_TABLE} SET last_source_id = :value, refreshed_at = CURRENT_TIMESTAMP "
+            "WHERE summary_table = :name"
+        ), {"name": table.name, "value": value})
+
+def describe_summary_tables(db: SQLDatabase) -> None:
+    """Put each summary table's description above its schema in prompts.
+
+    Uses SQLDatabase's custom table info, so the fast path, the agent's
+    schema tool and the schema snapshot all show it. The refresh bookkeeping
+    table is hidden from the LLM.
+    """
+    if STATE_TABLE in db._all_tables:
+        db._ignore_tables = set(db._ignore_tables) | {STATE_TABLE}
+    present = [name for name in db.get_usable_table_names() if name in SUMMARY_TABLE_NAMES]
+    if not present:
+        return
+    descriptions = {table.name: table.description for table in SUMMARY_TABLES}
+    custom = dict(db._custom_table_info or {})
+    for name in present:
+        if name not in custom:
+            custom[name] = f"/* {descriptions[name]} */\n{db.get_table_info([name])}"
+    db._custom_table_info = custom
+
+def start_background_refresh(engine: Engine, interval: int) -> Optional[threading.Event]:
+    """Refresh the summary tables every interval seconds, if they exist.
+
+    Returns an event that stops the refresh thread when set. With a shared
+    store, only the worker that takes the lock for an interval refreshes.
+    """
+    manager = SummaryManager(engine)
+    if interval <= 0 or not manager.exists():
+        return None
+    stop = threading.Event()
+    store = get_shared_store()
+    lock_key = f"summary-refresh:{store_namespace(engine.url.render_as_string(hide_password=False))}"
+
+    def loop():
+        while not stop.wait(interval):
+            # The lock is left to expire, so the other workers skip this round
+            if store is not None and not store.add(lock_key, os.getpid(), interval):
+                continue
+            try:
+                manager.refresh()
+            except Exception:
+                logger.exception("Summary table refresh failed")
+
+    threading.Thread(target=loop, name="summary-refresh", daemon=True).start()
+    return stop
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="database to summarise (default: DATABASE_URL / DB_*)")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every summary from scratch")
+    parser.add_argument("--chunk-size", type=int, default=get_int_env("SUMMARY_REFRESH_CHUNK", 500_000),
+                        help="source ids folded in per transaction")
+    args = parser.parse_args()
+
+    manager = SummaryManager(create_engine(args.database_url or get_database_url()), chunk_size=args.chunk_size)
+    manager.create()
+    start = time.perf_counter()
+    for name, rows in manager.refresh(rebuild=args.rebuild).items():
+        print(f"{name:<30} {rows:>12,} new source rows")
+    print(f"refreshed in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
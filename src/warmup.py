@@ -0,0 +1,94 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generic, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+class WarmupError(RuntimeError):
+    """Raised when the warmed object failed to build or is not ready in time."""
+
+class Warmup(Generic[T]):
+    """Build an expensive object once, in the background or on first use.
+
+    ``factory`` receives the Warmup, so it can time its phases with
+    ``step(name)``; ``status()`` reports them for a readiness probe. If the
+    factory fails, the error is kept and re-raised by every ``get()``.
+    """
+
+    def __init__(self, factory: Callable[["Warmup[T]"], T], name: str = "warmup"):
+        self.factory = factory
+        self.name = name
+        self.steps: Dict[str, float] = {}
+        self._value: Optional[T] = None
+        self._error: Optional[BaseException] = None
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> "Warmup[T]":
+        """Begin building on a daemon thread (a no-op once started)."""
+        if self._claim():
+            threading.Thread(target=self._build, name=self.name, daemon=True).start()
+        return self
+
+    def get(self, timeout: Optional[float] = None) -> T:
+        """Return the object, building it here if nobody has started to.
+
+        Waits at most ``timeout`` seconds for a build running elsewhere.
+        """
+        if self._claim():
+            self._build()
+        if not self._done.wait(timeout):
+            raise WarmupError(f"{self.name} is still warming up, retry shortly")
+        if self._error is not None:
+            raise WarmupError(f"{self.name} failed to start: {self._error}") from self._error
+        return self._value
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() and self._error is None
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        """Time one phase of the factory."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def status(self) -> Dict[str, Any]:
+        """Progress and per-step timings (ms) for reporting."""
+        if self._started_at is None:
+            state = "pending"
+        elif not self._done.is_set():
+            state = "warming"
+        else:
+            state = "failed" if self._error is not None else "ready"
+        end = self._finished_at or time.time()
+        status: Dict[str, Any] = {
+            "status": state,
+            "elapsed_ms": round((end - self._started_at) * 1000, 1) if self._started_at else 0.0,
+            "steps": dict(self.steps),
+        }
+        if self._error is not None:
+            status["error"] = str(self._error)
+        return status
+
+    def _claim(self) -> bool:
+        with self._lock:
+            if self._started_at is not None:
+                return False
+            self._started_at = time.time()
+            return True
+
+    def _build(self) -> None:
+        try:
+            self._value = self.factory(self)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._finished_at = time.time()
+            self._done.set()
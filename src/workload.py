@@ -0,0 +1,114 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import get_int_env
+from .metrics import REGISTRY
+
+WORKLOAD_DROPPED = REGISTRY.counter(
+    "chatdb_workload_log_dropped_total", "Executed queries left out of the workload log because its writer fell behind"
+)
+
+class WorkloadLog:
+    """Append-only JSON Lines log of the SQL the application executes.
+
+    One line per execution that reached the database (cache hits are not
+    logged), with its duration and row count; the index advisor reads it.
+    The lines hold the SQL as run, literals included. Queries only queue
+    their line; a background thread appends them in batches, and lines
+    beyond ``max_pending`` are dropped rather than slowing queries down.
+    The file is rotated to ``<path>.1`` once it grows past max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, max_pending: int = 10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._pending: "queue.Queue[str]" = queue.Queue(maxsize=max_pending)
+        self._write_lock = threading.Lock()
+        threading.Thread(target=self._write_loop, name="workload-log", daemon=True).start()
+        atexit.register(self.flush)
+
+    def record(self, sql: str, dialect: str, seconds: float, rows: Optional[int], source: str) -> None:
+        line = json.dumps({
+            "ts": round(time.time(), 3),
+            "source": source,
+            "dialect": dialect,
+            "duration_ms": round(seconds * 1000, 3),
+            "rows": rows,
+            "sql": sql,
+        }) + "\n"
+        try:
+            self._pending.put_nowait(line)
+        except queue.Full:
+            WORKLOAD_DROPPED.inc()
+
+    def flush(self) -> None:
+        """Write every queued line now."""
+        lines = self._drain()
+        if lines:
+            self._write(lines)
+
+    def _write_loop(self) -> None:
+        while True:
+            lines = [self._pending.get()]
+            lines.extend(self._drain())
+            self._write(lines)
+
+    def _drain(self) -> List[str]:
+        lines = []
+        while True:
+            try:
+                lines.append(self._pending.get_nowait())
+            except queue.Empty:
+                return lines
+
+    def _write(self, lines: List[str]) -> None:
+        with self._write_lock:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if self.max_bytes > 0 and os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+            except OSError:
+                # Capture is best effort; never fail a query over it
+                pass
+
+_log: Optional[WorkloadLog] = None
+_log_lock = threading.Lock()
+
+def get_workload_log() -> Optional[WorkloadLog]:
+    """Return the process-wide workload log, or None unless WORKLOAD_LOG is set."""
+    global _log
+    path = os.getenv("WORKLOAD_LOG", "")
+    if not path:
+        return None
+    with _log_lock:
+        if _log is None or _log.path != path:
+            _log = WorkloadLog(path, max_bytes=get_int_env("WORKLOAD_LOG_MAX_MB", 10) * 1024 * 1024)
+        return _log
+
+def record_query(sql: str, dialect: str, seconds: float, rows: Optional[int], source: str) -> None:
+    """Add one executed query to the workload log, if capture is enabled."""
+    log = get_workload_log()
+    if log is not None:
+        log.record(sql, dialect, seconds, rows, source)
+
+def read_workload(path: str) -> Iterator[Dict[str, Any]]:
+    """Entries of a workload log (and its rotated predecessor), oldest first."""
+    for name in (path + ".1", path):
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash mid-write
+                    continue